@@ -0,0 +1,252 @@
+"""End-to-end benchmark of the research graph against recorded or synthetic provider responses.
+
+Examples:
+    # Offline run over synthetic companies with realistic provider latencies
+    python benchmarks/run_benchmark.py --synthetic 20 --concurrency 1,4,16 --latency tavily=0.8 openai=1.5 cohere=0.3
+
+    # Record live provider responses for a list of companies (needs real API keys)
+    python benchmarks/run_benchmark.py --record --companies companies.jsonl --cassette benchmarks/corpus/cassette.json
+
+    # Replay the recording with 2% injected provider errors
+    python benchmarks/run_benchmark.py --companies companies.jsonl --cassette benchmarks/corpus/cassette.json --error-rate 0.02
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def percentile(values, q):
+    """Return the `q` quantile of `values` (nearest rank)."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(q * (len(values) - 1))))]
+
+
+def synthetic_companies(count):
+    """Return `count` synthetic company records."""
+    return [{"company": f"Synth{i:03d}", "company_url": f"https://synth{i:03d}.example/", "include": ["Name of the CEO"]}
+            for i in range(count)]
+
+
+class SyntheticProviders:
+    """Generates deterministic provider responses for the synthetic company corpus on replay misses."""
+
+    def __init__(self, companies):
+        """Answer for the given company records."""
+        self.companies = companies
+
+    def company_for(self, text):
+        """Return the company named in `text`, or the first one."""
+        for company in self.companies:
+            if company["company"].lower() in text.lower():
+                return company
+        return self.companies[0]
+
+    def paragraph(self, company, seed, sentences=8):
+        """Return a deterministic paragraph about `company`."""
+        digest = hashlib.sha256(f"{company['company']}{seed}".encode()).hexdigest()
+        return " ".join(
+            f"{company['company']} {word} the market with product line {digest[i:i + 6]} and {int(digest[i:i + 2], 16)} partners."
+            for i, word in zip(range(0, sentences * 4, 4), ["leads", "serves", "expands", "enters", "shapes", "grows", "funds", "builds"])
+        )
+
+    def __call__(self, method, payload):
+        """Return a synthetic response to a `method` request."""
+        if method == "search":
+            company = self.company_for(payload["query"])
+            domain = company["company_url"].split("//")[-1].strip("/")
+            query_id = hashlib.sha256(payload["query"].encode()).hexdigest()[:6]
+            results = [{"url": f"https://{domain}/page-{query_id}-{i}", "title": f"{company['company']} page {i}",
+                        "content": self.paragraph(company, f"{query_id}{i}", 3), "score": 0.9 - i * 0.05} for i in range(5)]
+            results += [{"url": f"https://news{i}.example/{company['company'].lower()}-{query_id}", "title": f"{company['company']} news",
+                         "content": self.paragraph(company, f"news{query_id}{i}", 3), "score": 0.6 - i * 0.05} for i in range(5)]
+            return {"results": results}
+        if method == "extract":
+            return {"results": [{"url": url, "raw_content": self.paragraph(self.company_for(url), url, 40)} for url in payload["urls"]],
+                    "failed_results": []}
+        if method == "rerank":
+            return [{"index": i, "relevance_score": 1.0 / (i + 1)} for i in range(min(payload["top_n"] or 10, len(payload["documents"])))]
+        prompt = " ".join(message["content"] for message in payload["messages"])
+        company = self.company_for(prompt)
+        if method == "structured" and payload["schema"] == "TavilySearchInput":
+            topics = ["leadership team", "funding rounds", "products", "competitors", "headquarters"]
+            return {"parsed": {"sub_queries": [{"query": f"{company['company']} {topic}", "search_depth": "basic"} for topic in topics]},
+                    "usage": {"input_tokens": len(prompt) // 4, "output_tokens": 80}}
+        if method == "structured" and payload["schema"] == "CompactClusters":
+            # Put every document from the company's own domain in its cluster and the rest in 'Ambiguous'
+            domain = company["company_url"].split("//")[-1].strip("/")
+            lines = [line.split(" | ") for line in prompt.split("\n") if line.count(" | ") >= 2 and line.split(" | ")[0].isdigit()]
+            target = [int(parts[0]) for parts in lines if parts[1] == domain]
+            other = [int(parts[0]) for parts in lines if parts[1] != domain]
+            clusters = [{"company_name": company["company"], "ids": target}, {"company_name": "Ambiguous", "ids": other}]
+            return {"parsed": {"clusters": clusters}, "usage": {"input_tokens": len(prompt) // 4, "output_tokens": 4 * len(lines)}}
+        if method == "structured":
+            return {"parsed": {}, "usage": {"input_tokens": len(prompt) // 4, "output_tokens": 10}}
+        if "section of a fact-based report" in prompt:
+            # Section-parallel writing: one short body with an inline citation per section
+            url = company["company_url"]
+            report = "\n\n".join(self.paragraph(company, f"{prompt[:80]}{i}", 4) + f" ([{company['company']}]({url}))" for i in range(2))
+        else:
+            report = f"# {company['company']} Company Report\n\n" + "\n\n".join(self.paragraph(company, i, 6) for i in range(12))
+        return {"content": report, "usage": {"input_tokens": len(prompt) // 4, "output_tokens": len(report) // 4}}
+
+
+def parse_latencies(values):
+    """Parse `provider=seconds` values into a dict."""
+    latencies = {}
+    for value in values or []:
+        provider, seconds = value.split("=")
+        latencies[provider] = float(seconds)
+    return latencies
+
+
+def build(args, companies):
+    """Build the graph on replayed providers, returning it and its cassette."""
+    from company_researcher.config import Config
+    from company_researcher.graph import build_graph
+    from company_researcher.utils.all import Utils
+    from company_researcher.utils.clients import registry
+    from company_researcher.utils.replay import (Cassette, FaultInjector, ReplayChatModel, ReplayCohereClient,
+                                                 ReplayTavilyClient)
+
+    cassette = Cassette(args.cassette)
+    mode = "record" if args.record else "replay"
+    fallback = SyntheticProviders(companies) if args.synthetic else None
+    latencies = parse_latencies(args.latency)
+
+    def faults(provider):
+        return FaultInjector(latencies.get(provider, 0.0), sigma=args.sigma, error_rate=args.error_rate, seed=args.seed,
+                             rate_limit_rate=getattr(args, "rate_limit_rate", 0.0))
+
+    cfg = Config()
+    # Benchmarks measure the pipeline, not the response cache
+    cfg.CACHE_ENABLED = False
+    if getattr(args, "no_hedge", False):
+        cfg.HEDGE_ENABLED = False
+    if getattr(args, "no_search_streaming", False):
+        cfg.SEARCH_STREAMING = False
+    if getattr(args, "write_mode", None):
+        cfg.WRITE_MODE = args.write_mode
+    cfg.BASE_LLM = ReplayChatModel(cassette, mode, client=cfg.BASE_LLM if args.record else None,
+                                   faults=faults("openai"), fallback=fallback, temperature=0.2)
+    cfg.FACTUAL_LLM = ReplayChatModel(cassette, mode, client=cfg.FACTUAL_LLM if args.record else None,
+                                      faults=faults("openai"), fallback=fallback)
+    registry.override("tavily", ReplayTavilyClient(cassette, mode, client=registry.tavily if args.record else None,
+                                                   faults=faults("tavily"), fallback=fallback))
+    registry.override("cohere", ReplayCohereClient(cassette, mode, client=registry.cohere if args.record else None,
+                                                   faults=faults("cohere"), fallback=fallback))
+    return build_graph(cfg, Utils(cfg)), cassette
+
+
+async def run_level(graph, companies, concurrency, trace_memory):
+    """Run every company at the given concurrency and return the level's measurements."""
+    from company_researcher.utils import metrics
+
+    metrics.recorder.reset()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def run_one(company):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await graph.ainvoke(company)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                failures += 1
+                print(f"Run failed for {company['company']}: {e}", file=sys.stderr)
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(run_one(company) for company in companies))
+    elapsed = time.perf_counter() - start
+    peak_memory = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    return {
+        "concurrency": concurrency,
+        "runs": len(companies),
+        "failures": failures,
+        "elapsed_seconds": elapsed,
+        "throughput_per_minute": 60 * len(latencies) / elapsed if elapsed else 0.0,
+        "end_to_end": {f"p{int(q * 100)}": percentile(latencies, q) for q in (0.5, 0.95, 0.99)},
+        "nodes": {
+            name: {"p50": stats["wall_time_p50"], "p95": stats["wall_time_p95"], "p99": stats["wall_time_p99"],
+                   "provider_wait": stats["provider_wait_sum"], "tavily_credits": stats["tavily_credits"],
+                   "tokens": stats["prompt_tokens"] + stats["completion_tokens"]}
+            for name, stats in metrics.recorder.summary().items()
+        },
+        "peak_traced_memory_bytes": peak_memory,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main():
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", help="JSONL file of {company, company_url, include} records")
+    parser.add_argument("--synthetic", type=int, default=0, help="Benchmark N synthetic companies instead")
+    parser.add_argument("--cassette", default=None, help="Recorded provider responses (JSON)")
+    parser.add_argument("--record", action="store_true", help="Call the real providers and record their responses")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--latency", nargs="*", help="Median injected latency per provider, e.g. tavily=0.8 openai=1.5")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Shape of the log-normal latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability that a provider call fails")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="Probability that a provider call is rate limited (HTTP 429) and retried")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-hedge", action="store_true", help="Disable hedged grounding extracts and searches")
+    parser.add_argument("--no-search-streaming", action="store_true",
+                        help="Wait for every search instead of processing results as they arrive")
+    parser.add_argument("--write-mode", default=None, choices=["single", "sections"], help="Override Config.WRITE_MODE")
+    parser.add_argument("--trace-memory", action="store_true", help="Report the tracemalloc peak (slows the run)")
+    parser.add_argument("--output", default=None, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        companies = synthetic_companies(args.synthetic)
+    elif args.companies:
+        with open(args.companies, encoding="utf-8") as f:
+            companies = [json.loads(line) for line in f if line.strip()]
+        companies = [{"company": c["company"], "company_url": c["company_url"], "include": c.get("include", [])} for c in companies]
+    else:
+        parser.error("either --companies or --synthetic is required")
+    if args.record and not args.cassette:
+        parser.error("--record requires --cassette")
+
+    graph, cassette = build(args, companies)
+    levels = [1] if args.record else [int(level) for level in args.concurrency.split(",")]
+
+    async def run_levels():
+        return [await run_level(graph, companies, level, args.trace_memory) for level in levels]
+
+    results = asyncio.run(run_levels())
+    if args.record:
+        cassette.save()
+
+    for result in results:
+        e2e = result["end_to_end"]
+        print(f"concurrency={result['concurrency']:>3}  runs/min={result['throughput_per_minute']:.1f}  "
+              f"p50={e2e['p50']:.2f}s  p95={e2e['p95']:.2f}s  p99={e2e['p99']:.2f}s  failures={result['failures']}")
+        for name, stats in result["nodes"].items():
+            print(f"    {name:<10} p50={stats['p50']:.3f}s  p95={stats['p95']:.3f}s  p99={stats['p99']:.3f}s")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Batch research of the companies in a JSONL file, e.g. `python -m company_researcher.batch in.jsonl out.jsonl`."""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+
+from company_researcher import checkpoint
+from company_researcher.config import Config
+from company_researcher.stream import ReportStream
+from company_researcher.utils import metrics
+from company_researcher.utils.clients import registry
+from company_researcher.utils.doc_store import DocumentStore, owned_by
+from company_researcher.utils.refresh import snapshot_content_ids
+
+
+def record_key(record):
+    """Identify a company across the input and output files."""
+    return record.get("company", "").strip().lower(), record.get("company_url", "").strip().lower()
+
+
+def load_completed(output_path):
+    """Return the keys of companies already written to the output file."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                completed.add(record_key(json.loads(line)))
+            except (json.JSONDecodeError, AttributeError):
+                # A partially written last line from an interrupted run, it will be researched again
+                continue
+    return completed
+
+
+def snapshot_name(record):
+    """Return the name identifying a company's snapshot."""
+    return hashlib.sha256(json.dumps(record_key(record)).encode("utf-8")).hexdigest()[:32]
+
+
+def snapshot_path(snapshot_dir, record):
+    """Return the file a company's snapshot is kept in."""
+    return os.path.join(snapshot_dir, f"{snapshot_name(record)}.json")
+
+
+def snapshot_owner(record):
+    """Owner the content of a company's snapshot is pinned to in the DocumentStore."""
+    return f"snapshot:{snapshot_name(record)}"
+
+
+def load_snapshot(snapshot_dir, record):
+    """Return the snapshot of a previous run of the company, or None."""
+    path = snapshot_path(snapshot_dir, record)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_snapshot(snapshot_dir, record, snapshot):
+    """Atomically replaces the company's snapshot so an interrupted write never corrupts it."""
+    path = snapshot_path(snapshot_dir, record)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def pin_snapshot(documents, record, snapshot):
+    """Keep the content the company's snapshot refers to in the store, for as long as it is the current snapshot.
+
+    The content is exempt from the store's TTL, so a refresh can reuse it however long ago the snapshot was taken,
+    and the content only the replaced snapshot referred to becomes evictable again.
+    """
+    owner = snapshot_owner(record)
+    documents.release(owner)
+    documents.pin(owner, snapshot_content_ids(snapshot))
+
+
+def validate_record(record):
+    """Return why an input record can't be researched, or None if it is valid."""
+    if not isinstance(record, dict):
+        return "expected a JSON object"
+    for field in ("company", "company_url"):
+        if not isinstance(record.get(field), str) or not record[field].strip():
+            return f"missing '{field}'"
+    include = record.get("include", [])
+    if not isinstance(include, list) or not all(isinstance(item, str) for item in include):
+        return "'include' must be a list of strings"
+    return None
+
+
+def iter_records(input_path, completed, stats=None):
+    """Lazily yields input records that have not been researched yet.
+
+    Malformed lines and invalid records are logged and skipped (counted as `stats["invalid"]`), so one bad line
+    doesn't stop the batch.
+    """
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                error = f"invalid JSON ({e})"
+            else:
+                error = validate_record(record)
+            if error:
+                if stats is not None:
+                    stats["invalid"] = stats.get("invalid", 0) + 1
+                print(f"⚠️ Skipping line {line_number} of {input_path}: {error}")
+                continue
+            if record_key(record) in completed:
+                continue
+            yield record
+
+
+async def run_batch(input_path, output_path, graph=None, concurrency=None, resume=True, debug=False, on_token=None,
+                    snapshot_dir=None, checkpointer=None, documents=None):
+    """Researches every company in a JSONL file, running many graph invocations at once.
+
+    Records are streamed from the input file into a bounded queue consumed by `concurrency` workers, and each
+    report is appended to the output file as soon as it is finished, so results are written in completion order
+    and never held in memory. With `resume`, companies already present in the output file are skipped.
+    If `on_token(record, text)` is given, report tokens are passed to it as they are generated.
+    With `snapshot_dir`, each company's run is saved there and the next batch refreshes it incrementally,
+    only extracting and clustering sources that changed.
+    With a `checkpointer`, every company runs on its own checkpointed thread: a run that failed in an earlier batch
+    resumes from its last completed node, and the checkpoints of finished runs are deleted.
+    `documents` is the graph's DocumentStore (by default the one of the default Config), each run's content is
+    pinned in it while the run needs it, and the content of each company's latest snapshot until it is replaced.
+    """
+    if graph is None and checkpointer is not None:
+        from company_researcher.graph import build_graph, cfg, utils
+        graph = build_graph(cfg, utils, checkpointer=checkpointer)
+    elif graph is None:
+        from company_researcher.graph import graph
+    concurrency = concurrency or Config().BATCH_CONCURRENCY
+    documents = documents or DocumentStore.from_config(Config())
+    completed = load_completed(output_path) if resume else set()
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    write_lock = asyncio.Lock()
+    stats = {"completed": 0, "failed": 0, "skipped": len(completed), "invalid": 0}
+    if snapshot_dir:
+        os.makedirs(snapshot_dir, exist_ok=True)
+
+    async def run_once(graph_inputs, record, owner):
+        """Run the graph without checkpoints, pinning the run's content to `owner`."""
+        with owned_by(owner):
+            if on_token:
+                stream = ReportStream(graph, graph_inputs)
+                async for token in stream:
+                    on_token(record, token)
+                return {"report": stream.report, "snapshot": stream.snapshot}
+            return await graph.ainvoke(graph_inputs)
+
+    async def worker(out):
+        while True:
+            record = await queue.get()
+            try:
+                if record is None:
+                    return
+                inputs = {
+                    "company": record["company"],
+                    "company_url": record["company_url"],
+                    "include": record.get("include", []),
+                }
+                previous = load_snapshot(snapshot_dir, record) if snapshot_dir else None
+                thread_id = checkpoint.thread_id_for(inputs)
+                run_owner = f"run:{thread_id}"
+                try:
+                    graph_inputs = {**inputs, "previous": previous} if previous else inputs
+                    if checkpointer is not None:
+                        result = await checkpoint.run_or_resume(
+                            graph, graph_inputs, thread_id,
+                            on_token=(lambda token, record=record: on_token(record, token)) if on_token else None)
+                    else:
+                        result = await run_once(graph_inputs, record, run_owner)
+                except Exception as e:
+                    documents.release(run_owner)
+                    stats["failed"] += 1
+                    print(f"🚫 Research failed for '{record['company']}': {e}")
+                    continue
+                # The graph returns None when writing failed without producing any output
+                result = result or {}
+                if not result.get("report"):
+                    # Not written as completed, so the next batch researches the company again
+                    stats["failed"] += 1
+                    if checkpointer is not None:
+                        # Keep the thread, the next batch retries just the failed step
+                        print(f"🚫 No report was generated for '{record['company']}', it will resume from its "
+                              f"checkpoint")
+                    else:
+                        documents.release(run_owner)
+                        print(f"🚫 No report was generated for '{record['company']}'")
+                    continue
+                # Pin the snapshot's content before the run's pins are released, so it is never evictable in between
+                if snapshot_dir and result.get("snapshot"):
+                    save_snapshot(snapshot_dir, record, result["snapshot"])
+                    pin_snapshot(documents, record, result["snapshot"])
+                if checkpointer is not None:
+                    await checkpoint.delete_thread(checkpointer, thread_id, documents)
+                else:
+                    documents.release(run_owner)
+                async with write_lock:
+                    out.write(json.dumps({**inputs, "report": result["report"]}) + "\n")
+                    out.flush()
+                stats["completed"] += 1
+                if debug:
+                    print(f"Finished '{record['company']}' ({stats['completed']} completed)")
+            finally:
+                queue.task_done()
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+        workers = [asyncio.create_task(worker(out)) for _ in range(concurrency)]
+        for record in iter_records(input_path, completed, stats):
+            await queue.put(record)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    return stats
+
+
+def main():
+    """Run the batch command line."""
+    parser = argparse.ArgumentParser(description="Research many companies from a JSONL file.")
+    parser.add_argument("input", help="JSONL file with one {company, company_url, include} record per line")
+    parser.add_argument("output", help="JSONL file the reports are appended to")
+    parser.add_argument("--concurrency", type=int, default=None, help="Maximum number of concurrent graph runs")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of skipping finished companies")
+    parser.add_argument("--snapshot-dir", default=None,
+                        help="Keep per-company snapshots here and refresh previously researched companies incrementally")
+    parser.add_argument("--checkpoint", default=None, metavar="PATH",
+                        help="SQLite file to checkpoint runs in, failed companies resume from their last completed step")
+    parser.add_argument("--metrics-output", default=None, help="Write per-node timing, token and credit metrics as JSON")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            if args.checkpoint:
+                async with checkpoint.open_checkpointer(args.checkpoint) as checkpointer:
+                    return await run_batch(args.input, args.output, concurrency=args.concurrency,
+                                           resume=not args.no_resume, debug=args.debug, snapshot_dir=args.snapshot_dir,
+                                           checkpointer=checkpointer)
+            return await run_batch(args.input, args.output, concurrency=args.concurrency,
+                                   resume=not args.no_resume, debug=args.debug, snapshot_dir=args.snapshot_dir)
+        finally:
+            await registry.aclose()
+
+    stats = asyncio.run(run())
+    if args.metrics_output:
+        with open(args.metrics_output, "w", encoding="utf-8") as f:
+            f.write(metrics.recorder.to_json())
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Durable checkpointing, so an interrupted run resumes from its last completed node."""
+
+import hashlib
+import json
+import os
+from contextlib import asynccontextmanager
+
+from company_researcher.config import Config
+from company_researcher.stream import ReportStream
+from company_researcher.utils.doc_store import DocumentStore, owned_by
+
+OUTPUT_KEYS = ("report", "snapshot")
+# The pydantic models stored in ResearchState, which the checkpoint serializer is allowed to restore
+STATE_TYPES = [
+    ("company_researcher.nodes.cluster", "Cluster"),
+    ("company_researcher.utils.tavily_utils", "TavilyQuery"),
+    ("company_researcher.state", "ResearchSnapshot"),
+]
+
+
+@asynccontextmanager
+async def open_checkpointer(path):
+    """Open a durable SQLite checkpointer stored at `path`, used as an async context manager.
+
+    Requires the optional `langgraph-checkpoint-sqlite` package (`pip install tavily_company_researcher[checkpoint]`).
+    """
+    try:
+        import aiosqlite
+        from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError as e:
+        raise ImportError("Durable checkpointing requires the optional 'langgraph-checkpoint-sqlite' package, "
+                          "install it with `pip install langgraph-checkpoint-sqlite`") from e
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    async with aiosqlite.connect(path) as conn:
+        yield AsyncSqliteSaver(conn, serde=JsonPlusSerializer(allowed_msgpack_modules=STATE_TYPES))
+
+
+def thread_id_for(inputs):
+    """Derive a stable thread ID from a run's inputs, so a retried run finds the checkpoints of the failed one."""
+    key = [inputs.get("company", "").strip().lower(), inputs.get("company_url", "").strip().lower(),
+           sorted(inputs.get("include") or [])]
+    return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()[:32]
+
+
+def thread_owner(thread_id):
+    """Return the document store owner pinning the content a checkpointed thread refers to."""
+    return f"thread:{thread_id}"
+
+
+def thread_config(thread_id):
+    """Return the graph config of a checkpointed thread."""
+    return {"configurable": {"thread_id": thread_id}}
+
+
+async def run_or_resume(graph, inputs, thread_id=None, on_token=None):
+    """Run the graph on a checkpointed thread, resuming from the last completed node if the thread was interrupted.
+
+    A thread whose run already finished returns its output without running again, unless it finished without a
+    report because writing failed, in which case only the write step is retried. `graph` must be compiled with a
+    checkpointer, see `build_graph(cfg, utils, checkpointer=...)`. If `on_token(text)` is given, report tokens
+    are passed to it as they are generated.
+    """
+    thread_id = thread_id or thread_id_for(inputs)
+    # The thread's extracted content stays in the document store until the thread is deleted
+    with owned_by(thread_owner(thread_id)):
+        return await _run_or_resume(graph, inputs, thread_config(thread_id), on_token)
+
+
+async def _run_or_resume(graph, inputs, config, on_token):
+    thread = config
+    state = await graph.aget_state(config)
+    graph_inputs = inputs
+    if state.values and not state.next:
+        if state.values.get("report"):
+            return {key: state.values.get(key) for key in OUTPUT_KEYS}
+        # The write node reports its errors instead of raising, so retry from the checkpoint taken before it
+        async for snapshot in graph.aget_state_history(config):
+            if "write" in snapshot.next:
+                config, graph_inputs = snapshot.config, None
+                break
+        else:
+            return {key: state.values.get(key) for key in OUTPUT_KEYS}
+    elif state.next:
+        # A pending thread continues from its last checkpoint, so the nodes that already finished aren't paid for twice
+        graph_inputs = None
+    if on_token:
+        stream = ReportStream(graph, graph_inputs, config)
+        async for token in stream:
+            on_token(token)
+        return {"report": stream.report, "snapshot": stream.snapshot}
+    await graph.ainvoke(graph_inputs, config)
+    # Read the output from the thread's latest checkpoint, ainvoke returns None when writing produced no output
+    state = await graph.aget_state(thread)
+    return {key: state.values.get(key) for key in OUTPUT_KEYS}
+
+
+async def delete_thread(checkpointer, thread_id, documents=None):
+    """Remove a finished thread's checkpoints to keep the checkpoint database small, and release its content.
+
+    `documents` is the graph's DocumentStore, by default the one of the default Config.
+    """
+    await checkpointer.adelete_thread(thread_id)
+    (documents or DocumentStore.from_config(Config())).release(thread_owner(thread_id))
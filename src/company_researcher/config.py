@@ -1,4 +1,5 @@
-from langchain_openai import ChatOpenAI
+from company_researcher.utils.clients import registry
+
 
 # Description: Configuration file
 class Config:
@@ -9,8 +10,96 @@ class Config:
         self.MAX_SEARCH_QUERIES = 6
         self.DEFAULT_CLUSTER_SIZE = 10
         self.RERANK_TIMEOUT = 3
+        self.RERANK_MODE = "race"  # 'cohere', 'bm25' or 'race' (Cohere with an instant BM25 fallback)
         self.MAX_PROMPT_LENGTH = 350000
-        self.MAX_DOC_LENGTH = 8000
-        self.BASE_LLM = ChatOpenAI(model="gpt-4o-mini", temperature=0.2, max_tokens=2000)
-        self.FACTUAL_LLM = ChatOpenAI(model="gpt-4o-mini", temperature=0.0, max_tokens=2000)
-        self.DEBUG = False
\ No newline at end of file
+        self.MAX_DOC_LENGTH = 50000  # characters stored per extracted page, prompts only get its best passages
+        # Prompts carry the passages of each page that best match the report sections and include items
+        self.PASSAGE_SELECTION = True
+        self.PROMPT_DOC_LENGTH = 8000  # characters of each page in prompts when PASSAGE_SELECTION is off
+        self.PASSAGE_SIZE = 800  # characters
+        self.WRITE_TOKEN_BUDGET = 12000  # tokens of passages in the write prompt
+        self.WRITE_SECTION_TOKEN_BUDGET = 3000  # tokens of passages per section in 'sections' write mode
+        self.GROUNDING_TOKEN_BUDGET = 2000  # tokens of grounding passages in the query and cluster prompts
+        # Tavily extract scheduling: batches adapt to observed latency, failing batches are retried then bisected
+        self.EXTRACT_CONCURRENCY = 4
+        self.EXTRACT_MAX_BATCH_SIZE = 20
+        self.EXTRACT_TARGET_BATCH_LATENCY = 10.0  # seconds
+        self.EXTRACT_MAX_RETRIES = 2
+        self.EXTRACT_URL_DEADLINE = 45.0  # seconds
+        # Process search results as each query completes, abandoning searches still running after the deadline
+        self.SEARCH_STREAMING = True
+        self.SEARCH_DEADLINE = 30.0  # seconds
+        # Optionally also abandon stragglers once this fraction of the searches finished, e.g. 0.75 (None disables it)
+        self.SEARCH_QUORUM = None
+        self.SEARCH_STRAGGLER_GRACE = 0.5  # grace period for stragglers, as a fraction of the time the quorum took
+        # Follow-up searches for requested include items that the first searches didn't cover
+        self.COVERAGE_MAX_ROUNDS = 2
+        self.COVERAGE_MAX_CREDITS = 6  # Tavily credits spent on follow-up searches per company
+        self.NEAR_DUPLICATE_THRESHOLD = 0.8  # estimated Jaccard similarity of search snippets
+        # Local pre-clustering, documents in between the two similarity thresholds are left to the LLM
+        self.LOCAL_CLUSTER_ENABLED = True
+        self.LOCAL_CLUSTER_HIGH_SIMILARITY = 0.35
+        self.LOCAL_CLUSTER_LOW_SIMILARITY = 0.05
+        self.CLUSTER_SNIPPET_LENGTH = 300  # characters of each search snippet shown to the cluster LLM
+        self.CLUSTER_SHARD_MAX_CHARS = 24000  # characters of document lines per clustering call, larger sets are sharded
+        self.CLUSTER_SHARD_RETRIES = 1  # a shard failing after its retries is clustered locally instead
+        # Extract likely-chosen URLs while searches are arriving and the cluster LLM call is in flight
+        self.SPECULATIVE_ENRICH = True
+        self.SPECULATIVE_MAX_URLS = 10
+        # 'single' writes the report in one LLM call, 'sections' writes each section concurrently from its own documents
+        self.WRITE_MODE = "single"
+        self.WRITE_SECTION_DOCS = 6  # documents selected per section in 'sections' mode
+        # LLM clients are created lazily by the shared client registry on first use
+        self.BASE_LLM_KWARGS = dict(model="gpt-4o-mini", temperature=0.2, max_tokens=2000)
+        self.FACTUAL_LLM_KWARGS = dict(model="gpt-4o-mini", temperature=0.0, max_tokens=2000, stream_usage=True)
+        self._llm_overrides = {}
+        self.DEBUG = False
+        # Persistent cache for Tavily search/extract responses
+        self.CACHE_ENABLED = True
+        self.CACHE_PATH = ".cache/company_researcher.sqlite"
+        self.CACHE_MAX_SIZE = 256 * 1024 * 1024  # bytes
+        self.SEARCH_CACHE_TTL = 24 * 60 * 60  # seconds
+        self.EXTRACT_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+        # Memoize structured LLM calls (search queries, clusters) with identical model, schema and prompt
+        self.LLM_CACHE_ENABLED = True
+        self.LLM_CACHE_TTL = 24 * 60 * 60  # seconds
+        # Content-addressed store for extracted page content, graph state only references it by ID
+        self.DOC_STORE_PATH = ".cache/documents.sqlite"
+        self.DOC_STORE_MAX_SIZE = 1024 * 1024 * 1024  # bytes
+        # Seconds unpinned content is kept, content of live runs, threads and current snapshots never expires
+        self.DOC_STORE_TTL = 7 * 24 * 60 * 60
+        # Number of companies researched at once by the batch runner
+        self.BATCH_CONCURRENCY = 8
+        # Seconds the research service keeps serving a finished report to identical requests
+        self.SERVICE_RESULT_TTL = 300
+        self.SERVICE_MAX_RESULTS = 1000  # finished reports kept in memory at most
+        # Provider limits shared by every node and concurrent run in the process (requests/tokens per minute)
+        self.RATE_LIMITS = {
+            "tavily": {"rpm": 1000},
+            "openai": {"rpm": 5000, "tpm": 2_000_000},
+            "cohere": {"rpm": 1000},
+        }
+        self.RATE_LIMIT_MAX_RETRIES = 3  # retries of a rate-limited (HTTP 429) call
+        # Hedge slow grounding extracts and searches with a second request once they exceed a latency percentile
+        self.HEDGE_ENABLED = True
+        self.HEDGE_PERCENTILE = 95
+        self.HEDGE_MIN_SAMPLES = 20  # latencies observed before the percentile replaces HEDGE_DEFAULT_DELAY
+        self.HEDGE_DEFAULT_DELAY = 5.0  # seconds
+
+    @property
+    def BASE_LLM(self):
+        """The model of the research steps, shared through the client registry unless overridden."""
+        return self._llm_overrides.get("base_llm") or registry.chat_model("base_llm", **self.BASE_LLM_KWARGS)
+
+    @BASE_LLM.setter
+    def BASE_LLM(self, llm):
+        self._llm_overrides["base_llm"] = llm
+
+    @property
+    def FACTUAL_LLM(self):
+        """The model writing the report, shared through the client registry unless overridden."""
+        return self._llm_overrides.get("factual_llm") or registry.chat_model("factual_llm", **self.FACTUAL_LLM_KWARGS)
+
+    @FACTUAL_LLM.setter
+    def FACTUAL_LLM(self, llm):
+        self._llm_overrides["factual_llm"] = llm
@@ -1,44 +1,58 @@
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
 
 from company_researcher.config import Config
 from company_researcher.state import InputState, OutputState, ResearchState
-from company_researcher.nodes import GroundAgent, ResearchAgent, ClusterAgent, RerankAgent, EnrichAgent, WriteAgent
+from company_researcher.nodes import GroundAgent, ResearchAgent, CoverageAgent, ClusterAgent, RerankAgent, EnrichAgent, WriteAgent
 from company_researcher.utils.all import Utils
-from company_researcher.router import cluster_router, rerank_router
-
-
+from company_researcher.router import coverage_router, cluster_router, rerank_router
+from company_researcher.utils.metrics import instrument
+
+
+def build_graph(cfg, utils, checkpointer=None):
+    """Build and compile the research workflow for the given configuration and utilities.
+
+    With a `checkpointer`, the state is saved after every node so a failed run can be resumed by thread ID, see
+    `company_researcher.checkpoint`.
+    """
+    # Initialize agents
+    ground_agent = GroundAgent(cfg, utils)
+    research_agent = ResearchAgent(cfg, utils)
+    coverage_agent = CoverageAgent(cfg, utils)
+    cluster_agent = ClusterAgent(cfg, utils)
+    rerank_agent = RerankAgent(cfg, utils)
+    enrich_agent = EnrichAgent(cfg, utils)
+    write_agent = WriteAgent(cfg, utils)
+
+    # Define a Langchain graph
+    workflow = StateGraph(ResearchState, input=InputState, output=OutputState)
+
+    # Add node for each agent
+    workflow.add_node('ground', instrument('ground', ground_agent.run))
+    workflow.add_node('seed', instrument('seed', research_agent.seed))
+    workflow.add_node('research', instrument('research', research_agent.run))
+    workflow.add_node('coverage', instrument('coverage', coverage_agent.run))
+    workflow.add_node('cluster', instrument('cluster', cluster_agent.run))
+    workflow.add_node('rerank', instrument('rerank', rerank_agent.run))
+    workflow.add_node('enrich', instrument('enrich', enrich_agent.run))
+    workflow.add_node('write', instrument('write', write_agent.run))
+
+    # Set up edges, the searches that don't need grounding data run alongside it
+    workflow.add_edge(START, 'ground')
+    workflow.add_edge(START, 'seed')
+    workflow.add_edge(['ground', 'seed'], 'research')
+    workflow.add_edge('research', 'coverage')
+    workflow.add_conditional_edges('coverage', coverage_router)
+    workflow.add_conditional_edges('cluster', cluster_router)
+    workflow.add_conditional_edges('rerank', rerank_router)
+    workflow.add_edge('enrich', 'write')
+    workflow.add_edge('write', END)
+
+    compiled = workflow.compile(checkpointer=checkpointer)
+    compiled.name = "Tavily Company Researcher"
+    return compiled
+
+
+# Provider clients are created lazily on first use, so building the graph is cheap
 cfg = Config()
-utils = Utils()
-
-# Initialize agents
-ground_agent = GroundAgent(cfg, utils)
-research_agent = ResearchAgent(cfg, utils)
-cluster_agent = ClusterAgent(cfg, utils)
-rerank_agent = RerankAgent(cfg, utils)
-enrich_agent = EnrichAgent(cfg, utils)
-write_agent = WriteAgent(cfg, utils)
-
-# Define a Langchain graph
-workflow = StateGraph(ResearchState, input=InputState, output=OutputState)
-
-# Add node for each agent
-workflow.add_node('ground', ground_agent.run)
-workflow.add_node('research', research_agent.run)
-workflow.add_node('cluster', cluster_agent.run)
-workflow.add_node('rerank', rerank_agent.run)
-workflow.add_node('enrich', enrich_agent.run)
-workflow.add_node('write', write_agent.run)
-
-# Set up edges
-workflow.add_edge('ground', 'research')
-workflow.add_edge('research', 'cluster')
-workflow.add_conditional_edges('cluster', cluster_router)
-workflow.add_conditional_edges('rerank', rerank_router)
-workflow.add_edge('enrich', 'write')
-workflow.add_edge('write', END)
-
-# Set up start node
-workflow.set_entry_point('ground')
-
-graph = workflow.compile()
-graph.name = "Tavily Company Researcher"
+utils = Utils(cfg)
+graph = build_graph(cfg, utils)
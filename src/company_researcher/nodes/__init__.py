@@ -1,6 +1,9 @@
 from .ground import GroundAgent
 from .research import ResearchAgent
+from .coverage import CoverageAgent
 from .cluster import ClusterAgent
 from .rerank import RerankAgent
 from .enrich import EnrichAgent
-from .write import WriteAgent
\ No newline at end of file
+from .write import WriteAgent
+
+__all__ = ["GroundAgent", "ResearchAgent", "CoverageAgent", "ClusterAgent", "RerankAgent", "EnrichAgent", "WriteAgent"]
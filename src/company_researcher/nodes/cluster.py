@@ -1,7 +1,14 @@
+import asyncio
 import json
 from pydantic import BaseModel, Field
 from typing import List
-from langchain_core.messages import AnyMessage, AIMessage, SystemMessage, HumanMessage, ToolMessage
+from langchain_core.messages import SystemMessage
+
+from company_researcher.utils.dedup import deduplicate_documents, domain_suffixes, is_primary_source, url_domain
+from company_researcher.utils.local_cluster import LocalClusterer, is_same_site, normalize_company_name
+from company_researcher.utils import metrics
+from company_researcher.utils.llm_utils import invoke_structured
+from company_researcher.utils.report_sections import report_queries
 
 class Cluster(BaseModel):
     company_name: str = Field(
@@ -16,14 +23,203 @@ class Cluster(BaseModel):
 class Clusters(BaseModel):
     clusters: List[Cluster] = Field(default_factory=list, description="List of clusters")
 
+class CompactCluster(BaseModel):
+    """A cluster referring to documents by their line IDs, which keeps the LLM output short."""
+
+    company_name: str = Field(
+        ...,
+        description="The name or identifier of the company these documents belong to."
+    )
+    ids: List[int] = Field(
+        ...,
+        description="The IDs of the documents relevant to the identified company."
+    )
+
+class CompactClusters(BaseModel):
+    """The compact clusters found in one shard of documents."""
+
+    clusters: List[CompactCluster] = Field(default_factory=list, description="List of clusters")
+
 class ClusterAgent:
     def __init__(self, cfg, utils):
         self.cfg = cfg
         self.utils = utils
+        self.local_clusterer = LocalClusterer(high_similarity=cfg.LOCAL_CLUSTER_HIGH_SIMILARITY,
+                                              low_similarity=cfg.LOCAL_CLUSTER_LOW_SIMILARITY)
 
-    async def cluster(self, state):
-        target_domain = state.company_url.split("//")[-1].split("/")[0]
+    def local_labels(self, state):
+        """Labels each document as 'target', 'other' or 'undecided' without calling the LLM."""
+        grounding_data = self.utils.documents.resolve_all(state.grounding_data)
+        grounding_texts = [doc.get("raw_content") or "" for doc in grounding_data.values()]
+        return self.local_clusterer.classify(state.company, state.company_url, grounding_texts, state.research_data)
+
+    async def cluster(self, state, labels=None):
+        """Clusters documents locally where the answer is obvious and asks the LLM only about the rest."""
+        if not self.cfg.LOCAL_CLUSTER_ENABLED:
+            return await self.llm_cluster(state)
+
+        if labels is None:
+            labels = self.local_labels(state)
+        target_urls = [url for url, label in labels.items() if label == "target"]
+        other_urls = [url for url, label in labels.items() if label == "other"]
+        undecided_urls = [url for url, label in labels.items() if label == "undecided"]
+        msg = (f"Local clustering placed {len(target_urls)} documents in the target cluster, {len(other_urls)} in "
+               f"'Ambiguous' and left {len(undecided_urls)} for the LLM\n")
+
+        if not undecided_urls:
+            if not target_urls:
+                return [], msg
+            return self.merge_clusters(state.company, [], target_urls, other_urls), msg
+
+        undecided_state = state.model_copy(
+            update={"research_data": {url: state.research_data[url] for url in undecided_urls}})
+        clusters, llm_msg = await self.llm_cluster(undecided_state)
+        if not clusters and not target_urls:
+            return [], msg + llm_msg
+        return self.merge_clusters(state.company, clusters, target_urls, other_urls), msg + llm_msg
+
+    @staticmethod
+    def find_target_cluster(company, clusters):
+        """Return the cluster named after the target company, or None."""
+        company_key = normalize_company_name(company)
+        names = [normalize_company_name(c.company_name) for c in clusters]
+        target = next((c for c, name in zip(clusters, names) if name == company_key), None)
+        if target is None:
+            # Fall back to a looser match, e.g. 'Tavily AI' for 'Tavily'
+            target = next((c for c, name in zip(clusters, names)
+                           if name and name != "ambiguous" and (company_key in name or name in company_key)), None)
+        return target
+
+    def merge_clusters(self, company, clusters, target_urls, other_urls):
+        """Folds the locally clustered URLs into the LLM clusters, keeping the target company's cluster first."""
+        clusters = [cluster.model_copy(deep=True) for cluster in clusters]
+        target = self.find_target_cluster(company, clusters)
+        if target is None:
+            target = Cluster(company_name=company, urls=[])
+        else:
+            clusters.remove(target)
+        target.urls = target_urls + [url for url in target.urls if url not in target_urls]
+        clusters.insert(0, target)
+        if other_urls:
+            ambiguous = next((c for c in clusters if c.company_name.lower() == "ambiguous"), None)
+            if ambiguous is None:
+                ambiguous = Cluster(company_name="Ambiguous", urls=[])
+                clusters.append(ambiguous)
+            ambiguous.urls += [url for url in other_urls if url not in ambiguous.urls]
+        return [cluster for cluster in clusters if cluster.urls]
+
+    async def refresh_clusters(self, state, labels):
+        """Keep the previous run's cluster assignments for unchanged documents and only cluster the new ones.
 
+        Returns None when the previous clusters can't be reused, in which case everything is clustered again.
+        """
+        previous = state.previous
+        if not previous.clusters or previous.chosen_cluster >= len(previous.clusters):
+            return None
+        changed = set(state.changed_urls)
+        clusters = [
+            Cluster(company_name=cluster.company_name,
+                    urls=[url for url in cluster.urls if url in state.research_data and url not in changed])
+            for cluster in previous.clusters
+        ]
+        chosen = clusters[previous.chosen_cluster]
+        if not chosen.urls:
+            return None
+
+        # Unchanged documents the previous run left out of every cluster stay out
+        assigned = {url for cluster in clusters for url in cluster.urls}
+        new_urls = [url for url in state.research_data
+                    if url not in assigned and (url in changed or url not in previous.research_data)]
+        msg = f"♻️ Kept the previous clusters for {len(assigned)} documents, clustering {len(new_urls)} new documents\n"
+        if new_urls:
+            new_state = state.model_copy(update={"research_data": {url: state.research_data[url] for url in new_urls}})
+            new_clusters, cluster_msg = await self.cluster(new_state, {url: labels[url] for url in new_urls if url in labels})
+            msg += cluster_msg
+            target = self.find_target_cluster(state.company, new_clusters)
+            for new_cluster in new_clusters:
+                existing = chosen if new_cluster is target else next(
+                    (c for c in clusters if c.company_name.lower() == new_cluster.company_name.lower()), None)
+                if existing is None:
+                    clusters.append(new_cluster)
+                else:
+                    existing.urls += [url for url in new_cluster.urls if url not in existing.urls]
+
+        # Keep the chosen cluster first, like a fresh clustering does
+        clusters.remove(chosen)
+        clusters.insert(0, chosen)
+        return [cluster for cluster in clusters if cluster.urls], msg
+
+    def document_lines(self, urls, documents):
+        """Encode documents compactly as 'ID | domain | snippet' lines, IDs being positions in `urls`."""
+        limit = self.cfg.CLUSTER_SNIPPET_LENGTH
+        lines = []
+        for index, url in enumerate(urls):
+            snippet = " ".join((documents[url].get("content") or "").split())
+            if len(snippet) > limit:
+                snippet = snippet[:limit].rsplit(" ", 1)[0] + "..."
+            lines.append(f"{index} | {url_domain(url)} | {snippet}")
+        return lines
+
+    @staticmethod
+    def shard_lines(lines, max_chars):
+        """Split the document lines into consecutive shards of at most `max_chars` characters (at least one line each)."""
+        shards = []
+        current, size = [], 0
+        for line in lines:
+            if current and size + len(line) + 1 > max_chars:
+                shards.append(current)
+                current, size = [], 0
+            current.append(line)
+            size += len(line) + 1
+        if current:
+            shards.append(current)
+        return shards
+
+    @staticmethod
+    def expand_clusters(compact_clusters, urls, allowed_ids=None):
+        """Map the document IDs returned by the LLM back to URLs, ignoring unknown and repeated IDs.
+
+        With `allowed_ids`, IDs of documents outside the clustered shard are ignored too.
+        """
+        clusters = []
+        seen = set()
+        for compact in compact_clusters:
+            cluster_urls = []
+            for index in compact.ids:
+                if 0 <= index < len(urls) and index not in seen and (allowed_ids is None or index in allowed_ids):
+                    seen.add(index)
+                    cluster_urls.append(urls[index])
+            clusters.append(Cluster(company_name=compact.company_name, urls=cluster_urls))
+        return clusters
+
+    @staticmethod
+    def reduce_clusters(company, company_url, shard_clusters):
+        """Merge the clusters found in each shard into one set of clusters by company identity.
+
+        Clusters with the same normalized company name are merged, and so are all clusters holding documents from
+        the target company's domain, so the target company ends up in one cluster even if shards named it
+        differently (e.g. 'Tavily' and 'Tavily AI').
+        """
+        target_domain = url_domain(company_url)
+        company_key = normalize_company_name(company)
+        merged = {}
+        for clusters in shard_clusters:
+            for cluster in clusters:
+                name = normalize_company_name(cluster.company_name)
+                key = name
+                if name == company_key or (name != "ambiguous" and any(
+                        is_same_site(url_domain(url), target_domain) for url in cluster.urls)):
+                    key = ("target",)
+                if key not in merged:
+                    merged[key] = Cluster(company_name=cluster.company_name, urls=[])
+                elif key == ("target",) and name == company_key:
+                    merged[key].company_name = cluster.company_name
+                merged[key].urls += [url for url in cluster.urls if url not in merged[key].urls]
+        return [cluster for cluster in merged.values() if cluster.urls]
+
+    def cluster_prompt(self, state, grounding, document_lines):
+        """Return the prompt asking the LLM to cluster one shard of document lines."""
+        target_domain = state.company_url.split("//")[-1].split("/")[0]
         prompt = (
             f"We conducted a search for a company called '{state.company}', but the results may include documents from other companies with similar names or domains.\n"
             f"Your task is to accurately categorize these retrieved documents based on which specific company they pertain to, using the initial company information as 'ground truth.'\n\n"
@@ -31,12 +227,13 @@ class ClusterAgent:
             f"- **Company Name**: '{state.company}'\n"
             f"- **Primary Domain**: '{target_domain}'\n"
             f"- **Initial Context (Ground Truth)**: Information below should act as a verification baseline. Use it to confirm that the document content aligns directly with {state.company}.\n"
-            f"- **{json.dumps(state.grounding_data)}**\n\n"
+            f"- **{grounding}**\n\n"
             f"### Retrieved Documents for Clustering\n"
-            f"Below are the retrieved documents, including URLs and brief content snippets:\n"
-            f"{[{'url': doc['url'], 'snippet': doc['content']} for doc in state.research_data.values()]}\n\n"
+            f"Below are the retrieved documents, one per line as 'ID | domain | snippet':\n"
+            f"{document_lines}\n\n"
             f"### Clustering Instructions\n"
-            f"- **Primary Domain Priority**: Documents with URLs containing '{target_domain}' should be prioritized for the main cluster for '{state.company}'.\n"
+            f"- **Refer to Documents by ID**: List each cluster's documents by their numeric IDs only.\n"
+            f"- **Primary Domain Priority**: Documents with domains containing '{target_domain}' should be prioritized for the main cluster for '{state.company}'.\n"
             f"- **Include Relevant Third-Party Sources**: Documents from third-party domains (e.g., news sites, industry reports) should also be included in the '{state.company}' cluster if they provide specific information about '{state.company}', reference '{target_domain}', or closely match the initial company context.\n"
         )
 
@@ -54,22 +251,15 @@ class ClusterAgent:
             f"    'clusters': [\n"
             f"        {{\n"
             f"            'company_name': 'Name of Company A',\n"
-            f"            'urls': [\n"
-            f"                'http://example.com/doc1',\n"
-            f"                'http://example.com/doc2'\n"
-            f"            ]\n"
+            f"            'ids': [0, 1]\n"
             f"        }},\n"
             f"        {{\n"
             f"            'company_name': 'Name of Company B',\n"
-            f"            'urls': [\n"
-            f"                'http://example.com/doc3'\n"
-            f"            ]\n"
+            f"            'ids': [2]\n"
             f"        }},\n"
             f"        {{\n"
             f"            'company_name': 'Ambiguous',\n"
-            f"            'urls': [\n"
-            f"                'http://example.com/doc4'\n"
-            f"            ]\n"
+            f"            'ids': [3]\n"
             f"        }}\n"
             f"    ]\n"
             f"}}\n\n"
@@ -77,42 +267,144 @@ class ClusterAgent:
             f"- **Focus on Relevant Content**: Documents that contain relevant references to '{state.company}' (even from third-party domains) should be clustered with '{state.company}' if they align well with the initial information and context provided.\n"
             f"- **Identify Ambiguities**: Any documents without clear relevance to '{state.company}' should be placed in the 'Ambiguous' cluster for manual review.\n"
         )
+        return prompt
+
+    async def cluster_shard(self, state, grounding, urls, lines):
+        """Clusters one shard of document lines, whose IDs index into `urls`."""
+        prompt = self.cluster_prompt(state, grounding, "\n".join(lines))
         prompt = prompt[:self.cfg.MAX_PROMPT_LENGTH]
+        metrics.increment_attribute("prompt_chars", len(prompt))
         if self.cfg.DEBUG:
             print(prompt)
-        try:
-            messages = [SystemMessage(content=prompt)]
-            response = await self.cfg.BASE_LLM.with_structured_output(Clusters).ainvoke(messages)
-            clusters = response.clusters  # Access the structured clusters directly
-            return clusters, ""
-        except Exception as e:
-            msg = f"🚫 Error accrued during clustering: {str(e)}\n"
-            clusters = []
-            return clusters, msg
+        messages = [SystemMessage(content=prompt)]
+        response = await invoke_structured(self.cfg.BASE_LLM, CompactClusters, messages,
+                                           cache=self.utils.llm_cache, ttl=self.cfg.LLM_CACHE_TTL)
+        return self.expand_clusters(response.clusters, urls, self.line_ids(lines))
+
+    @staticmethod
+    def line_ids(lines):
+        """Return the document IDs of encoded document lines."""
+        return {int(line.split(" | ", 1)[0]) for line in lines}
+
+    async def retry_shard(self, state, grounding, urls, lines):
+        """Cluster one shard with the LLM, retrying up to CLUSTER_SHARD_RETRIES times."""
+        for attempt in range(self.cfg.CLUSTER_SHARD_RETRIES + 1):
+            try:
+                return await self.cluster_shard(state, grounding, urls, lines)
+            except Exception:
+                if attempt == self.cfg.CLUSTER_SHARD_RETRIES:
+                    raise
+
+    def fallback_clusters(self, state, urls):
+        """Clusters the documents of a shard the LLM failed on without it, so they aren't dropped.
+
+        Documents local clustering attributes to the target company go to its cluster, the others to 'Ambiguous'.
+        """
+        shard_state = state.model_copy(update={"research_data": {url: state.research_data[url] for url in urls}})
+        labels = self.local_labels(shard_state)
+        target_urls = [url for url in urls if labels.get(url) == "target"]
+        clusters = [Cluster(company_name=state.company, urls=target_urls),
+                    Cluster(company_name="Ambiguous", urls=[url for url in urls if url not in target_urls])]
+        return [cluster for cluster in clusters if cluster.urls]
+
+    async def llm_cluster(self, state):
+        """Clusters the documents with the LLM, in concurrent shards when they don't fit in one prompt.
+
+        Every shard is clustered with the same instructions and grounding data, then the shard clusters are merged
+        by company (see `reduce_clusters`), so no document is cut off by the prompt length limit. When only some
+        shards fail, their documents are clustered locally (see `fallback_clusters`).
+        """
+        urls = list(state.research_data)
+        lines = self.document_lines(urls, state.research_data)
+        grounding = json.dumps(self.utils.prompt_documents(state.grounding_data, report_queries(state.include),
+                                                           self.cfg.GROUNDING_TOKEN_BUDGET))
+        # Room left for the document lines once the instructions and grounding data are in the prompt
+        room = self.cfg.MAX_PROMPT_LENGTH - len(self.cluster_prompt(state, grounding, ""))
+        shards = self.shard_lines(lines, max(min(self.cfg.CLUSTER_SHARD_MAX_CHARS, room), 1))
+        metrics.set_attribute("cluster_shards", len(shards))
+        results = await asyncio.gather(*[self.retry_shard(state, grounding, urls, shard) for shard in shards],
+                                       return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        msg = f"Clustered {len(urls)} documents in {len(shards)} shards\n" if len(shards) > 1 else ""
+        if errors:
+            msg += f"🚫 Error accrued during clustering: {str(errors[0])}\n"
+        if len(errors) == len(results):
+            return [], msg
+        shard_clusters = []
+        for shard, result in zip(shards, results):
+            if isinstance(result, Exception):
+                shard_urls = [urls[index] for index in sorted(self.line_ids(shard))]
+                msg += f"Clustered the {len(shard_urls)} documents of a failed shard locally\n"
+                result = self.fallback_clusters(state, shard_urls)
+            shard_clusters.append(result)
+        if len(shard_clusters) == 1:
+            return shard_clusters[0], msg
+        return self.reduce_clusters(state.company, state.company_url, shard_clusters), msg
 
     # Define the function to automatically choose the correct cluster, can add in the future manual selection support
     async def choose_cluster(self, company_url, clusters):
         chosen_cluster = 0
         msg = ""
+        # Index every domain (and parent domain) to the first cluster containing it
+        domain_index = {}
         for index, cluster in enumerate(clusters):
-            # Check if any URL in the cluster starts with the company URL
-            if any(company_url in url for url in cluster.urls):
-                chosen_cluster = index
-                break
+            for url in cluster.urls:
+                for domain in domain_suffixes(url_domain(url)):
+                    domain_index.setdefault(domain, index)
+        target_domain = url_domain(company_url)
+        if target_domain in domain_index:
+            chosen_cluster = domain_index[target_domain]
         if clusters:
             cluster = clusters[chosen_cluster]
             msg = f"Automatically selected cluster: {cluster.company_name} with the following urls: {cluster.urls}\n"
         return chosen_cluster, msg
 
+    def speculate(self, state, labels):
+        """Start extracting the URLs most likely to end up in the chosen cluster before clustering finishes."""
+        # A refresh must extract changed pages again, prefetches would serve them from the extract cache
+        if not self.cfg.SPECULATIVE_ENRICH or state.previous is not None:
+            return state.speculative_urls, ""
+        candidates = [url for url, label in labels.items() if label == "target"]
+        candidates += [url for url in state.research_data
+                       if url not in candidates and is_primary_source(url, state.company_url)]
+        # Documents carried over from a previous run are already extracted, and the research node may have started
+        # extracting some of the company's pages while its searches were still arriving
+        already_started = set(state.speculative_urls)
+        candidates = [url for url in candidates
+                      if not state.research_data[url].get("raw_content_id") and url not in already_started]
+        limit = max(self.cfg.SPECULATIVE_MAX_URLS - len(already_started), 0)
+        speculative_urls = self.utils.prefetcher.prefetch(candidates[:limit])
+        msg = f"⚡ Speculatively extracting {len(speculative_urls)} documents\n" if speculative_urls else ""
+        return state.speculative_urls + speculative_urls, msg
+
+    def deduplicate(self, state):
+        """Drop URL variants and near-duplicate documents, returning the kept documents and the dropped URLs."""
+        research_data, dropped = deduplicate_documents(state.research_data, threshold=self.cfg.NEAR_DUPLICATE_THRESHOLD)
+        msg = f"🧹 Removed {len(dropped)} duplicate documents before clustering\n" if dropped else ""
+        return research_data, dropped, msg
 
     async def run(self, state):
         msg = "📊 Beginning clustering process...\n"
         if self.cfg.DEBUG:
             print(msg)
-        clusters, cluster_msg = await self.cluster(state)
+        research_data, dropped, dedup_msg = self.deduplicate(state)
+        state = state.model_copy(update={"research_data": research_data})
+        if self.cfg.DEBUG and dedup_msg:
+            print(dedup_msg)
+        labels = self.local_labels(state) if self.cfg.LOCAL_CLUSTER_ENABLED else {}
+        speculative_urls, speculate_msg = self.speculate(state, labels)
+        refreshed = await self.refresh_clusters(state, labels) if state.previous is not None else None
+        if refreshed is not None:
+            clusters, cluster_msg = refreshed
+        else:
+            clusters, cluster_msg = await self.cluster(state, labels)
         if self.cfg.DEBUG:
             print(cluster_msg)
         chosen_cluster, choose_msg = await self.choose_cluster(state.company_url, clusters)
         if self.cfg.DEBUG:
             print(choose_msg)
-        return {"clusters": clusters, "chosen_cluster": chosen_cluster, "messages": msg + cluster_msg + choose_msg}
+        metrics.set_attribute("documents", len(research_data))
+        metrics.set_attribute("clusters", len(clusters))
+        return {"research_data": {url: None for url in dropped}, "clusters": clusters, "chosen_cluster": chosen_cluster,
+                "speculative_urls": speculative_urls,
+                "messages": msg + dedup_msg + speculate_msg + cluster_msg + choose_msg}
@@ -0,0 +1,69 @@
+"""The node searching again for the requested include items the research hasn't covered yet."""
+
+from company_researcher.utils import metrics, refresh
+from company_researcher.utils.coverage import CoverageChecker, search_terms
+from company_researcher.utils.tavily_utils import TavilyQuery, normalize_query
+
+
+class CoverageAgent:
+    """Checks which include items the documents cover and plans follow-up searches for the rest."""
+
+    def __init__(self, cfg, utils):
+        """Use the graph's configuration and shared helpers."""
+        self.cfg = cfg
+        self.utils = utils
+
+    def follow_up_queries(self, state, missing):
+        """Build one targeted query per missing include item, skipping queries that were already searched."""
+        # Later rounds search deeper for whatever the basic searches didn't find
+        search_depth = "basic" if state.coverage_rounds == 0 else "advanced"
+        searched = {(normalize_query(query.query), query.search_depth) for query in state.search_queries}
+        queries = [TavilyQuery(query=f"{state.company} {search_terms(item)}", search_depth=search_depth) for item in missing]
+        return [query for query in queries if (normalize_query(query.query), query.search_depth) not in searched]
+
+    async def run(self, state):
+        """Run one coverage round, searching for the missing items if the round budget allows."""
+        documents = self.utils.documents.resolve_all({**state.research_data, **state.grounding_data})
+        covered, missing = CoverageChecker(state.include, state.company_url).check(documents)
+        metrics.set_attribute("covered", len(covered))
+        metrics.set_attribute("missing", len(missing))
+        done = {"coverage_missing": missing, "coverage_complete": True}
+        if not state.include:
+            return done
+        if not missing:
+            return {**done, "messages": f"✅ Found all requested information: {', '.join(covered)}\n"}
+
+        budget = self.cfg.COVERAGE_MAX_CREDITS - state.coverage_credits
+        queries = []
+        if state.coverage_rounds < self.cfg.COVERAGE_MAX_ROUNDS:
+            for query in self.follow_up_queries(state, missing):
+                cost = 2 if query.search_depth == "advanced" else 1
+                if cost <= budget:
+                    queries.append(query)
+                    budget -= cost
+        if not queries:
+            return {**done, "messages": f"⚠️ No follow-up searches left, still missing: {', '.join(missing)}\n"}
+
+        msg = (f"🎯 Missing {', '.join(missing)}, running follow-up searches (round {state.coverage_rounds + 1}):\n"
+               + "\n".join(f'"{query.query}"' for query in queries) + "\n")
+        if self.cfg.DEBUG:
+            print(msg)
+        research_data = await self.utils.tavily.search(queries, state.research_data, use_cache=state.previous is None)
+        new_documents = {url: doc for url, doc in research_data.items() if url not in state.research_data}
+        changed_urls = list(new_documents)
+        if state.previous is not None:
+            new_documents, changed_urls = refresh.carry_over(
+                state.previous.research_data, new_documents,
+                is_available=lambda content_id: self.utils.documents.get(content_id) is not None)
+        msg += f"Found {len(new_documents)} new documents\n"
+        metrics.set_attribute("search_queries", len(queries))
+        return {
+            "research_data": new_documents,
+            "search_queries": queries,
+            "changed_urls": state.changed_urls + changed_urls,
+            "coverage_missing": missing,
+            "coverage_rounds": state.coverage_rounds + 1,
+            "coverage_credits": self.cfg.COVERAGE_MAX_CREDITS - budget,
+            "coverage_complete": False,
+            "messages": msg,
+        }
@@ -1,3 +1,6 @@
+from company_researcher.utils import metrics
+
+
 class EnrichAgent:
     def __init__(self, cfg, utils):
         self.cfg = cfg
@@ -9,8 +12,28 @@ class EnrichAgent:
         msg = f"🚀 Enriching documents for selected cluster '{chosen_cluster.company_name}'...\n"
         if self.cfg.DEBUG:
             print(msg)
-        research_data, extract_msg = await self.utils.tavily.extract(chosen_cluster.urls, state.research_data)
+
+        # Reuse documents that were speculatively extracted while clustering, and drop the ones we don't need
+        speculative_urls = set(state.speculative_urls)
+        prefetched = await self.utils.prefetcher.take([url for url in chosen_cluster.urls if url in speculative_urls])
+        wasted = [url for url in state.speculative_urls if url not in chosen_cluster.urls]
+        self.utils.prefetcher.discard(wasted)
+        if speculative_urls:
+            msg += f"⚡ Speculative enrichment: {len(prefetched)} prefetched documents used, {len(wasted)} wasted\n"
+
+        # Documents carried over from a previous run already have their content extracted
+        remaining_urls = [url for url in chosen_cluster.urls
+                          if url not in prefetched and not state.research_data.get(url, {}).get("raw_content_id")]
+        if len(remaining_urls) < len(chosen_cluster.urls) - len(prefetched):
+            msg += f"♻️ Reusing {len(chosen_cluster.urls) - len(prefetched) - len(remaining_urls)} documents extracted in the previous run\n"
+        research_data, extract_msg = await self.utils.tavily.extract(remaining_urls, state.research_data,
+                                                                     use_cache=state.previous is None)
+        for url, doc in prefetched.items():
+            research_data[url] = {**research_data.get(url, {}), 'raw_content_id': doc['raw_content_id']}
         if self.cfg.DEBUG:
             print(extract_msg)
-        return {"research_data": research_data, "messages": msg + extract_msg}
-
+        metrics.set_attribute("documents", len(chosen_cluster.urls))
+        metrics.set_attribute("prefetched_used", len(prefetched))
+        metrics.set_attribute("prefetched_wasted", len(wasted))
+        updated = {url: research_data[url] for url in chosen_cluster.urls if url in research_data}
+        return {"research_data": updated, "speculative_urls": [], "messages": msg + extract_msg}
@@ -1,3 +1,7 @@
+from company_researcher.utils import metrics
+from company_researcher.utils.hedge import hedged
+
+
 class GroundAgent:
     def __init__(self, cfg, utils):
         self.cfg = cfg
@@ -7,15 +11,37 @@ class GroundAgent:
         msg = f"🔗 Initiating initial grounding for company '{state.company}'...\n"
         if self.cfg.DEBUG:
             print(msg)
-        grounding_data, extract_msg = await self.utils.tavily.extract([state.company_url], state.grounding_data)
-        if self.cfg.DEBUG:
-            print(extract_msg)
-        if not grounding_data:
-            grounding_data, extract_msg = await self.utils.tavily.extract([state.company_url], state.grounding_data,
-                                                                          extract_depth="advanced")
+        # A refresh must see the current website, not a cached copy
+        use_cache = state.previous is None
+
+        def extract(extract_depth):
+            return self.utils.tavily.extract([state.company_url], state.grounding_data, extract_depth=extract_depth,
+                                             use_cache=use_cache)
+
+        if self.cfg.HEDGE_ENABLED:
+            # Start the advanced extract when the basic one is empty or slower than usual, whichever comes first
+            grounding_data, extract_msg = await hedged(
+                lambda: extract("basic"), lambda: extract("advanced"), self.utils.tavily.hedge_delay("extract:basic"),
+                is_good=lambda result: bool(result[0]))
+            if self.cfg.DEBUG:
+                print(extract_msg)
+        else:
+            grounding_data, extract_msg = await extract("basic")
             if self.cfg.DEBUG:
-                print("Used advanced grounding")
-        return {"grounding_data": grounding_data, "messages": msg + extract_msg}
+                print(extract_msg)
+            if not grounding_data:
+                grounding_data, extract_msg = await extract("advanced")
+                if self.cfg.DEBUG:
+                    print("Used advanced grounding")
+        metrics.set_attribute("documents", len(grounding_data))
+
+        grounding_changed = True
+        if state.previous is not None:
+            content_ids = {url: doc.get("raw_content_id") for url, doc in grounding_data.items()}
+            previous_ids = {url: doc.get("raw_content_id") for url, doc in state.previous.grounding_data.items()}
+            grounding_changed = not grounding_data or content_ids != previous_ids
+            extract_msg += "♻️ Grounding data changed since the previous run\n" if grounding_changed else "♻️ Grounding data unchanged since the previous run\n"
+        return {"grounding_data": grounding_data, "grounding_changed": grounding_changed, "messages": msg + extract_msg}
 
 
 
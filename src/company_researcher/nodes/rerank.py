@@ -1,33 +1,59 @@
-import cohere
 import asyncio
 
 from company_researcher.nodes.cluster import Cluster
+from company_researcher.utils.bm25 import BM25
+from company_researcher.utils import metrics
+from company_researcher.utils.clients import registry
+from company_researcher.utils.rate_limit import limiter
 
 
 class RerankAgent:
     def __init__(self, cfg, utils):
         self.cfg = cfg
         self.utils = utils
-        self.co = cohere.AsyncClient()
+
+    @property
+    def co(self):
+        """The shared Cohere client."""
+        return registry.cohere
 
     async def rerank_documents(self, query, documents, top_n, timeout):
         """Performs reranking of documents using Cohere."""
         try:
-            response = await asyncio.wait_for(
-                self.co.rerank(
-                    query=query,
-                    documents=documents,
-                    top_n=top_n,
-                    return_documents=False,
-                ),
-                timeout=timeout,
-            )
+            async with metrics.provider_call("cohere"):
+                response = await asyncio.wait_for(
+                    limiter.call("cohere", lambda: self.co.rerank(
+                        query=query,
+                        documents=documents,
+                        top_n=top_n,
+                        return_documents=False,
+                    )),
+                    timeout=timeout,
+                )
             return response.results
         except asyncio.TimeoutError:
             raise TimeoutError("Timeout occurred during reranking")
         except Exception as e:
             raise RuntimeError(f"Unexpected error during reranking: {e}")
 
+    def bm25_rerank(self, query, documents, top_n):
+        """Ranks documents locally with BM25, returning the indices of the top_n best matches."""
+        return [index for index, score in BM25(documents).top_n(query, top_n)]
+
+    async def race_rerank(self, query, documents, top_n, timeout):
+        """Races Cohere against the local BM25 ranking.
+
+        Cohere's ranking is preferred when it arrives within the timeout; if it errors or times out, the
+        BM25 ranking computed concurrently is used immediately instead of dropping the clusters.
+        """
+        bm25_task = asyncio.create_task(asyncio.to_thread(self.bm25_rerank, query, documents, top_n))
+        try:
+            results = await self.rerank_documents(query=query, documents=documents, top_n=top_n, timeout=timeout)
+            bm25_task.cancel()
+            return [r.index for r in results], "Cohere", ""
+        except (TimeoutError, RuntimeError) as e:
+            return await bm25_task, "BM25", f"Cohere reranking failed ({e}), falling back to BM25\n"
+
     def create_cluster(self, company_name, urls):
         """Creates a Cluster object from company name and URLs."""
         return Cluster(
@@ -51,24 +77,37 @@ class RerankAgent:
             top_n = self.cfg.DEFAULT_CLUSTER_SIZE
             timeout = self.cfg.RERANK_TIMEOUT
 
-            rerank_results = await self.rerank_documents(
-                query=query,
-                documents=documents,
-                top_n=top_n,
-                timeout=timeout,
-            )
+            if self.cfg.RERANK_MODE == "bm25":
+                indices, reranker = self.bm25_rerank(query, documents, top_n), "BM25"
+            elif self.cfg.RERANK_MODE == "race":
+                indices, reranker, fallback_msg = await self.race_rerank(query, documents, top_n, timeout)
+                msg += fallback_msg
+            else:
+                rerank_results = await self.rerank_documents(
+                    query=query,
+                    documents=documents,
+                    top_n=top_n,
+                    timeout=timeout,
+                )
+                indices, reranker = [r.index for r in rerank_results], "Cohere"
+
+            metrics.set_attribute("reranker", reranker)
+            metrics.set_attribute("documents", len(documents))
 
             # Process results
             urls = []
-            msg += "Top documents selected:\n"
-            for r in rerank_results:
-                original_result = data[r.index]
+            msg += f"Top documents selected by {reranker}:\n"
+            for index in indices:
+                original_result = data[index]
                 msg += f"{original_result['url']}\n"
                 urls.append(original_result["url"])
 
+            if not urls:
+                return {"messages": msg + "🚫 No relevant documents found while reranking"}
+
             # Create and return cluster
             cluster = self.create_cluster(state.company, urls)
-            return {"clusters": [cluster], "messages": msg}
+            return {"clusters": [cluster], "chosen_cluster": 0, "messages": msg}
 
         except TimeoutError:
             return {"messages": "🚫 Timeout occurred while reranking research data"}
@@ -1,7 +1,10 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
-from langchain_core.messages import AnyMessage, AIMessage, SystemMessage, HumanMessage, ToolMessage
+from langchain_core.messages import SystemMessage
 from company_researcher.utils.tavily_utils import TavilySearchInput, TavilyQuery
+from company_researcher.utils import metrics, refresh
+from company_researcher.utils.coverage import CoverageChecker
+from company_researcher.utils.dedup import canonicalize_url, is_primary_source
+from company_researcher.utils.llm_utils import invoke_structured
+from company_researcher.utils.report_sections import report_queries
 
 class ResearchAgent:
     def __init__(self, cfg, utils):
@@ -23,19 +26,21 @@ class ResearchAgent:
                 f"- **Financials**: Look for information on funding rounds, revenue, financial growth, recent investments, and performance metrics.\n\n"
             )
 
-            if state.include:
+            # Only ask about the requested information the grounding data and the seed searches don't already cover
+            documents = self.utils.documents.resolve_all({**state.research_data, **state.grounding_data})
+            _, missing = CoverageChecker(state.include, state.company_url).check(documents)
+            if missing:
                 prompt += (
                     f"### Required Information to Include:\n"
                     f"- You are tasked with ensuring the following specific types of information are covered in the report, as specified by the user:\n"
-                    f"{', '.join(state.include)}\n"
-                    # f"- Prioritize missing information: Check the grounding data and identify any missing elements from the required information to include.\n"
-                    f"- Generate a search query only for the information that is missing from the provided grounding data.\n"
+                    f"{', '.join(missing)}\n"
+                    f"- This information is missing from the grounding data and the first search results, generate a search query for each item.\n"
                 )
 
             prompt += (
                 f"### Grounding Data:\n"
                 f"Use the grounding data provided from the company's website below to ensure queries are closely tied to **{state.company}** and reflect its latest context:\n"
-                f"{state.grounding_data}\n\n"
+                f"{self.utils.prompt_documents(state.grounding_data, report_queries(state.include), self.cfg.GROUNDING_TOKEN_BUDGET)}\n\n"
                 f"### Additional Guidance:\n"
             )
 
@@ -54,18 +59,103 @@ class ResearchAgent:
             if self.cfg.DEBUG:
                 print(prompt)
             messages = [SystemMessage(content=prompt)]
-            response = await self.cfg.BASE_LLM.with_structured_output(TavilySearchInput).ainvoke(messages)
+            response = await invoke_structured(self.cfg.BASE_LLM, TavilySearchInput, messages,
+                                              cache=self.utils.llm_cache, ttl=self.cfg.LLM_CACHE_TTL)
             return response.sub_queries, msg
         except Exception as e:
             msg = f"🚫 An error occurred during search queries generation: {str(e)}"
             return [TavilyQuery(query=f"Company {state.company}", search_depth="advanced")], msg
 
+    def can_reuse_queries(self, state):
+        """Return whether the previous run's search queries still apply."""
+        previous = state.previous
+        return (previous is not None and previous.search_queries and not state.grounding_changed
+                and sorted(previous.include) == sorted(state.include))
+
+    def seed_queries(self, state):
+        """Return the queries independent of the grounding data: the company's LinkedIn page and a plain name search."""
+        return [
+            TavilyQuery(query=f'{state.company} company', search_depth="advanced", include_domains=['linkedin.com/company']),
+            TavilyQuery(query=state.company, search_depth="basic"),
+        ]
+
+    async def seed(self, state):
+        """Run the seed queries while the grounding data is being extracted."""
+        queries = self.seed_queries(state)
+        msg = "🔎 Tavily Searching while grounding ...\n" + "\n".join(f'"{query.query}"' for query in queries) + "\n"
+        if self.cfg.DEBUG:
+            print(msg)
+        if self.cfg.SEARCH_STREAMING:
+            research_data, speculative_urls, stream_msg = await self.stream_search(state, queries)
+            msg += stream_msg
+        else:
+            research_data = await self.utils.tavily.search(queries, {}, use_cache=state.previous is None)
+            speculative_urls = []
+        metrics.set_attribute("search_queries", len(queries))
+        metrics.set_attribute("documents", len(research_data))
+        return {"messages": msg, "search_queries": queries, "research_data": research_data,
+                "speculative_urls": speculative_urls}
+
+    async def stream_search(self, state, sub_queries):
+        """Search the queries, starting to extract the company's own pages as soon as their results arrive.
+
+        Searches that straggle past SEARCH_DEADLINE (or behind SEARCH_QUORUM of the others, if set) are abandoned.
+        """
+        # Documents carried over from a previous run are usually extracted already
+        prefetch = self.cfg.SPECULATIVE_ENRICH and state.previous is None
+        arrived = {}
+        speculative_urls = []
+        async for index, results in self.utils.tavily.search_stream(
+                sub_queries, use_cache=state.previous is None, deadline=self.cfg.SEARCH_DEADLINE,
+                quorum=self.cfg.SEARCH_QUORUM, grace=self.cfg.SEARCH_STRAGGLER_GRACE):
+            arrived[index] = results
+            room = self.cfg.SPECULATIVE_MAX_URLS - len(state.speculative_urls) - len(speculative_urls)
+            if prefetch and room > 0:
+                primary_urls = [result["url"] for result in results
+                                if result.get("url") and result["url"] not in state.research_data
+                                and is_primary_source(result["url"], state.company_url)]
+                speculative_urls += self.utils.prefetcher.prefetch(primary_urls[:room])
+
+        # Deduplicate in query order, so the documents (and the prompts built from them) don't depend on timing
+        research_data = dict(state.research_data)
+        seen = {canonicalize_url(url) for url in research_data}
+        for index in sorted(arrived):
+            research_data.update(self.utils.tavily.new_results(arrived[index], seen))
+        msg = ""
+        if len(arrived) < len(sub_queries):
+            msg += f"\n⏱️ Abandoned {len(sub_queries) - len(arrived)} slow searches"
+        if speculative_urls:
+            msg += f"\n⚡ Speculatively extracting {len(speculative_urls)} documents from the company's own pages"
+        return research_data, speculative_urls, msg
+
     async def run(self, state):
-        sub_queries, msg = await self.generate_queries(state)
-        sub_queries.append(TavilyQuery(query=f'{state.company} company', search_depth="advanced", include_domains=['linkedin.com/company']))
+        if self.can_reuse_queries(state):
+            sub_queries = list(state.previous.search_queries)
+            msg = "♻️ Reusing the search queries of the previous run\n"
+        else:
+            sub_queries, msg = await self.generate_queries(state)
+        # The seed queries were already searched alongside grounding
+        searched = self.utils.tavily.unique_queries(state.search_queries)
+        sub_queries = self.utils.tavily.unique_queries(searched + sub_queries)[len(searched):]
         print(sub_queries)
         msg += "🔎 Tavily Searching ...\n" + "\n".join(f'"{query.query}"' for query in sub_queries)
         if self.cfg.DEBUG:
             print(msg)
-        research_data = await self.utils.tavily.search(sub_queries, state.research_data)
-        return {"messages": msg, "search_queries": sub_queries, "research_data": research_data}
+        if self.cfg.SEARCH_STREAMING:
+            research_data, speculative_urls, stream_msg = await self.stream_search(state, sub_queries)
+            msg += stream_msg
+        else:
+            research_data = await self.utils.tavily.search(sub_queries, state.research_data,
+                                                           use_cache=state.previous is None)
+            speculative_urls = []
+        changed_urls = list(research_data)
+        if state.previous is not None:
+            research_data, changed_urls = refresh.carry_over(
+                state.previous.research_data, research_data,
+                is_available=lambda content_id: self.utils.documents.get(content_id) is not None)
+            msg += f"\n♻️ {len(changed_urls)} new or changed documents, {len(research_data) - len(changed_urls)} unchanged since the previous run\n"
+        metrics.set_attribute("search_queries", len(sub_queries))
+        metrics.set_attribute("documents", len(research_data))
+        updated = {url: doc for url, doc in research_data.items() if state.research_data.get(url) != doc}
+        return {"messages": msg, "search_queries": sub_queries, "research_data": updated, "changed_urls": changed_urls,
+                "speculative_urls": state.speculative_urls + speculative_urls}
@@ -1,5 +1,23 @@
+import asyncio
 from datetime import datetime
-from langchain_core.messages import AnyMessage, AIMessage, SystemMessage, HumanMessage, ToolMessage
+
+from langchain_core.messages import SystemMessage
+from langgraph.config import get_stream_writer
+
+from company_researcher.utils import metrics, rate_limit, refresh
+from company_researcher.utils.llm_utils import stream_text
+from company_researcher.utils.passages import PassageIndex, truncate_documents
+from company_researcher.utils.report_sections import SectionPlanner, assemble_report, report_footer, report_header, report_queries, section_heading
+
+SECTION_UNAVAILABLE = "Information for this section is currently unavailable."
+
+
+def report_writer():
+    """Return the graph's custom stream writer, or one that drops the events when running outside a graph."""
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda event: None
 
 
 class WriteAgent:
@@ -7,7 +25,35 @@ class WriteAgent:
         self.cfg = cfg
         self.utils = utils
 
+    def report_documents(self, state):
+        """Return the documents the report is written from."""
+        if state.clusters:
+            return {key: state.research_data[key] for key in state.clusters[state.chosen_cluster].urls
+                    if key in state.research_data}
+        return state.research_data
+
     async def run(self, state):
+        # Enrich claims the speculative prefetches, when it was skipped (no clusters) nothing will use them
+        if state.speculative_urls:
+            self.utils.prefetcher.discard(state.speculative_urls)
+            metrics.set_attribute("prefetched_wasted", len(state.speculative_urls))
+        report_documents_hash = refresh.documents_hash(state.include, state.grounding_data, self.report_documents(state))
+        previous = state.previous
+        if previous is not None and previous.report and previous.documents_hash == report_documents_hash:
+            msg = "♻️ No sources changed since the previous run, reusing its report\n"
+            if self.cfg.DEBUG:
+                print(msg)
+            return {"report": previous.report, "messages": msg,
+                    "snapshot": refresh.build_snapshot(state, previous.report, report_documents_hash)}
+
+        # Writing is the last step of the report, so its calls go ahead of queued research and speculative work
+        with rate_limit.priority(rate_limit.CRITICAL):
+            if self.cfg.WRITE_MODE == "sections":
+                return await self.write_sections(state, report_documents_hash)
+            return await self.write_report(state, report_documents_hash)
+
+    async def write_report(self, state, report_documents_hash):
+        """Write the whole report with a single LLM call."""
         report_title = f"{state.company} Company Report"
         report_date = datetime.now().strftime('%B %d, %Y')
 
@@ -70,12 +116,14 @@ class WriteAgent:
         )
 
         # Dynamically generate the "Documents to Base the Report On" section
+        # Only the passages most relevant to the report sections and include items are kept, within the token budget
+        queries = report_queries(state.include)
         if state.clusters:
             # Use cluster-specific research data
             documents = "\n".join(
-                f"- {state.research_data[key]}"
-                for key in state.clusters[state.chosen_cluster].urls
-                if key in state.research_data
+                f"- {doc}"
+                for doc in self.utils.prompt_documents(self.report_documents(state), queries,
+                                                       self.cfg.WRITE_TOKEN_BUDGET).values()
             )
             prompt += (
                 f"### Documents to Base the Report On:\n"
@@ -84,8 +132,10 @@ class WriteAgent:
             )
         else:
             # Use all available research data
-            grounding_data_content = "\n".join(f"- {item}" for item in state.grounding_data.values())
-            research_data_content = "\n".join(f"- {item}" for item in state.research_data.values())
+            documents = self.utils.prompt_documents({**state.research_data, **state.grounding_data}, queries,
+                                                    self.cfg.WRITE_TOKEN_BUDGET)
+            grounding_data_content = "\n".join(f"- {documents[url]}" for url in state.grounding_data)
+            research_data_content = "\n".join(f"- {documents[url]}" for url in state.research_data if url not in state.grounding_data)
             prompt += (
                 f"### Documents to Base the Report On:\n"
                 f"#### Official Grounding Data:\n"
@@ -97,16 +147,106 @@ class WriteAgent:
             )
 
         prompt = prompt[:self.cfg.MAX_PROMPT_LENGTH]
+        metrics.set_attribute("prompt_chars", len(prompt))
         if self.cfg.DEBUG:
             print(prompt)
 
         try:
-            messages = [SystemMessage(content=prompt)]
-            response = await self.cfg.FACTUAL_LLM.ainvoke(messages)
-            report = response.content
-            return {"report": report}
+            report = await stream_text(self.cfg.FACTUAL_LLM, [SystemMessage(content=prompt)])
+            return {"report": report, "snapshot": refresh.build_snapshot(state, report, report_documents_hash)}
         except Exception as e:
             msg = f"🚫 Error generating report: {str(e)}"
             if self.cfg.DEBUG:
                 print(msg)
             return {"messages": msg}
+
+    async def write_section(self, state, index, section, documents, include, report_date):
+        """Write the body of one report section from the documents selected for it."""
+        prompt = (
+            f"You are an expert company researcher writing the **{section.title}** section of a fact-based report on the company **{state.company}**.\n"
+            f"The section must cover:\n"
+            f"{section.description}\n\n"
+            f"### Strict Guidelines:\n"
+            f"- Write ONLY the body of this section in Markdown, in well-structured paragraphs, not lists or bullet points. Do not add a title, heading or citations list.\n"
+            f"- You must only use the information provided in the documents listed below.\n"
+            f"- Do not make up or infer any details that are not explicitly stated in the provided sources.\n"
+            f"- If a required data point is not available in the provided documents, state that it is unavailable.\n"
+            f"- As of today, **{report_date}**, prioritize the most recent and updated source in cases where conflicting data points or metrics are found.\n"
+            f"- Support specific data points and metrics with **inline citations** as Markdown hyperlinks (e.g., Company X is an innovative leader in AI ([LinkedIn](https://linkedin.com))).\n"
+        )
+        if include:
+            prompt += f"- Make sure this section includes the following user-requested information, if available: {', '.join(include)}.\n"
+        prompt += (
+            "\n### Documents to Base the Section On:\n"
+            + "\n".join(f"- {doc}" for doc in documents)
+        )
+        prompt = prompt[:self.cfg.MAX_PROMPT_LENGTH]
+        metrics.increment_attribute("prompt_chars", len(prompt))
+        if self.cfg.DEBUG:
+            print(prompt)
+
+        # The tag lets ReportStream put the interleaved section tokens back in report order
+        text = await stream_text(self.cfg.FACTUAL_LLM, [SystemMessage(content=prompt)],
+                                 config={"tags": [f"section:{index}"]})
+        return text.strip()
+
+    async def write_sections(self, state, report_documents_hash):
+        """Write every report section concurrently, each from its own most relevant documents, and assemble them."""
+        report_title = f"{state.company} Company Report"
+        report_date = datetime.now().strftime('%B %d, %Y')
+        documents = self.utils.documents.resolve_all(self.report_documents(state))
+        grounding = self.utils.documents.resolve_all(state.grounding_data) if not state.clusters else {}
+        pool = {**documents, **grounding}
+        planner = SectionPlanner(documents, state.company, state.include)
+        passages = PassageIndex(pool, self.cfg.PASSAGE_SIZE) if self.cfg.PASSAGE_SELECTION else None
+        sections = planner.sections()
+        msg = f"✍️ Writing {len(sections)} report sections concurrently...\n"
+        if self.cfg.DEBUG:
+            print(msg)
+        # ReportStream puts these parts and the section tokens together into exactly the report assembled below
+        write_part = report_writer()
+        write_part({"report_text": report_header(report_title, report_date)})
+
+        async def write(index, section):
+            write_part({"report_text": section_heading(index + 1, section), "section": index})
+            try:
+                return await write_body(index, section)
+            except Exception:
+                write_part({"report_text": SECTION_UNAVAILABLE, "section": index})
+                raise
+            finally:
+                write_part({"section_done": index})
+
+        async def write_body(index, section):
+            urls = planner.urls_for(section, self.cfg.WRITE_SECTION_DOCS)
+            if section.use_grounding:
+                urls = [url for url in grounding if url not in urls] + urls
+            if passages is not None:
+                # Each section only gets the passages of its documents that match the section and its include items
+                queries = [f"{section.title} {section.query}"] + planner.include_for(section)
+                section_documents = list(passages.compact(queries, self.cfg.WRITE_SECTION_TOKEN_BUDGET, urls).values())
+            else:
+                section_documents = list(truncate_documents({url: pool[url] for url in urls},
+                                                            self.cfg.PROMPT_DOC_LENGTH).values())
+            return await self.write_section(state, index, section, section_documents, planner.include_for(section),
+                                            report_date)
+
+        results = await asyncio.gather(*[write(index, section) for index, section in enumerate(sections)],
+                                       return_exceptions=True)
+        bodies = []
+        for section, result in zip(sections, results):
+            if isinstance(result, Exception):
+                msg += f"🚫 Error writing the '{section.title}' section: {str(result)}\n"
+                bodies.append(SECTION_UNAVAILABLE)
+            else:
+                bodies.append(result)
+        metrics.set_attribute("sections", len(sections))
+        if all(isinstance(result, Exception) for result in results):
+            if self.cfg.DEBUG:
+                print(msg)
+            return {"messages": msg + "🚫 Error generating report"}
+
+        write_part({"report_text": report_footer(list(zip(sections, bodies)), documents)})
+        report = assemble_report(report_title, report_date, list(zip(sections, bodies)), documents)
+        return {"report": report, "messages": msg,
+                "snapshot": refresh.build_snapshot(state, report, report_documents_hash)}
@@ -1,5 +1,15 @@
 from typing import Literal
 
+def coverage_router(state) -> Literal["coverage", "cluster"]:
+    """Routes the workflow after the 'coverage' step.
+
+    Loops back for another round of follow-up searches until every requested item is found or the budget is spent.
+    """
+    if state.coverage_complete:
+        return "cluster"
+    else:
+        return "coverage"
+
 def cluster_router(state) -> Literal["enrich", "rerank"]:
     """Routes the workflow after the 'cluster' step.
 
@@ -0,0 +1,283 @@
+"""An HTTP service for company research that coalesces identical requests."""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from company_researcher.batch import validate_record
+from company_researcher.config import Config
+from company_researcher.stream import ReportStream
+from company_researcher.utils.clients import registry
+from company_researcher.utils.dedup import canonicalize_url
+from company_researcher.utils.doc_store import DocumentStore, owned_by
+
+
+def request_key(company, company_url, include=None):
+    """Identify requests that would produce the same report."""
+    return (
+        " ".join(company.lower().split()),
+        canonicalize_url(company_url.strip()),
+        tuple(sorted({" ".join(item.lower().split()) for item in include or []})),
+    )
+
+
+class ResearchRun:
+    """One graph run shared by every caller that asked for the same company while it was in flight.
+
+    Each progress event is kept, so callers that join late first receive everything published so far and then
+    follow the run live.
+    """
+
+    def __init__(self, key, inputs):
+        """Prepare the run of the graph on `inputs`, shared under `key`."""
+        self.key = key
+        self.inputs = inputs
+        self.events = []
+        self.subscribers = set()
+        self.done = asyncio.Event()
+        self.report = None
+        self.error = None
+        self.task = None
+
+    def publish(self, event):
+        """Send an event to every subscriber and keep it for later ones."""
+        self.events.append(event)
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+    def finish(self, report=None, error=None):
+        """Publish the final report or error and wake the callers waiting for it."""
+        self.report = report
+        self.error = error
+        self.publish({"type": "error", "error": error} if error else {"type": "report", "report": report})
+        self.done.set()
+        for queue in self.subscribers:
+            queue.put_nowait(None)
+
+    async def subscribe(self):
+        """Yield every event of the run, replaying the ones that were published before subscribing."""
+        queue = asyncio.Queue()
+        history = list(self.events)
+        live = not self.done.is_set()
+        if live:
+            self.subscribers.add(queue)
+        try:
+            for event in history:
+                yield event
+            if not live:
+                return
+            while True:
+                event = await queue.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            self.subscribers.discard(queue)
+
+
+class ResearchService:
+    """Serves research requests from a long-running process, coalescing identical requests.
+
+    Requests with the same normalized company, company URL and include list share a single in-flight graph run
+    (single-flight) and its streamed progress, and finished reports are served from a short-lived result cache,
+    so a burst of identical requests costs the providers one run.
+    """
+
+    def __init__(self, graph=None, result_ttl=None, documents=None, max_results=None):
+        """Serve runs of `graph`, the compiled company researcher by default."""
+        if graph is None:
+            from company_researcher.graph import graph
+        self.graph = graph
+        self.result_ttl = Config().SERVICE_RESULT_TTL if result_ttl is None else result_ttl
+        self.max_results = Config().SERVICE_MAX_RESULTS if max_results is None else max_results
+        # The graph's DocumentStore, each run's content is pinned in it until the run finishes
+        self.documents = documents or DocumentStore.from_config(Config())
+        self._inflight = {}
+        self._results = {}  # key -> (expires_at, report), in expiry order
+        self.stats = {"runs": 0, "coalesced": 0, "cache_hits": 0, "failed": 0}
+
+    def cached_report(self, key):
+        """Return the cached report for the request key, or None if there is none or it expired."""
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires_at, report = entry
+        if expires_at < time.monotonic():
+            del self._results[key]
+            return None
+        return report
+
+    def store_report(self, key, report):
+        """Cache a finished report, dropping expired reports and the oldest ones beyond `max_results`."""
+        now = time.monotonic()
+        self._results.pop(key, None)
+        self._results[key] = (now + self.result_ttl, report)
+        # Every report lives for the same TTL, so the oldest entries are the first to expire
+        for old_key, (expires_at, _) in list(self._results.items()):
+            if expires_at >= now and len(self._results) <= self.max_results:
+                break
+            del self._results[old_key]
+
+    def start(self, company, company_url, include=None):
+        """Return the in-flight run for the request, starting a new one if there is none."""
+        key = request_key(company, company_url, include)
+        run = self._inflight.get(key)
+        if run is not None:
+            self.stats["coalesced"] += 1
+            return run
+        run = self._inflight[key] = ResearchRun(key, {"company": company, "company_url": company_url,
+                                                      "include": list(include or [])})
+        self.stats["runs"] += 1
+        run.task = asyncio.create_task(self._execute(run))
+        return run
+
+    async def _execute(self, run):
+        owner = f"run:{uuid.uuid4().hex}"
+        try:
+            with owned_by(owner):
+                stream = ReportStream(self.graph, run.inputs,
+                                      on_message=lambda message: run.publish({"type": "message", "message": message}))
+                async for token in stream:
+                    run.publish({"type": "token", "text": token})
+            if stream.report is None:
+                raise RuntimeError(stream.messages[-1] if stream.messages else "no report was generated")
+        except Exception as e:
+            self.stats["failed"] += 1
+            run.finish(error=str(e))
+        else:
+            if self.result_ttl > 0 and self.max_results > 0:
+                self.store_report(run.key, stream.report)
+            run.finish(report=stream.report)
+        finally:
+            self.documents.release(owner)
+            self._inflight.pop(run.key, None)
+
+    async def stream(self, company, company_url, include=None):
+        """Yield the progress events of a request: 'message', 'token' and finally 'report' or 'error'."""
+        report = self.cached_report(request_key(company, company_url, include))
+        if report is not None:
+            self.stats["cache_hits"] += 1
+            yield {"type": "report", "report": report, "cached": True}
+            return
+        async for event in self.start(company, company_url, include).subscribe():
+            yield event
+
+    async def research(self, company, company_url, include=None):
+        """Return the report for a request, sharing the run with concurrent identical requests."""
+        report = self.cached_report(request_key(company, company_url, include))
+        if report is not None:
+            self.stats["cache_hits"] += 1
+            return report
+        run = self.start(company, company_url, include)
+        await run.done.wait()
+        if run.error:
+            raise RuntimeError(run.error)
+        return run.report
+
+
+class ResearchServer:
+    """Minimal HTTP front end for a ResearchService.
+
+    `POST /research` with a JSON body `{"company", "company_url", "include"}` streams the run's events as
+    newline-delimited JSON. `GET /stats` returns the coalescing statistics.
+    """
+
+    MAX_BODY_BYTES = 64 * 1024
+
+    def __init__(self, service, host="127.0.0.1", port=8000):
+        """Serve `service` on `host` and `port`."""
+        self.service = service
+        self.host = host
+        self.port = port
+
+    async def serve(self):
+        """Accept connections until cancelled."""
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"🌐 Serving company research on http://{self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    @staticmethod
+    async def respond(writer, status, body, content_type="application/json"):
+        """Send a complete response and let the connection close."""
+        payload = body.encode("utf-8")
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + payload)
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        """Serve one HTTP request."""
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2:
+                return await self.respond(writer, "400 Bad Request", json.dumps({"error": "malformed request"}))
+            method, path = request_line[0], request_line[1]
+
+            if method == "GET" and path == "/stats":
+                return await self.respond(writer, "200 OK", json.dumps(self.service.stats))
+            if method != "POST" or path != "/research":
+                return await self.respond(writer, "404 Not Found", json.dumps({"error": "not found"}))
+
+            try:
+                length = int(headers.get("content-length", 0))
+            except ValueError:
+                length = -1
+            if length < 0:
+                return await self.respond(writer, "400 Bad Request", json.dumps({"error": "invalid Content-Length"}))
+            if length > self.MAX_BODY_BYTES:
+                return await self.respond(writer, "413 Payload Too Large",
+                                          json.dumps({"error": "request body too large"}))
+            body = await reader.readexactly(length)
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError:
+                return await self.respond(writer, "400 Bad Request", json.dumps({"error": "expected a JSON body"}))
+            # Rejected here, the 200 status can't be taken back once the events are streaming
+            error = validate_record(request)
+            if error:
+                return await self.respond(writer, "400 Bad Request", json.dumps({"error": error}))
+            company, company_url = request["company"], request["company_url"]
+            include = request.get("include") or []
+
+            # Stream the events as they arrive, the end of the response is marked by closing the connection
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nConnection: close\r\n\r\n")
+            async for event in self.service.stream(company, company_url, include):
+                writer.write(json.dumps(event).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def main():
+    """Run the service from the command line."""
+    parser = argparse.ArgumentParser(description="Serve company research over HTTP, coalescing identical requests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--result-ttl", type=float, default=None, help="Seconds finished reports are served from memory")
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            await ResearchServer(ResearchService(result_ttl=args.result_ttl), args.host, args.port).serve()
+        finally:
+            await registry.aclose()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
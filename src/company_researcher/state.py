@@ -1,10 +1,37 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Union, List, Annotated
+import operator
+from typing import Any, Dict, Union, List, Annotated
 from langchain_core.messages import AnyMessage
 from langgraph.graph import add_messages
 
 from company_researcher.nodes.cluster import Cluster
-from company_researcher.utils.tavily_utils import TavilySearchInput, TavilyQuery
+from company_researcher.utils.tavily_utils import TavilyQuery
+
+def merge_documents(left: dict, right: dict) -> dict:
+    """Merge a node's document updates by URL, a None value removes the URL."""
+    merged = dict(left or {})
+    for url, doc in (right or {}).items():
+        if doc is None:
+            merged.pop(url, None)
+        else:
+            merged[url] = doc
+    return merged
+
+
+class ResearchSnapshot(BaseModel):
+    """The reusable parts of a finished run, passed back in as `previous` to refresh a company incrementally."""
+    company: str
+    company_url: str
+    include: List[str] = Field(default_factory=list)
+    grounding_data: Dict[str, Dict[str, Union[str, None]]] = Field(default_factory=dict)
+    research_data: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
+    search_queries: List[TavilyQuery] = Field(default_factory=list)
+    clusters: List[Cluster] = Field(default_factory=list)
+    chosen_cluster: int = 0
+    report: str = ""
+    documents_hash: str = ""
+    created_at: str | None = None
+
 
 class InputState(BaseModel):
     company: str = Field(
@@ -30,16 +57,33 @@ class InputState(BaseModel):
         ],
         default_factory=list
     )
+    previous: ResearchSnapshot | None = Field(
+        default=None,
+        description=(
+            "Optional snapshot of a previous run of the same company. When given, only new or changed sources "
+            "are extracted and clustered again, and the previous report is reused if nothing changed."
+        ),
+    )
 
 
 class OutputState(BaseModel):
     report: str = ""
+    snapshot: Dict[str, Any] | None = None
 
 class ResearchState(InputState, OutputState):
     grounding_data: Dict[str, Dict[str, Union[str, None]]] = Field(default_factory=dict)
-    research_data: Dict[str, Dict[str, Union[str, float, None]]] = Field(default_factory=dict)
+    # Nodes return only the documents they add or change (None drops one), so parallel branches can both add results
+    research_data: Annotated[Dict[str, Dict[str, Union[str, float, None]]], merge_documents] = Field(default_factory=dict)
     clusters: List[Cluster] = Field(default_factory=list)
     chosen_cluster: int = Field(default_factory=int)
-    search_queries: List[TavilyQuery] = Field(default_factory=list)
+    speculative_urls: List[str] = Field(default_factory=list)
+    grounding_changed: bool = True
+    changed_urls: List[str] = Field(default_factory=list)
+    coverage_missing: List[str] = Field(default_factory=list)
+    coverage_rounds: int = 0
+    coverage_credits: int = 0
+    coverage_complete: bool = False
+    search_queries: Annotated[List[TavilyQuery], operator.add] = Field(default_factory=list)
     messages: Annotated[List[AnyMessage], add_messages] = Field(default_factory=list)
+    metrics: Annotated[List[dict], operator.add] = Field(default_factory=list)
 
@@ -0,0 +1,110 @@
+"""Streaming of a graph run's report tokens."""
+
+
+class ReportStream:
+    """Streams the report tokens produced by the 'write' node of a graph run.
+
+    Iterating over the stream yields report text chunks as the LLM produces them. Once iteration is finished,
+    `report` holds the final report exactly as it appears in the graph's OutputState, `snapshot` the snapshot
+    for a later incremental refresh, and `messages` holds the progress messages emitted by every node.
+
+    When the report is written section by section, the sections are generated concurrently and their tokens
+    arrive interleaved. Tokens tagged `section:<i>` are therefore yielded in section order: the current section
+    streams live while later sections are buffered until every section before them has finished. The write node
+    sends the report's title, section headings and citations as custom stream events, so the concatenated stream
+    equals the final report.
+
+    If `on_message(text)` is given, it is called with each progress message as soon as its node finishes.
+
+    Example:
+        stream = ReportStream(graph, {"company": "Tavily", "company_url": "https://tavily.com/"})
+        async for token in stream:
+            print(token, end="", flush=True)
+        report = stream.report
+    """
+
+    def __init__(self, graph, inputs, config=None, node="write", on_message=None):
+        """Stream the report of `node` while running `graph` on `inputs`, passing other messages to `on_message`."""
+        self.graph = graph
+        self.inputs = inputs
+        self.config = config
+        self.node = node
+        self.on_message = on_message
+        self.report = None
+        self.snapshot = None
+        self.messages = []
+
+    @staticmethod
+    def section_index(metadata):
+        """Return the index of the report section a streamed LLM token belongs to, or None."""
+        for tag in metadata.get("tags") or []:
+            if tag.startswith("section:"):
+                return int(tag.split(":", 1)[1])
+        return None
+
+    async def __aiter__(self):
+        """Run the graph, yielding the report text as it is written."""
+        current = 0
+        buffers = {}
+        finished = set()
+        started = set()
+        trailing = {}
+
+        def body_text(index, text):
+            # Section bodies are stripped in the report, so their leading whitespace is dropped and trailing
+            # whitespace held back until more of the section follows
+            text = trailing.pop(index, "") + text if index in started else text.lstrip()
+            if not text:
+                return ""
+            started.add(index)
+            body = text.rstrip()
+            if len(body) < len(text):
+                trailing[index] = text[len(body):]
+            return body
+
+        stream_mode = ["messages", "updates", "custom"]
+        async for mode, payload in self.graph.astream(self.inputs, self.config, stream_mode=stream_mode):
+            done = None
+            if mode == "messages":
+                chunk, metadata = payload
+                if metadata.get("langgraph_node") != self.node:
+                    continue
+                text = chunk.content if isinstance(chunk.content, str) else ""
+                index = self.section_index(metadata)
+                if index is not None:
+                    text = body_text(index, text)
+            elif mode == "custom":
+                if not isinstance(payload, dict):
+                    continue
+                text = payload.get("report_text") or ""
+                index = payload.get("section")
+                done = payload.get("section_done")
+            else:
+                for node, update in payload.items():
+                    if not isinstance(update, dict):
+                        continue
+                    if update.get("messages"):
+                        self.messages.append(update["messages"])
+                        if self.on_message:
+                            self.on_message(update["messages"])
+                    if node == self.node and "report" in update:
+                        self.report = update["report"]
+                        self.snapshot = update.get("snapshot")
+                continue
+
+            if index is None or index == current:
+                if text:
+                    yield text
+            elif text:
+                buffers.setdefault(index, []).append(text)
+            if done is not None:
+                finished.add(done)
+                # Catch up on the sections that finished while an earlier one was still streaming
+                while current in finished:
+                    current += 1
+                    for text in buffers.pop(current, []):
+                        yield text
+        # Sections whose completion was never signalled are flushed in order at the end
+        for index in sorted(buffers):
+            for text in buffers[index]:
+                yield text
@@ -1,5 +1,30 @@
 from .tavily_utils import Tavily
+from .prefetch import Prefetcher
+from .doc_store import DocumentStore
+from .clients import registry
+from .passages import compact_documents, truncate_documents
+from .rate_limit import limiter
 
 class Utils:
-    def __init__(self):
-        self.tavily = Tavily()
\ No newline at end of file
+    def __init__(self, cfg):
+        """Create the shared helpers of a graph configured by `cfg`."""
+        self.cfg = cfg
+        self.documents = DocumentStore.from_config(cfg)
+        self.tavily = Tavily(cfg, self.documents)
+        self.prefetcher = Prefetcher(self.tavily)
+        limiter.configure(cfg.RATE_LIMITS, max_retries=cfg.RATE_LIMIT_MAX_RETRIES)
+
+    def prompt_documents(self, documents, queries, token_budget):
+        """Resolve state documents for a prompt, keeping only the passages that best match `queries`."""
+        documents = self.documents.resolve_all(documents)
+        if not self.cfg.PASSAGE_SELECTION:
+            # Pages are stored at MAX_DOC_LENGTH for passage selection, without it prompts keep the head of each page
+            return truncate_documents(documents, self.cfg.PROMPT_DOC_LENGTH)
+        return compact_documents(documents, queries, token_budget, passage_size=self.cfg.PASSAGE_SIZE)
+
+    @property
+    def llm_cache(self):
+        """The cache memoizing structured LLM responses, or None when disabled."""
+        if self.cfg.CACHE_ENABLED and self.cfg.LLM_CACHE_ENABLED:
+            return registry.cache(self.cfg.CACHE_PATH, self.cfg.CACHE_MAX_SIZE)
+        return None
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""BM25 ranking of documents and passages against report queries."""
+
+import math
+from collections import Counter
+
+from company_researcher.utils.similarity import tokenize
+
+
+class BM25:
+    """Okapi BM25 lexical ranking over a small in-memory corpus."""
+
+    def __init__(self, documents: list[str], k1=1.5, b=0.75):
+        """Index the documents, `k1` and `b` being the usual term frequency saturation and length normalization."""
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = [Counter(tokenize(doc)) for doc in documents]
+        self.lengths = [sum(tf.values()) for tf in self.term_frequencies]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        document_frequency = Counter(token for tf in self.term_frequencies for token in tf)
+        total = len(documents)
+        self.idf = {
+            token: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for token, df in document_frequency.items()
+        }
+
+    def scores(self, query: str) -> list[float]:
+        """Return the score of every document for the query, in document order."""
+        query_tokens = set(tokenize(query))
+        scores = []
+        for tf, length in zip(self.term_frequencies, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1.0))
+            for token in query_tokens:
+                freq = tf.get(token)
+                if freq:
+                    score += self.idf[token] * freq * (self.k1 + 1) / (freq + norm)
+            scores.append(score)
+        return scores
+
+    def top_n(self, query: str, n: int) -> list[tuple[int, float]]:
+        """Return (index, score) pairs of the n best matching documents, best first."""
+        ranked = sorted(enumerate(self.scores(query)), key=lambda item: item[1], reverse=True)
+        return ranked[:n]
@@ -0,0 +1,152 @@
+"""SQLite-backed cache for provider responses, shared across runs and processes."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class Cache:
+    """SQLite-backed key/value cache with per-entry TTLs and size-bounded LRU eviction.
+
+    Entries are grouped by namespace (e.g. 'search', 'extract') and store JSON-serializable values. Entries pinned
+    by an owner (see `pin`) neither expire nor get evicted until every owner released them.
+    """
+
+    def __init__(self, path, max_size_bytes=256 * 1024 * 1024):
+        """Open (or create) the cache database at `path`, ':memory:' for a cache private to this process."""
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL, last_access REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        # Running total of the entry sizes, kept up to date by triggers so a write never has to sum the whole table
+        # and every process sharing the file sees the same total
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), "
+                           "total INTEGER NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO cache_size (id, total) SELECT 0, COALESCE(SUM(size), 0) FROM cache")
+        self._conn.execute("CREATE TRIGGER IF NOT EXISTS cache_size_insert AFTER INSERT ON cache BEGIN "
+                           "UPDATE cache_size SET total = total + NEW.size WHERE id = 0; END")
+        self._conn.execute("CREATE TRIGGER IF NOT EXISTS cache_size_delete AFTER DELETE ON cache BEGIN "
+                           "UPDATE cache_size SET total = total - OLD.size WHERE id = 0; END")
+        self._conn.execute("CREATE TRIGGER IF NOT EXISTS cache_size_update AFTER UPDATE OF size ON cache BEGIN "
+                           "UPDATE cache_size SET total = total + NEW.size - OLD.size WHERE id = 0; END")
+        self._conn.execute("COMMIT")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pins ("
+            "owner TEXT NOT NULL, namespace TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (owner, namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pins_entry ON pins (namespace, key)")
+
+    @staticmethod
+    def make_key(*parts):
+        """Build a stable cache key from JSON-serializable parts."""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, namespace, key):
+        """Return the cached value, or None if it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < now and not self._is_pinned(namespace, key):
+                self._conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE cache SET last_access = ? WHERE namespace = ? AND key = ?", (now, namespace, key)
+            )
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, namespace, key, value, ttl=None):
+        """Store a value, evicting the least recently used entries if the cache grows too large."""
+        now = time.time()
+        payload = json.dumps(value)
+        expires_at = now + ttl if ttl else None
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete doesn't fire the size triggers
+            self._conn.execute(
+                "INSERT INTO cache (namespace, key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "expires_at = excluded.expires_at, last_access = excluded.last_access",
+                (namespace, key, payload, len(payload), expires_at, now),
+            )
+            self._evict(now)
+
+    def pin(self, owner, namespace, keys):
+        """Keep the entries from expiring or being evicted until `owner` releases them with `unpin`."""
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO pins (owner, namespace, key) VALUES (?, ?, ?)",
+                                   [(owner, namespace, key) for key in keys])
+
+    def unpin(self, owner):
+        """Releases every entry pinned by `owner`, they expire and get evicted normally again."""
+        with self._lock:
+            self._conn.execute("DELETE FROM pins WHERE owner = ?", (owner,))
+
+    def _is_pinned(self, namespace, key):
+        return self._conn.execute("SELECT 1 FROM pins WHERE namespace = ? AND key = ? LIMIT 1",
+                                  (namespace, key)).fetchone() is not None
+
+    _UNPINNED = "NOT EXISTS (SELECT 1 FROM pins WHERE pins.namespace = cache.namespace AND pins.key = cache.key)"
+
+    def _evict(self, now):
+        self._conn.execute(f"DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ? AND {self._UNPINNED}",
+                           (now,))
+        total = self._size()
+        if total <= self.max_size_bytes:
+            return
+        # Drop least recently used entries until we are back under the size bound
+        excess = total - self.max_size_bytes
+        freed = 0
+        victims = []
+        for namespace, key, size in self._conn.execute(
+            f"SELECT namespace, key, size FROM cache WHERE {self._UNPINNED} ORDER BY last_access ASC"
+        ):
+            victims.append((namespace, key))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM cache WHERE namespace = ? AND key = ?", victims)
+
+    def _size(self):
+        return self._conn.execute("SELECT total FROM cache_size WHERE id = 0").fetchone()[0]
+
+    def clear(self):
+        """Remove every entry and pin."""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.execute("DELETE FROM pins")
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            size = self._size()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "size_bytes": size}
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
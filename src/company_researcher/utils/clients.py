@@ -0,0 +1,121 @@
+"""Lazily created provider clients shared across graph runs."""
+
+import hashlib
+import json
+import threading
+
+
+class ClientRegistry:
+    """Creates provider clients lazily and shares them across nodes, agents and graph runs.
+
+    Each provider gets one client with a pooled HTTP connection, so TCP/TLS sessions are reused instead of
+    re-handshaking per node. The provider SDKs are only imported when their client is first used, which keeps
+    importing the graph fast. Tests and benchmarks can replace a client with `override`, and `aclose` releases
+    all connections.
+    """
+
+    def __init__(self, max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0):
+        """Size the connection pool of each provider's HTTP client."""
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self._clients = {}
+        self._http_clients = {}
+        self._lock = threading.RLock()
+
+    def _get(self, name, factory):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = factory()
+        return client
+
+    def _http_client(self, provider):
+        """Return the pooled httpx client used for one provider."""
+        import httpx
+
+        def factory():
+            return httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_keepalive_connections,
+                                    keepalive_expiry=self.keepalive_expiry),
+                timeout=httpx.Timeout(120.0, connect=10.0),
+            )
+
+        client = self._http_clients.get(provider)
+        if client is None:
+            with self._lock:
+                client = self._http_clients.get(provider)
+                if client is None:
+                    client = self._http_clients[provider] = factory()
+        return client
+
+    @property
+    def tavily(self):
+        """The shared Tavily client."""
+        def factory():
+            from tavily import AsyncTavilyClient
+            # AsyncTavilyClient keeps its own keep-alive connection pool for the lifetime of the instance
+            return AsyncTavilyClient()
+        return self._get("tavily", factory)
+
+    @property
+    def cohere(self):
+        """The shared Cohere client."""
+        def factory():
+            import cohere
+            return cohere.AsyncClient(httpx_client=self._http_client("cohere"))
+        return self._get("cohere", factory)
+
+    @staticmethod
+    def _kwargs_key(kwargs):
+        """Stable hash of client settings, so differently configured clients are never shared."""
+        payload = json.dumps(kwargs, sort_keys=True, default=repr)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def chat_model(self, name, **kwargs):
+        """Return the shared ChatOpenAI instance for `name` and `kwargs`, creating it on first use.
+
+        Instances are shared per name and settings, so e.g. a Config with another model or temperature gets its
+        own instance. A stand-in registered with `override(name, ...)` is returned regardless of the settings.
+        All chat models share one OpenAI connection pool.
+        """
+        override = self._clients.get(name)
+        if override is not None:
+            return override
+
+        def factory():
+            from langchain_openai import ChatOpenAI
+            return ChatOpenAI(http_async_client=self._http_client("openai"), **kwargs)
+        return self._get(("chat_model", name, self._kwargs_key(kwargs)), factory)
+
+    def cache(self, path, max_size_bytes):
+        """Return the shared on-disk cache stored at `path`."""
+        def factory():
+            from company_researcher.utils.cache import Cache
+            return Cache(path, max_size_bytes=max_size_bytes)
+        return self._get(("cache", path), factory)
+
+    def override(self, name, client):
+        """Replace a client, e.g. 'tavily', 'cohere' or a chat model name, with a stand-in."""
+        with self._lock:
+            self._clients[name] = client
+
+    async def aclose(self):
+        """Close every client and connection pool. Clients are recreated on next use."""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            http_clients, self._http_clients = self._http_clients, {}
+        tavily = clients.get("tavily")
+        if tavily is not None and hasattr(tavily, "close"):
+            await tavily.close()
+        for name, client in clients.items():
+            if isinstance(name, tuple) and name[0] == "cache":
+                client.close()
+        for http_client in http_clients.values():
+            await http_client.aclose()
+
+
+registry = ClientRegistry()
@@ -0,0 +1,108 @@
+"""Detection of which requested include items the research documents cover."""
+
+import re
+
+from company_researcher.utils.similarity import STOPWORDS, tokenize
+
+# Known include fields: the phrases that identify a requested item, and the patterns that show a document covers it
+FIELDS = [
+    ("ceo", ["ceo", "chief executive"],
+     [r"\bCEO\b", r"\bchief executive(?: officer)?\b"]),
+    ("founder", ["founder", "founded by", "founders"],
+     [r"\b(?:co-?)?founders?\b", r"\bfounded by\b"]),
+    ("headcount", ["employee", "headcount", "staff", "team size", "workforce"],
+     [r"\b\d[\d,.]*\s*(?:k\s*)?\+?\s*(?:employees|staff|people|team members|workers)\b",
+      r"\b(?:employees|headcount|workforce|team size)\b\W{0,3}(?:\w+\W+){0,4}\d[\d,.]*"]),
+    ("headquarters", ["headquarter", "hq", "location", "located", "based"],
+     [r"\bheadquarter(?:s|ed)\b", r"\bHQ\b", r"\bbased in [A-Z]"]),
+    ("founded", ["founded", "founding", "established"],
+     [r"\b(?:founded|established|started|launched) in (?:19|20)\d{2}\b", r"\bsince (?:19|20)\d{2}\b"]),
+    ("funding", ["funding", "raised", "investment", "round"],
+     [r"\b(?:raised|raises|funding|series [a-h]|seed round)\b(?:\W+\w+){0,10}\W+\$\s?\d",
+      r"\$\s?\d[\d.,]*\s*(?:million|billion|[mb])\b(?:\W+\w+){0,6}\W+(?:funding|round|raise)"]),
+    ("investors", ["investor", "backer", "backed"],
+     [r"\binvestors?\b", r"\b(?:led|backed) by\b"]),
+    ("valuation", ["valuation", "valued"],
+     [r"\bvalu(?:ation|ed at)\b(?:\W+\w+){0,6}\W+\$\s?\d"]),
+    ("revenue", ["revenue", "sales", "arr", "income"],
+     [r"\b(?:revenue|sales|ARR)\b(?:\W+\w+){0,8}\W+\$\s?\d", r"\$\s?\d[\d.,]*\s*(?:million|billion|[mb])\b(?:\W+\w+){0,4}\W+(?:revenue|ARR)\b"]),
+    ("competitors", ["competitor", "competition", "rival", "alternative"],
+     [r"\bcompetitors?\b", r"\bcompetes? with\b", r"\brivals?\b", r"\balternatives? to\b"]),
+    ("customers", ["customer", "client"],
+     [r"\bcustomers?\b", r"\bclients?\b"]),
+]
+
+# Include fields answered by a URL rather than by text: the LinkedIn page and the company's own website
+URL_FIELDS = [
+    ("linkedin", ["linkedin"]),
+    ("website", ["website", "web site", "homepage", "home page", "official site", "domain"]),
+]
+
+# Words of a requested item that say nothing about what it is
+GENERIC_WORDS = {"name", "names", "company", "companys", "information", "info", "details", "current", "list", "number",
+                 "what", "who", "which", "how", "many", "much", "about"}
+
+
+def search_terms(item: str) -> str:
+    """Strip filler words from a requested item for use in a search query, e.g. 'Name of the CEO' -> 'CEO'."""
+    words = [word for word in item.split()
+             if re.sub(r"['’]s$", "", word.lower().strip("?.,:")) not in GENERIC_WORDS | STOPWORDS]
+    return " ".join(words) or item
+
+
+class CoverageChecker:
+    """Checks locally which requested `include` items the documents gathered so far already cover.
+
+    Items matching a known field (CEO, headcount, headquarters, funding, ...) are covered when a document matches
+    one of the field's patterns. The website and LinkedIn URL items are covered by the company URL and a LinkedIn
+    company page among the documents. Other items are covered when a single document contains all of their keywords.
+    """
+
+    def __init__(self, include, company_url=None):
+        """Check the items of `include`, the website being covered by `company_url`."""
+        self.include = list(include or [])
+        self.company_url = company_url
+        self.checks = {item: self.compile(item) for item in self.include}
+
+    @staticmethod
+    def compile(item):
+        """Return the URL field, the field patterns or the keywords a document must match to cover the item."""
+        lowered = item.lower()
+        for name, phrases in URL_FIELDS:
+            if any(re.search(rf"\b{re.escape(phrase)}", lowered) for phrase in phrases):
+                return name, None, None
+        for _, phrases, patterns in FIELDS:
+            if any(re.search(rf"\b{re.escape(phrase)}", lowered) for phrase in phrases):
+                return None, [re.compile(pattern, re.IGNORECASE) for pattern in patterns], None
+        return None, None, {token for token in tokenize(item) if token not in GENERIC_WORDS}
+
+    def url_covered(self, field, urls):
+        """Return whether a URL field, 'website' or 'linkedin', is covered."""
+        if field == "linkedin":
+            return any("linkedin.com/company/" in url for url in urls)
+        # The official website is the company URL the research starts from
+        return bool(self.company_url)
+
+    def check(self, documents: dict):
+        """Return the covered and the missing include items, given resolved documents keyed by URL."""
+        texts = [
+            " ".join(str(doc.get(key) or "") for key in ("title", "content", "raw_content"))
+            for doc in documents.values()
+        ]
+        token_sets = None
+        covered = []
+        missing = []
+        for item, (url_field, patterns, keywords) in self.checks.items():
+            if url_field is not None:
+                found = self.url_covered(url_field, documents)
+            elif patterns is not None:
+                found = any(pattern.search(text) for pattern in patterns for text in texts)
+            else:
+                if token_sets is None:
+                    token_sets = [set(tokenize(text)) for text in texts]
+                found = any(keywords <= tokens for tokens in token_sets)
+            if found:
+                covered.append(item)
+            else:
+                missing.append(item)
+        return covered, missing
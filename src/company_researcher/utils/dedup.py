@@ -0,0 +1,98 @@
+"""URL canonicalization and near-duplicate detection for search results."""
+
+import hashlib
+import random
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track the visitor and never change the page content
+TRACKING_PARAMS = {
+    "gclid", "fbclid", "msclkid", "dclid", "yclid", "mc_cid", "mc_eid", "igshid", "ref", "ref_src", "ref_url",
+    "referrer", "source", "cmpid", "_hsenc", "_hsmi", "mkt_tok", "spm", "si", "trk", "trkid", "src",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_", "ga_", "vero_")
+
+_WORD_RE = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1337)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(64)]
+
+
+def url_domain(url: str) -> str:
+    """Return the lowercase host of a URL without the 'www.' prefix and port."""
+    if "//" not in url:
+        url = "//" + url
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def domain_suffixes(domain: str) -> list[str]:
+    """List a domain and its parent domains, e.g. 'blog.tavily.com' -> ['blog.tavily.com', 'tavily.com']."""
+    labels = domain.split(".")
+    return [".".join(labels[i:]) for i in range(max(len(labels) - 1, 1))]
+
+
+def is_primary_source(url: str, company_url: str) -> bool:
+    """Return whether a page is on the company's own domain (or its subdomains) or a LinkedIn company page."""
+    target_domain = url_domain(company_url)
+    return target_domain in domain_suffixes(url_domain(url)) or "linkedin.com/company/" in url
+
+
+def canonicalize_url(url: str) -> str:
+    """Map http/https, 'www.', tracking-parameter, fragment and trailing-slash variants of a URL to one form."""
+    parts = urlsplit(url.strip())
+    domain = url_domain(url)
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/")
+    for index_page in ("/index.html", "/index.htm", "/index.php"):
+        if path.endswith(index_page):
+            path = path[:-len(index_page)]
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    return urlunsplit(("https", domain, path, urlencode(sorted(query)), ""))
+
+
+def minhash_signature(text: str, shingle_size=5) -> list[int] | None:
+    """Compute a MinHash signature over word shingles, or None if the text is too short to compare."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < shingle_size:
+        return None
+    shingles = {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + shingle_size]).encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(len(words) - shingle_size + 1)
+    }
+    return [min((a * s + b) % _MERSENNE_PRIME for s in shingles) for a, b in _PERMUTATIONS]
+
+
+def estimated_similarity(sig_a: list[int], sig_b: list[int]) -> float:
+    """Estimates the Jaccard similarity of two documents from their MinHash signatures."""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def deduplicate_documents(documents: dict, threshold=0.8):
+    """Drop URL variants and near-duplicate content from a dict of search results keyed by URL.
+
+    When two documents collide, the one with the higher search score is kept.
+    Returns the filtered dict and the list of dropped URLs.
+    """
+    ranked = sorted(documents.items(), key=lambda item: item[1].get("score") or 0, reverse=True)
+    seen_urls = set()
+    kept_signatures = []
+    kept = {}
+    dropped = []
+    for url, doc in ranked:
+        canonical = canonicalize_url(url)
+        if canonical in seen_urls:
+            dropped.append(url)
+            continue
+        signature = minhash_signature(doc.get("content") or "")
+        if signature and any(estimated_similarity(signature, other) >= threshold for other in kept_signatures):
+            dropped.append(url)
+            continue
+        seen_urls.add(canonical)
+        if signature:
+            kept_signatures.append(signature)
+        kept[url] = doc
+    # Preserve the original search order for the surviving documents
+    return {url: doc for url, doc in documents.items() if url in kept}, dropped
@@ -0,0 +1,117 @@
+"""Content-addressed storage of extracted page content outside the graph state."""
+
+import contextvars
+import hashlib
+from contextlib import contextmanager
+
+from company_researcher.utils.clients import registry
+
+_owner = contextvars.ContextVar("company_researcher_document_owner", default=None)
+
+
+class MissingContentError(LookupError):
+    """Raised when a document's content ID is no longer in the store."""
+
+
+@contextmanager
+def owned_by(owner):
+    """Pin the content stored or read within the block (and the tasks it starts) to `owner`.
+
+    The content then stays in the store, regardless of its TTL and the size bound, until
+    `DocumentStore.release(owner)`, so a run or a checkpointed thread never loses content its state refers to.
+    """
+    token = _owner.set(owner)
+    try:
+        yield
+    finally:
+        _owner.reset(token)
+
+
+def current_owner():
+    """Return the owner set by the enclosing `owned_by` block, or None."""
+    return _owner.get()
+
+
+async def run_owned_by(owner, coro):
+    """Await a coroutine as `owner`, for work started in a fresh context such as prefetch tasks."""
+    with owned_by(owner):
+        return await coro
+
+
+class DocumentStore:
+    """Content-addressed side store for extracted page content.
+
+    Graph state only keeps a `raw_content_id` per document, so the large raw content is not copied and
+    serialized on every node transition and checkpoint. Identical pages share one entry across runs. Nodes
+    read the content back lazily with `resolve`. Content stored or read while an owner is set (see `owned_by`)
+    is pinned to it.
+    """
+
+    NAMESPACE = "documents"
+
+    def __init__(self, path, max_size_bytes, ttl=None):
+        """Store content in the cache at `path`, expiring unpinned entries after `ttl` seconds."""
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self.ttl = ttl
+
+    @classmethod
+    def from_config(cls, cfg):
+        """Return the store configured by `cfg`."""
+        return cls(cfg.DOC_STORE_PATH, cfg.DOC_STORE_MAX_SIZE, ttl=cfg.DOC_STORE_TTL)
+
+    @property
+    def cache(self):
+        """The shared cache holding the content."""
+        return registry.cache(self.path, self.max_size_bytes)
+
+    @staticmethod
+    def content_id(text: str) -> str:
+        """Return the ID `text` is stored under."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+    def put(self, text: str) -> str:
+        """Store text and return its content ID."""
+        content_id = self.content_id(text)
+        self.cache.set(self.NAMESPACE, content_id, text, ttl=self.ttl)
+        self._pin_to_owner(content_id)
+        return content_id
+
+    def get(self, content_id: str):
+        """Return the stored text, or None if it is no longer in the store."""
+        text = self.cache.get(self.NAMESPACE, content_id)
+        if text is not None:
+            self._pin_to_owner(content_id)
+        return text
+
+    def _pin_to_owner(self, content_id):
+        owner = _owner.get()
+        if owner is not None:
+            self.cache.pin(owner, self.NAMESPACE, [content_id])
+
+    def pin(self, owner, content_ids):
+        """Keep the content in the store until `owner` is released."""
+        self.cache.pin(owner, self.NAMESPACE, content_ids)
+
+    def release(self, owner):
+        """Release the content pinned to `owner`, it then expires and gets evicted like any other entry."""
+        self.cache.unpin(owner)
+
+    def resolve(self, doc: dict) -> dict:
+        """Return a copy of a state document with its raw content loaded from the store.
+
+        Raises MissingContentError if the content was evicted, rather than silently returning the document without it.
+        """
+        doc = dict(doc)
+        content_id = doc.pop("raw_content_id", None)
+        if content_id:
+            raw_content = self.get(content_id)
+            if raw_content is None:
+                raise MissingContentError(f"Content {content_id} of '{doc.get('url') or doc.get('title')}' is no "
+                                          f"longer in the document store")
+            doc["raw_content"] = raw_content
+        return doc
+
+    def resolve_all(self, documents: dict) -> dict:
+        """Return copies of the documents with their raw content loaded from the store."""
+        return {url: self.resolve(doc) for url, doc in documents.items()}
@@ -0,0 +1,104 @@
+"""Adaptive batching, retries and deadlines of Tavily extract calls."""
+
+import asyncio
+import math
+import random
+import time
+
+
+class ExtractScheduler:
+    """Schedules Tavily extract batches with a concurrency cap, retries and per-URL deadlines.
+
+    A batch that keeps failing after `max_retries` exponential-backoff retries is bisected so one bad URL can no
+    longer take down the content of its whole batch. Each URL gets `url_deadline` seconds from its first attempt
+    (time spent waiting for a free slot doesn't count) and at most `max_attempts` attempts across retries and
+    bisection, by default enough to isolate one bad URL in a full batch. Batch sizes adapt to the observed per-URL
+    latency so a typical batch completes in about `target_batch_latency` seconds.
+    """
+
+    def __init__(self, concurrency=4, max_batch_size=20, target_batch_latency=10.0, max_retries=2,
+                 backoff_base=0.5, backoff_max=8.0, url_deadline=45.0, max_attempts=None):
+        """Run at most `concurrency` batches at once, each of at most `max_batch_size` URLs."""
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_batch_size = max_batch_size
+        self.target_batch_latency = target_batch_latency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.url_deadline = url_deadline
+        self.max_attempts = max_attempts or max_retries + 1 + math.ceil(math.log2(max(max_batch_size, 1)))
+        self.latency_per_url = None  # exponentially weighted moving average, in seconds
+
+    def batch_size(self):
+        """Return the number of URLs to extract in the next batch."""
+        if not self.latency_per_url:
+            return self.max_batch_size
+        return max(1, min(self.max_batch_size, int(self.target_batch_latency / self.latency_per_url)))
+
+    def observe(self, latency, batch_length):
+        """Update the per-URL latency estimate with a completed batch."""
+        per_url = latency / max(batch_length, 1)
+        if self.latency_per_url is None:
+            self.latency_per_url = per_url
+        else:
+            self.latency_per_url = 0.8 * self.latency_per_url + 0.2 * per_url
+
+    async def run(self, urls, extract_batch):
+        """Extract `urls` using the coroutine function `extract_batch(url_batch) -> response`.
+
+        Returns the list of extracted results and a dict mapping each failed URL to its error.
+        """
+        results = []
+        failed = {}
+        deadlines = {}  # url -> when its extraction must be finished, set by its first attempt
+        attempts = dict.fromkeys(urls, 0)
+        errors = {}  # url -> error of its last failed attempt
+
+        async def process(batch, retries_left):
+            async with self.semaphore:
+                now = time.monotonic()
+                for url in batch:
+                    deadlines.setdefault(url, now + self.url_deadline)
+                for url in batch:
+                    if deadlines[url] <= now:
+                        failed[url] = "deadline exceeded"
+                    elif attempts[url] >= self.max_attempts:
+                        failed[url] = errors.get(url, "too many attempts")
+                batch = [url for url in batch if url not in failed]
+                if not batch:
+                    return
+                for url in batch:
+                    attempts[url] += 1
+                # Measured once the slot is acquired, so waiting for it doesn't eat into the request's timeout
+                remaining = min(deadlines[url] for url in batch) - now
+                try:
+                    response = await asyncio.wait_for(extract_batch(batch), timeout=remaining)
+                except Exception as e:
+                    error = e
+                else:
+                    error = None
+                    self.observe(time.monotonic() - now, len(batch))
+
+            if error is None:
+                results.extend(response['results'])
+                for itm in response.get('failed_results') or []:
+                    failed[itm.get('url')] = itm.get('error') or "extraction failed"
+                return
+            message = "timeout" if isinstance(error, asyncio.TimeoutError) else str(error)
+            errors.update({url: message for url in batch})
+            if retries_left > 0 and not isinstance(error, asyncio.TimeoutError):
+                backoff = min(self.backoff_max, self.backoff_base * 2 ** (self.max_retries - retries_left))
+                until_deadline = min(deadlines[url] for url in batch) - time.monotonic()
+                await asyncio.sleep(min(backoff * random.uniform(0.5, 1.5), max(until_deadline, 0)))
+                await process(batch, retries_left - 1)
+            elif len(batch) > 1:
+                # Isolate the failing URLs so the rest of the batch is still extracted
+                middle = len(batch) // 2
+                await asyncio.gather(process(batch[:middle], 0), process(batch[middle:], 0))
+            else:
+                failed[batch[0]] = message
+
+        size = self.batch_size()
+        batches = [urls[i:i + size] for i in range(0, len(urls), size)]
+        await asyncio.gather(*[process(batch, self.max_retries) for batch in batches])
+        return results, failed
@@ -0,0 +1,97 @@
+"""Hedged provider requests, sent again when the first one is slower than usual."""
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from company_researcher.utils import metrics, rate_limit
+
+
+class LatencyTracker:
+    """Keeps the latencies of the most recent successful calls per operation, e.g. 'search:basic'."""
+
+    def __init__(self, window=500):
+        """Keep the last `window` latencies of each operation."""
+        self.window = window
+        self.samples = {}
+
+    def record(self, name, seconds):
+        """Add a latency of the operation `name`."""
+        self.samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    @contextmanager
+    def track(self, name):
+        """Record the duration of the block under `name` if it finishes without an error.
+
+        A request cancelled because its hedge won is recorded with the time it ran so far, a lower bound of its
+        latency. Leaving the slowest requests out would pull the percentile, and with it the hedge delay, down until
+        almost every request is hedged. Cancelled hedges are not recorded, they only ran for part of the call.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except asyncio.CancelledError:
+            if not _is_hedge.get():
+                self.record(name, time.perf_counter() - start)
+            raise
+        self.record(name, time.perf_counter() - start)
+
+    def percentile(self, name, q, min_samples=1):
+        """Return the q-th percentile (0-100) of the recorded latencies, or None with fewer than `min_samples`."""
+        samples = sorted(self.samples.get(name, ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+
+latencies = LatencyTracker()
+_is_hedge = contextvars.ContextVar("is_hedge", default=False)
+
+
+async def _run_as_hedge(coro):
+    _is_hedge.set(True)
+    return await coro
+
+
+def _consume_result(task):
+    # Retrieve the loser's exception so asyncio doesn't log it as never retrieved
+    if not task.cancelled():
+        task.exception()
+
+
+async def hedged(primary, hedge, delay, is_good=None):
+    """Return the first good result of `primary()` or, if needed, a hedge request `hedge()`.
+
+    The hedge starts once the primary has been running for `delay` seconds without finishing, or as soon as the
+    primary fails or returns a result `is_good` rejects. It runs at BACKGROUND priority so it never delays other
+    runs' regular calls. Whichever request loses is cancelled. If neither returns a good result, the primary's
+    result is returned (or its error raised).
+    """
+    is_good = is_good or (lambda result: True)
+    primary_task = asyncio.create_task(primary())
+    tasks = [primary_task]
+    try:
+        await asyncio.wait([primary_task], timeout=delay)
+        if primary_task.done() and primary_task.exception() is None and is_good(primary_task.result()):
+            return primary_task.result()
+
+        metrics.increment_attribute("hedged_calls")
+        hedge_task = asyncio.create_task(_run_as_hedge(rate_limit.in_background(hedge())))
+        tasks.append(hedge_task)
+        pending = {task for task in tasks if not task.done()}
+        while True:
+            for task in tasks:
+                if task.done() and task.exception() is None and is_good(task.result()):
+                    if task is hedge_task:
+                        metrics.increment_attribute("hedge_wins")
+                    return task.result()
+            if not pending:
+                return primary_task.result()
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            task.add_done_callback(_consume_result)
@@ -0,0 +1,83 @@
+"""LLM calls with response caching, rate limiting and metrics."""
+
+import hashlib
+
+from company_researcher.utils import metrics
+from company_researcher.utils.cache import Cache
+from company_researcher.utils.rate_limit import limiter
+
+
+def normalize_prompt(messages) -> str:
+    """Join the message contents with whitespace collapsed, so formatting-only differences share a cache entry."""
+    return "\n".join(f"{message.type}: {' '.join(str(message.content).split())}" for message in messages)
+
+
+def structured_cache_key(llm, schema, messages) -> str:
+    """Keys a structured call on the model, its temperature, the output schema and the normalized prompt."""
+    prompt_hash = hashlib.sha256(normalize_prompt(messages).encode("utf-8")).hexdigest()
+    return Cache.make_key(getattr(llm, "model_name", None), getattr(llm, "temperature", None),
+                          schema.__name__, schema.model_json_schema(), prompt_hash)
+
+
+def estimate_call_tokens(llm, messages) -> int:
+    """Estimate a call's token cost for the rate limiter: the prompt at ~4 characters per token plus max_tokens."""
+    prompt_chars = sum(len(str(message.content)) for message in messages)
+    return prompt_chars // 4 + (getattr(llm, "max_tokens", None) or 0)
+
+
+def total_tokens(message):
+    """Return the total tokens an LLM response reports using, or None."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+async def invoke_structured(llm, schema, messages, cache=None, ttl=None):
+    """Call an LLM with structured output, recording latency and token usage in the current metrics span.
+
+    With a `cache`, parsed responses are memoized so an identical call is answered without contacting the LLM.
+    """
+    key = structured_cache_key(llm, schema, messages) if cache else None
+    if cache:
+        cached = cache.get("llm", key)
+        if cached is not None:
+            metrics.increment_attribute("llm_cache_hits")
+            return schema.model_validate(cached)
+
+    estimated = estimate_call_tokens(llm, messages)
+    structured = llm.with_structured_output(schema, include_raw=True)
+    async with metrics.provider_call("openai"):
+        response = await limiter.call("openai", lambda: structured.ainvoke(messages), tokens=estimated)
+    metrics.record_llm_usage(response["raw"])
+    limiter.provider("openai").settle(estimated, total_tokens(response["raw"]))
+    if response.get("parsing_error"):
+        raise response["parsing_error"]
+    if cache and response["parsed"] is not None:
+        cache.set("llm", key, response["parsed"].model_dump(), ttl=ttl)
+    return response["parsed"]
+
+
+async def stream_text(llm, messages, config=None):
+    """Streams a completion and returns its text, recording latency and token usage in the current metrics span.
+
+    Streaming lets callers using LangGraph's "messages" stream mode receive tokens as they arrive. A rate-limited
+    call is retried as long as none of its tokens were streamed yet.
+    """
+    estimated = estimate_call_tokens(llm, messages)
+    attempt = 0
+    async with metrics.provider_call("openai"):
+        while True:
+            await limiter.acquire("openai", estimated)
+            chunks = []
+            usage = None
+            try:
+                async for chunk in llm.astream(messages, config=config):
+                    chunks.append(chunk.content)
+                    usage = chunk if chunk.usage_metadata else usage
+                break
+            except Exception as e:
+                if chunks or limiter.retry_delay("openai", e, attempt) is None:
+                    raise
+                attempt += 1
+    metrics.record_llm_usage(usage)
+    limiter.provider("openai").settle(estimated, total_tokens(usage))
+    return "".join(chunks)
@@ -0,0 +1,72 @@
+"""Clustering of the obvious search results without an LLM call."""
+
+import re
+
+from company_researcher.utils.dedup import url_domain
+from company_researcher.utils.similarity import cosine, tfidf_vectors
+
+LEGAL_SUFFIXES = {"inc", "llc", "ltd", "limited", "corp", "corporation", "co", "gmbh", "sa", "ag", "plc", "company"}
+
+
+def normalize_company_name(name: str) -> str:
+    """Lowercases a company name and strips punctuation and legal suffixes, e.g. 'Tavily, Inc.' -> 'tavily'."""
+    tokens = re.findall(r"[a-z0-9]+", name.lower())
+    while len(tokens) > 1 and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def is_same_site(domain: str, target_domain: str) -> bool:
+    """Tell whether `domain` is the target domain or one of its subdomains."""
+    return bool(target_domain) and (domain == target_domain or domain.endswith("." + target_domain))
+
+
+class LocalClusterer:
+    """Places search results into the target company's cluster without an LLM call when the answer is obvious.
+
+    Each document is labelled 'target', 'other' or 'undecided' using domain matching against the company URL,
+    company name matching, and TF-IDF cosine similarity against the grounding data. Only the undecided
+    documents need to be clustered by the LLM.
+    """
+
+    def __init__(self, high_similarity=0.35, low_similarity=0.05):
+        """Set the grounding similarity from which a document is 'target', and below which it is 'other'."""
+        self.high_similarity = high_similarity
+        self.low_similarity = low_similarity
+
+    def classify(self, company, company_url, grounding_texts, documents):
+        """Return the label of each document by URL."""
+        target_domain = url_domain(company_url)
+        name = normalize_company_name(company)
+        name_re = re.compile(r"\b" + r"\W+".join(map(re.escape, name.split())) + r"\b") if name else None
+        slug = name.replace(" ", "")
+
+        urls = list(documents)
+        texts = [f"{documents[url].get('title') or ''} {documents[url].get('content') or ''}" for url in urls]
+        grounding = " ".join(grounding_texts)
+        similarities = {}
+        if grounding.strip():
+            vectors = tfidf_vectors([grounding] + texts)
+            similarities = {url: cosine(vectors[0], vector) for url, vector in zip(urls, vectors[1:])}
+
+        labels = {}
+        for url, text in zip(urls, texts):
+            lowered = text.lower()
+            domain = url_domain(url)
+            if is_same_site(domain, target_domain):
+                labels[url] = "target"
+            elif slug and re.search(r"linkedin\.com/company/" + re.escape(slug) + r"(?:[/?#]|$)", url.lower()):
+                labels[url] = "target"
+            elif target_domain and target_domain in lowered:
+                labels[url] = "target"
+            elif url not in similarities:
+                labels[url] = "undecided"
+            else:
+                name_hit = bool(name_re and name_re.search(lowered))
+                if name_hit and similarities[url] >= self.high_similarity:
+                    labels[url] = "target"
+                elif not name_hit and similarities[url] < self.low_similarity:
+                    labels[url] = "other"
+                else:
+                    labels[url] = "undecided"
+        return labels
@@ -0,0 +1,257 @@
+"""Per-node timing, token and credit metrics of graph runs."""
+
+import asyncio
+import contextvars
+import functools
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+_current_span = contextvars.ContextVar("company_researcher_span", default=None)
+
+
+class Span:
+    """Timing, token and credit measurements for one execution of a graph node (OpenTelemetry-style)."""
+
+    def __init__(self, name):
+        """Start a span for the node `name`."""
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start_time = time.time()
+        self.end_time = None
+        self._start = time.perf_counter()
+        self.wall_time = 0.0
+        self.provider_wait = defaultdict(float)  # cumulative seconds, concurrent calls add up
+        self.provider_calls = defaultdict(int)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tavily_credits = 0.0
+        self.attributes = {}
+        self.error = None
+
+    def finish(self, error=None):
+        """End the span, recording the error it failed with, if any."""
+        self.end_time = time.time()
+        self.wall_time = time.perf_counter() - self._start
+        self.error = str(error) if error else None
+
+    def to_dict(self):
+        """Return the span's measurements as a JSON-serializable dict."""
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "wall_time": self.wall_time,
+            "provider_wait": dict(self.provider_wait),
+            "provider_calls": dict(self.provider_calls),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tavily_credits": self.tavily_credits,
+            "attributes": dict(self.attributes),
+            "error": self.error,
+        }
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q * (len(values) - 1))))
+    return values[index]
+
+
+class MetricsRecorder:
+    """Keeps the most recent finished spans and exports them as JSON or Prometheus text."""
+
+    def __init__(self, max_spans=10000):
+        """Keep at most `max_spans` spans, dropping the oldest."""
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        """Add a finished span."""
+        with self._lock:
+            self.spans.append(span.to_dict())
+
+    def reset(self):
+        """Drop every recorded span."""
+        with self._lock:
+            self.spans.clear()
+
+    def summary(self):
+        """Aggregate the recorded spans per node, including latency percentiles."""
+        with self._lock:
+            spans = list(self.spans)
+        by_node = defaultdict(list)
+        for span in spans:
+            by_node[span["name"]].append(span)
+        summary = {}
+        for name, node_spans in by_node.items():
+            wall_times = [span["wall_time"] for span in node_spans]
+            provider_wait = defaultdict(float)
+            for span in node_spans:
+                for provider, seconds in span["provider_wait"].items():
+                    provider_wait[provider] += seconds
+            summary[name] = {
+                "count": len(node_spans),
+                "errors": sum(1 for span in node_spans if span["error"]),
+                "wall_time_sum": sum(wall_times),
+                "wall_time_p50": _percentile(wall_times, 0.5),
+                "wall_time_p95": _percentile(wall_times, 0.95),
+                "wall_time_p99": _percentile(wall_times, 0.99),
+                "provider_wait_sum": dict(provider_wait),
+                "prompt_tokens": sum(span["prompt_tokens"] for span in node_spans),
+                "completion_tokens": sum(span["completion_tokens"] for span in node_spans),
+                "tavily_credits": sum(span["tavily_credits"] for span in node_spans),
+            }
+        return summary
+
+    def to_json(self, include_spans=False):
+        """Return the per-node summary as JSON, with every recorded span if `include_spans`."""
+        payload = {"nodes": self.summary()}
+        if include_spans:
+            with self._lock:
+                payload["spans"] = list(self.spans)
+        return json.dumps(payload)
+
+    def to_prometheus(self, prefix="company_researcher"):
+        """Render the aggregated metrics in the Prometheus text exposition format."""
+        lines = [f"# TYPE {prefix}_node_duration_seconds summary"]
+        summary = self.summary()
+        for node, stats in summary.items():
+            for quantile, key in (("0.5", "wall_time_p50"), ("0.95", "wall_time_p95"), ("0.99", "wall_time_p99")):
+                lines.append(f'{prefix}_node_duration_seconds{{node="{node}",quantile="{quantile}"}} {stats[key]}')
+            lines.append(f'{prefix}_node_duration_seconds_sum{{node="{node}"}} {stats["wall_time_sum"]}')
+            lines.append(f'{prefix}_node_duration_seconds_count{{node="{node}"}} {stats["count"]}')
+        lines.append(f"# TYPE {prefix}_node_errors_total counter")
+        for node, stats in summary.items():
+            lines.append(f'{prefix}_node_errors_total{{node="{node}"}} {stats["errors"]}')
+        lines.append(f"# TYPE {prefix}_provider_wait_seconds_total counter")
+        for node, stats in summary.items():
+            for provider, seconds in stats["provider_wait_sum"].items():
+                lines.append(f'{prefix}_provider_wait_seconds_total{{node="{node}",provider="{provider}"}} {seconds}')
+        lines.append(f"# TYPE {prefix}_llm_tokens_total counter")
+        for node, stats in summary.items():
+            lines.append(f'{prefix}_llm_tokens_total{{node="{node}",type="prompt"}} {stats["prompt_tokens"]}')
+            lines.append(f'{prefix}_llm_tokens_total{{node="{node}",type="completion"}} {stats["completion_tokens"]}')
+        lines.append(f"# TYPE {prefix}_tavily_credits_total counter")
+        for node, stats in summary.items():
+            lines.append(f'{prefix}_tavily_credits_total{{node="{node}"}} {stats["tavily_credits"]}')
+        return "\n".join(lines) + "\n"
+
+
+recorder = MetricsRecorder()
+
+
+def current_span():
+    """Return the span of the node running in this context, or None."""
+    return _current_span.get()
+
+
+def instrument(name, node):
+    """Wrap a graph node so each execution is measured in a span.
+
+    The finished span is kept by the module-level `recorder` and also returned in the node's `metrics` update.
+    """
+
+    @functools.wraps(node)
+    async def wrapper(state):
+        span = Span(name)
+        token = _current_span.set(span)
+        error = None
+        try:
+            result = await node(state)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            span.finish(error)
+            _current_span.reset(token)
+            recorder.record(span)
+        if isinstance(result, dict):
+            result = {**result, "metrics": [span.to_dict()]}
+        return result
+
+    return wrapper
+
+
+def create_task_in_span(name, coro):
+    """Run background work (e.g. speculative prefetches) in its own span instead of the caller's."""
+
+    async def runner():
+        span = Span(name)
+        _current_span.set(span)
+        error = None
+        try:
+            return await coro
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            span.finish(error)
+            recorder.record(span)
+
+    return asyncio.create_task(runner(), context=contextvars.Context())
+
+
+@asynccontextmanager
+async def provider_call(provider):
+    """Measures the time spent waiting on a provider (tavily, openai, cohere) within the current span."""
+    span = _current_span.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if span is not None:
+            span.provider_wait[provider] += time.perf_counter() - start
+            span.provider_calls[provider] += 1
+
+
+def record_llm_usage(message):
+    """Add the token usage reported on an LLM response message to the current span."""
+    span = _current_span.get()
+    usage = getattr(message, "usage_metadata", None)
+    if span is None or not usage:
+        return
+    span.prompt_tokens += usage.get("input_tokens", 0)
+    span.completion_tokens += usage.get("output_tokens", 0)
+
+
+def record_tavily_credits(credits):
+    """Add Tavily credits to the current span."""
+    span = _current_span.get()
+    if span is not None:
+        span.tavily_credits += credits
+
+
+@contextmanager
+def billed_tavily_request(credits):
+    """Record a Tavily request's credits when it is sent rather than when its response is used.
+
+    A request cancelled on our side, e.g. the losing request of a hedge, is still billed. A request that fails
+    is not, so its credits are taken back.
+    """
+    record_tavily_credits(credits)
+    try:
+        yield
+    except Exception:
+        record_tavily_credits(-credits)
+        raise
+
+
+def set_attribute(key, value):
+    """Set an attribute of the current span, if any."""
+    span = _current_span.get()
+    if span is not None:
+        span.attributes[key] = value
+
+
+def increment_attribute(key, value=1):
+    """Add `value` to a numeric attribute of the current span, if any."""
+    span = _current_span.get()
+    if span is not None:
+        span.attributes[key] = span.attributes.get(key, 0) + value
@@ -0,0 +1,140 @@
+"""Selection of the passages of extracted pages that prompts carry."""
+
+import re
+
+from company_researcher.utils.bm25 import BM25
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_LINK_RE = re.compile(r"\[[^\]]*\]\([^)]*\)|https?://\S+")
+_BOILERPLATE_RE = re.compile(
+    r"\b(?:cookies?|privacy policy|terms of (?:service|use)|all rights reserved|subscribe|newsletter|sign (?:in|up)|"
+    r"log ?in|skip to (?:main )?content|javascript)\b",
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Return a rough token count of `text`, at ~4 characters per token."""
+    return len(text) // 4 + 1
+
+
+def split_passages(text: str, size=800, drop_boilerplate=False) -> list[str]:
+    """Split text into passages of about `size` characters along paragraph and sentence boundaries.
+
+    With `drop_boilerplate`, boilerplate paragraphs are removed before they are packed into passages.
+    """
+    pieces = []
+    for paragraph in _PARAGRAPH_RE.split(text or ""):
+        paragraph = paragraph.strip()
+        if len(paragraph) <= size:
+            if paragraph:
+                pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_RE.split(paragraph):
+            pieces += [sentence[i:i + size] for i in range(0, len(sentence), size)]
+    if drop_boilerplate:
+        pieces = [piece for piece in pieces if not is_boilerplate(piece)]
+
+    passages = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 1 > size:
+            passages.append(current)
+            current = piece
+        else:
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+def is_boilerplate(passage: str) -> bool:
+    """Detect navigation menus, link lists, cookie banners and footers."""
+    words = passage.split()
+    if len(words) < 8:
+        return True
+    lines = [line for line in passage.splitlines() if line.strip()]
+    if lines and sum(1 for line in lines if len(line.split()) <= 3) / len(lines) > 0.6:
+        return True
+    if len(_LINK_RE.findall(passage)) * 6 > len(words):
+        return True
+    return len(words) < 60 and bool(_BOILERPLATE_RE.search(passage))
+
+
+def truncate_documents(documents: dict, max_chars) -> dict:
+    """Return copies of the documents whose raw content is cut to its first `max_chars` characters."""
+    truncated = {}
+    for url, doc in documents.items():
+        raw_content = doc.get("raw_content")
+        if raw_content and len(raw_content) > max_chars:
+            doc = {**doc, "raw_content": raw_content[:max_chars] + " [...]"}
+        truncated[url] = doc
+    return truncated
+
+
+def compact_documents(documents: dict, queries, token_budget, passage_size=800) -> dict:
+    """Shortcut for `PassageIndex(documents, passage_size).compact(queries, token_budget)`."""
+    return PassageIndex(documents, passage_size).compact(queries, token_budget)
+
+
+class PassageIndex:
+    """Ranks passages of the extracted documents so prompts carry the relevant parts of each page.
+
+    Every document's raw content is split into passages, boilerplate is dropped, and the rest is ranked with BM25
+    against the report's queries (its sections and the requested include items). `select` packs the best passages
+    of every query in turn under a token budget, instead of keeping only the head of each page.
+    """
+
+    def __init__(self, documents: dict, passage_size=800):
+        """Split and index the raw content of `documents`."""
+        self.documents = documents
+        self.passages = []  # (url, position, text)
+        for url, doc in documents.items():
+            passages = split_passages(doc.get("raw_content") or "", passage_size, drop_boilerplate=True)
+            self.passages += [(url, position, passage) for position, passage in enumerate(passages)]
+        self.bm25 = BM25([passage for _, _, passage in self.passages])
+
+    def select(self, queries, token_budget, urls=None):
+        """Return the selected passages by URL, in page order, taking the best remaining passage of each query in turn."""
+        allowed = set(urls) if urls is not None else None
+        rankings = []
+        for query in queries:
+            scores = self.bm25.scores(query)
+            ranked = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: scores[i], reverse=True)
+            rankings.append([i for i in ranked if allowed is None or self.passages[i][0] in allowed])
+
+        selected = set()
+        budget = token_budget
+        cursors = [0] * len(rankings)
+        while budget > 0 and any(cursor < len(ranking) for cursor, ranking in zip(cursors, rankings)):
+            for query_index, ranking in enumerate(rankings):
+                # Advance to the query's best passage that isn't selected yet and still fits
+                while cursors[query_index] < len(ranking):
+                    i = ranking[cursors[query_index]]
+                    cursors[query_index] += 1
+                    cost = estimate_tokens(self.passages[i][2])
+                    if i not in selected and cost <= budget:
+                        selected.add(i)
+                        budget -= cost
+                        break
+
+        by_url = {}
+        for i in sorted(selected, key=lambda i: self.passages[i][:2]):
+            url, _, passage = self.passages[i]
+            by_url.setdefault(url, []).append(passage)
+        return by_url
+
+    def compact(self, queries, token_budget, urls=None):
+        """Return copies of the documents whose raw content is replaced by their selected passages."""
+        urls = list(self.documents) if urls is None else urls
+        selected = self.select(queries, token_budget, urls)
+        compacted = {}
+        for url in urls:
+            doc = dict(self.documents[url])
+            if doc.get("raw_content"):
+                doc["raw_content"] = " [...] ".join(selected.get(url, []))
+                if not doc["raw_content"]:
+                    del doc["raw_content"]
+            compacted[url] = doc
+        return compacted
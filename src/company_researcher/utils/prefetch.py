@@ -0,0 +1,103 @@
+"""Speculative Tavily extracts that later nodes pick up."""
+
+import asyncio
+import time
+
+from company_researcher.utils import doc_store, metrics, rate_limit
+from company_researcher.utils.dedup import canonicalize_url
+
+
+class Prefetcher:
+    """Runs speculative Tavily extracts in the background so a later node can pick up the results.
+
+    Prefetches are tracked per URL and extract depth. `take` hands finished (or still running) extracts to the
+    caller, promoting them from BACKGROUND to the caller's priority, `discard` drops speculative work that turned out
+    not to be needed, and entries nobody claims are dropped after `ttl` seconds. `used` and `wasted` count
+    speculative fetches over the process lifetime.
+    """
+
+    def __init__(self, tavily, ttl=300):
+        """Prefetch with the `tavily` client, dropping the extracts nobody claimed after `ttl` seconds."""
+        self.tavily = tavily
+        self.ttl = ttl
+        self.used = 0
+        self.wasted = 0
+        self._pending = {}  # (url, extract_depth) -> (task, started_at, Priority)
+        self._claims = {}  # task -> number of `take` calls waiting on it
+
+    def prefetch(self, urls, extract_depth="basic"):
+        """Start extracting the URLs that are not already being prefetched and return them."""
+        self._expire()
+        urls = [url for url in dict.fromkeys(urls) if (url, extract_depth) not in self._pending]
+        if not urls:
+            return []
+        # Speculative extracts yield the shared Tavily budget to the calls a report is waiting on, and pin the
+        # content they store to the run that started them
+        extract = self.tavily.extract(urls, {}, extract_depth=extract_depth)
+        background = rate_limit.Priority(rate_limit.BACKGROUND)
+        task = metrics.create_task_in_span(
+            "prefetch", rate_limit.in_background(doc_store.run_owned_by(doc_store.current_owner(), extract), background))
+        started_at = time.monotonic()
+        for url in urls:
+            self._pending[(url, extract_depth)] = (task, started_at, background)
+        return urls
+
+    async def take(self, urls, extract_depth="basic"):
+        """Wait for the prefetched URLs among `urls` and return their documents keyed by URL."""
+        entries = {}
+        level = rate_limit.current_level()
+        for url in urls:
+            entry = self._pending.pop((url, extract_depth), None)
+            if entry:
+                task, _, background = entry
+                # The caller now waits on the extract, so its calls must not queue behind other runs' regular calls
+                background.promote(level)
+                entries[url] = task
+        results = {}
+        tasks = set(entries.values())
+        for task in tasks:
+            self._claims[task] = self._claims.get(task, 0) + 1
+        try:
+            for task in tasks:
+                # Wait without awaiting the task itself, so cancelling this caller doesn't cancel an extract other
+                # runs may still claim, while the caller's cancellation still propagates
+                await asyncio.wait([task])
+                if task.cancelled() or task.exception() is not None:
+                    continue
+                documents, _ = task.result()
+                by_canonical = {canonicalize_url(url): doc for url, doc in documents.items()}
+                for url, url_task in entries.items():
+                    if url_task is task:
+                        doc = documents.get(url) or by_canonical.get(canonicalize_url(url))
+                        if doc and doc.get("raw_content_id"):
+                            results[url] = doc
+        finally:
+            for task in tasks:
+                self._claims[task] -= 1
+                if not self._claims[task]:
+                    del self._claims[task]
+                    self._cancel_if_orphaned(task)
+        self.used += len(results)
+        return results
+
+    def discard(self, urls, extract_depth="basic"):
+        """Drop prefetches that are no longer needed, cancelling extracts nobody else is waiting on."""
+        for url in urls:
+            entry = self._pending.pop((url, extract_depth), None)
+            if entry:
+                self.wasted += 1
+                self._cancel_if_orphaned(entry[0])
+
+    def _cancel_if_orphaned(self, task):
+        # A task is still wanted while a URL it extracts is pending or a `take` call is waiting on it
+        if (not task.done() and task not in self._claims
+                and all(other is not task for other, _, _ in self._pending.values())):
+            task.cancel()
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [key for key, (_, started_at, _) in self._pending.items() if now - started_at > self.ttl]
+        for key in expired:
+            task, _, _ = self._pending.pop(key)
+            self.wasted += 1
+            self._cancel_if_orphaned(task)
@@ -0,0 +1,262 @@
+"""Shared, prioritized rate limiting of provider calls."""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import random
+import time
+from contextlib import contextmanager
+
+# Priority classes, lower is served first
+CRITICAL = 0  # on the critical path of a report, e.g. writing it
+NORMAL = 1
+BACKGROUND = 2  # speculative or duplicate work whose result may never be used
+
+
+class Priority:
+    """Priority level shared by a block of work and the tasks it starts.
+
+    It can be raised while the work runs, e.g. when a caller starts waiting on a speculative prefetch, which
+    also moves its calls already queued at a limiter up.
+    """
+
+    def __init__(self, level):
+        """Start at the priority class `level`."""
+        self.level = level
+        self._limiters = []  # limiters this priority has calls queued at, once per call
+
+    def promote(self, level):
+        """Raise the priority to `level` if that is more urgent."""
+        if level < self.level:
+            self.level = level
+            for limiter in set(self._limiters):
+                limiter.reprioritize()
+
+
+# Unset means NORMAL, a shared default Priority would let one promotion raise every call's priority
+_priority = contextvars.ContextVar("company_researcher_priority", default=None)
+
+
+def current_priority():
+    """Return the Priority of the calls made in this context."""
+    return _priority.get() or Priority(NORMAL)
+
+
+@contextmanager
+def priority(level):
+    """Set the priority of the provider calls made within the block (and the tasks it starts).
+
+    `level` is a priority class or a Priority that can be promoted later.
+    """
+    token = _priority.set(level if isinstance(level, Priority) else Priority(level))
+    try:
+        yield _priority.get()
+    finally:
+        _priority.reset(token)
+
+
+def current_level():
+    """Return the priority class of the calls made in this context."""
+    return current_priority().level
+
+
+async def in_background(coro, background=None):
+    """Await a coroutine with BACKGROUND priority, for work started in a fresh context such as prefetch tasks.
+
+    Pass a `Priority(BACKGROUND)` as `background` to be able to promote the work later.
+    """
+    with priority(background or BACKGROUND):
+        return await coro
+
+
+def retry_after(error):
+    """Return the seconds a provider asked to wait after rate limiting a call.
+
+    That is 0 if the provider didn't say, and None if the error is not a rate limit.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    rate_limited = status == 429 or type(error).__name__ in {"RateLimitError", "TooManyRequestsError",
+                                                             "UsageLimitExceededError"}
+    if not rate_limited:
+        return None
+    for value in (getattr(error, "retry_after", None), getattr(error, "retry_after_seconds", None),
+                  (getattr(response, "headers", None) or {}).get("retry-after")):
+        try:
+            if value is not None:
+                return max(float(value), 0.0)
+        except (TypeError, ValueError):
+            continue
+    return 0.0
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to a burst of one minute's worth."""
+
+    def __init__(self, rate_per_minute):
+        """Start with a full bucket."""
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Return the seconds until `amount` units are available, more than the burst waits for a full bucket."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(missing, 0.0) / self.rate
+
+    def consume(self, amount):
+        """Take `amount` units, a negative amount gives them back."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class ProviderLimiter:
+    """Requests-per-minute and tokens-per-minute budget of one provider, granted to waiters in priority order."""
+
+    def __init__(self, name, rpm=None, tpm=None):
+        """Limit the provider `name` to `rpm` requests and `tpm` tokens per minute, unlimited if None."""
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self._waiters = []  # heap of [level, sequence, Priority]
+        self._sequence = itertools.count()
+        self._changed = None
+        self._loop = None
+
+    def _notify(self):
+        """Wakes every waiter so the head of the queue re-checks the budget."""
+        if self._changed is not None:
+            self._changed.set()
+        self._changed = asyncio.Event()
+
+    def reprioritize(self):
+        """Re-sort the waiters after the level of a queued Priority changed."""
+        for entry in self._waiters:
+            entry[0] = entry[2].level
+        heapq.heapify(self._waiters)
+        if self._loop is not None:
+            self._notify()
+
+    def _wait_time(self, tokens):
+        wait = max(self.paused_until - time.monotonic(), 0.0)
+        if self.requests:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait
+
+    async def acquire(self, tokens=0, level=None):
+        """Wait until one request and `tokens` tokens fit the budget and no higher-priority call is waiting."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # The limiter outlived a previous event loop, e.g. between asyncio.run calls
+            self._loop, self._waiters, self._changed = loop, [], asyncio.Event()
+        queued = current_priority() if level is None else Priority(level)
+        entry = [queued.level, next(self._sequence), queued]
+        heapq.heappush(self._waiters, entry)
+        queued._limiters.append(self)
+        try:
+            while True:
+                changed = self._changed
+                wait = self._wait_time(tokens) if self._waiters[0] is entry else None
+                if wait == 0:
+                    if self.requests:
+                        self.requests.consume(1)
+                    if self.tokens and tokens:
+                        self.tokens.consume(tokens)
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=wait)
+                except TimeoutError:
+                    pass
+        finally:
+            queued._limiters.remove(self)
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+            self._notify()
+
+    def settle(self, estimated, actual):
+        """Correct the token budget once a call's actual token usage is known."""
+        if self.tokens and actual is not None:
+            self.tokens.consume(actual - estimated)
+
+    def pause(self, seconds):
+        """Hold back every call to the provider, e.g. for the retry-after period of a 429 response."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        if self._loop is not None:
+            self._notify()
+
+
+class RateLimiter:
+    """Shared view of every provider's rate limits across nodes, agents and concurrent graph runs.
+
+    Calls wait for their provider's request and token budgets, with CRITICAL calls served before NORMAL and
+    BACKGROUND ones. Rate-limited calls (HTTP 429) pause the provider for the retry-after period and are retried
+    instead of failing into empty results.
+    """
+
+    def __init__(self, limits=None, max_retries=3, backoff_base=1.0, backoff_max=30.0):
+        """Apply `limits` and retry rate-limited calls up to `max_retries` times with exponential backoff."""
+        self.limits = {}
+        self.providers = {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.configure(limits or {})
+
+    def configure(self, limits, max_retries=None):
+        """Set the {provider: {"rpm": ..., "tpm": ...}} limits, replacing the budgets of changed providers."""
+        for name, limit in limits.items():
+            if self.limits.get(name) != limit:
+                self.limits[name] = dict(limit)
+                self.providers.pop(name, None)
+        if max_retries is not None:
+            self.max_retries = max_retries
+
+    def provider(self, name):
+        """Return the limiter of a provider, creating it on first use."""
+        if name not in self.providers:
+            limit = self.limits.get(name, {})
+            self.providers[name] = ProviderLimiter(name, rpm=limit.get("rpm"), tpm=limit.get("tpm"))
+        return self.providers[name]
+
+    async def acquire(self, name, tokens=0):
+        """Wait for a call to the provider `name` using `tokens` tokens."""
+        await self.provider(name).acquire(tokens)
+
+    def retry_delay(self, name, error, attempt):
+        """Return how long to wait before retrying after `error`, or None if the call should not be retried.
+
+        A rate limit pauses the whole provider, so concurrent calls back off too.
+        """
+        delay = retry_after(error)
+        if delay is None or attempt >= self.max_retries:
+            return None
+        if not delay:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.5)
+        self.provider(name).pause(delay)
+        return delay
+
+    async def call(self, name, fn, tokens=0):
+        """Call the coroutine function `fn` within the provider's budget, retrying when it is rate limited."""
+        attempt = 0
+        while True:
+            await self.acquire(name, tokens)
+            try:
+                return await fn()
+            except Exception as e:
+                if self.retry_delay(name, e, attempt) is None:
+                    raise
+                attempt += 1
+
+
+limiter = RateLimiter()
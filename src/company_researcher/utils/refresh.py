@@ -0,0 +1,63 @@
+"""Snapshots of finished runs and what a refresh can reuse from them."""
+
+import hashlib
+import json
+from datetime import UTC, datetime
+
+
+def document_fingerprint(doc: dict) -> str:
+    """Hashes the parts of a search result that change when the underlying source changes."""
+    payload = json.dumps([doc.get("title"), doc.get("content")], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def carry_over(previous_documents: dict, documents: dict, is_available=lambda content_id: True):
+    """Reuses extractions of unchanged documents from a previous run.
+
+    Returns the updated documents and the URLs that are new or changed since the previous run.
+    """
+    updated = {}
+    changed_urls = []
+    for url, doc in documents.items():
+        previous = previous_documents.get(url)
+        content_id = (previous or {}).get("raw_content_id")
+        if previous and document_fingerprint(previous) == document_fingerprint(doc):
+            if content_id and not doc.get("raw_content_id") and is_available(content_id):
+                doc = {**doc, "raw_content_id": content_id}
+        else:
+            changed_urls.append(url)
+        updated[url] = doc
+    return updated, changed_urls
+
+
+def documents_hash(include, grounding_data: dict, documents: dict) -> str:
+    """Hashes everything the report is written from, so an unchanged document set can reuse the old report."""
+    payload = json.dumps([
+        sorted(include),
+        sorted((url, doc.get("raw_content_id")) for url, doc in grounding_data.items()),
+        sorted((url, doc.get("raw_content_id") or document_fingerprint(doc)) for url, doc in documents.items()),
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_snapshot(state, report: str, report_documents_hash: str) -> dict:
+    """Capture the parts of a finished run that a later refresh can reuse."""
+    return {
+        "company": state.company,
+        "company_url": state.company_url,
+        "include": list(state.include),
+        "grounding_data": state.grounding_data,
+        "research_data": state.research_data,
+        "search_queries": [query.model_dump() for query in state.search_queries],
+        "clusters": [cluster.model_dump() for cluster in state.clusters],
+        "chosen_cluster": state.chosen_cluster,
+        "report": report,
+        "documents_hash": report_documents_hash,
+        "created_at": datetime.now(UTC).isoformat(),
+    }
+
+
+def snapshot_content_ids(snapshot: dict) -> list:
+    """Return the content IDs of the extracted documents a snapshot refers to."""
+    documents = {**(snapshot.get("grounding_data") or {}), **(snapshot.get("research_data") or {})}
+    return sorted({doc["raw_content_id"] for doc in documents.values() if doc.get("raw_content_id")})
@@ -0,0 +1,228 @@
+"""Recording and replay of provider responses, with injected latency and faults, for benchmarks."""
+
+import asyncio
+import json
+import math
+import os
+import random
+import re
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from company_researcher.utils.cache import Cache
+
+# Report prompts embed today's date, which would otherwise make every recording stale the next day
+_DATE_RE = re.compile(r"\b(January|February|March|April|May|June|July|August|September|October|November|December) \d{2}, \d{4}\b")
+
+
+class ReplayMiss(KeyError):
+    """Raised in replay mode when a request was never recorded and no fallback is configured."""
+
+
+class InjectedProviderError(RuntimeError):
+    """Raised by a fake provider to simulate a provider failure."""
+
+
+class InjectedRateLimitError(InjectedProviderError):
+    """A simulated HTTP 429 response asking the caller to retry after `retry_after` seconds."""
+
+    status_code = 429
+
+    def __init__(self, message, retry_after=0.0):
+        """Fail with `message`, asking to retry after `retry_after` seconds."""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Cassette:
+    """A JSON file of recorded provider responses keyed by a hash of the request."""
+
+    def __init__(self, path=None):
+        """Load the recordings from `path`, if it exists."""
+        self.path = path
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def key(provider, method, payload):
+        """Return the key a request is recorded under."""
+        return Cache.make_key(provider, method, payload)
+
+    def get(self, key):
+        """Return the recorded response, or None."""
+        return self.entries.get(key)
+
+    def put(self, key, value):
+        """Record a response."""
+        self.entries[key] = value
+
+    def save(self, path=None):
+        """Write the recordings to `path`, by default the file they were loaded from."""
+        path = path or self.path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+
+
+class FaultInjector:
+    """Adds simulated latency and errors to fake provider calls.
+
+    Latency is drawn from a log-normal distribution with the given median (seconds) and shape `sigma`, which
+    gives the long right tail real providers show. Each call fails with probability `error_rate`, and is rate
+    limited (HTTP 429) with probability `rate_limit_rate`.
+    """
+
+    def __init__(self, median_latency=0.0, sigma=0.5, error_rate=0.0, seed=None, rate_limit_rate=0.0,
+                 retry_after=0.1):
+        """Inject nothing by default, `seed` makes the injected latencies and faults reproducible."""
+        self.median_latency = median_latency
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+    async def __call__(self, provider):
+        """Wait the simulated latency of a `provider` call, then raise the simulated error, if any."""
+        if self.median_latency > 0:
+            await asyncio.sleep(self.random.lognormvariate(math.log(self.median_latency), self.sigma))
+        if self.error_rate and self.random.random() < self.error_rate:
+            raise InjectedProviderError(f"Injected {provider} error")
+        if self.rate_limit_rate and self.random.random() < self.rate_limit_rate:
+            raise InjectedRateLimitError(f"Injected {provider} rate limit", retry_after=self.retry_after)
+
+
+class _ReplayProvider:
+    def __init__(self, cassette, mode="replay", client=None, faults=None, fallback=None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown replay mode '{mode}'")
+        if mode == "record" and client is None:
+            raise ValueError("Recording requires the real client to wrap")
+        self.cassette = cassette
+        self.mode = mode
+        self.client = client
+        self.faults = faults or FaultInjector()
+        self.fallback = fallback
+
+    async def _call(self, provider, method, payload, record):
+        """Replays a recorded response, or in record mode performs the real call via `record` and stores it."""
+        key = Cassette.key(provider, method, payload)
+        if self.mode == "record":
+            value = await record()
+            self.cassette.put(key, value)
+            return value
+        await self.faults(provider)
+        value = self.cassette.get(key)
+        if value is None:
+            if self.fallback is None:
+                raise ReplayMiss(f"No recorded {provider}.{method} response for {json.dumps(payload)[:200]}")
+            value = self.fallback(method, payload)
+        return value
+
+
+class ReplayTavilyClient(_ReplayProvider):
+    """Stands in for AsyncTavilyClient, recording or replaying search and extract responses."""
+
+    async def search(self, query, **kwargs):
+        """Record or replay a search."""
+        payload = {"query": query, **kwargs}
+        return await self._call("tavily", "search", payload, lambda: self.client.search(query=query, **kwargs))
+
+    async def extract(self, urls, **kwargs):
+        """Record or replay an extract."""
+        payload = {"urls": list(urls), **kwargs}
+        return await self._call("tavily", "extract", payload, lambda: self.client.extract(urls=urls, **kwargs))
+
+
+class ReplayCohereClient(_ReplayProvider):
+    """Stands in for cohere.AsyncClient, recording or replaying rerank responses."""
+
+    async def rerank(self, query, documents, top_n=None, **kwargs):
+        """Record or replay a rerank."""
+        payload = {"query": query, "documents": list(documents), "top_n": top_n}
+
+        async def record():
+            response = await self.client.rerank(query=query, documents=documents, top_n=top_n, **kwargs)
+            return [{"index": r.index, "relevance_score": r.relevance_score} for r in response.results]
+
+        results = await self._call("cohere", "rerank", payload, record)
+        return SimpleNamespace(results=[SimpleNamespace(**r) for r in results])
+
+
+def _prompt_payload(messages):
+    return [{"type": message.type, "content": _DATE_RE.sub("<date>", message.content)} for message in messages]
+
+
+def _usage(value):
+    usage = value.get("usage") or {}
+    return {
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "total_tokens": usage.get("input_tokens", 0) + usage.get("output_tokens", 0),
+    }
+
+
+class ReplayChatModel(_ReplayProvider):
+    """Stands in for a ChatOpenAI instance, recording or replaying plain and structured-output completions."""
+
+    def __init__(self, cassette, mode="replay", client=None, faults=None, fallback=None,
+                 model_name="gpt-4o-mini", temperature=0.0, chunk_size=20):
+        """Replay as `model_name` unless a client is wrapped, streaming completions in `chunk_size` character pieces."""
+        super().__init__(cassette, mode=mode, client=client, faults=faults, fallback=fallback)
+        self.model_name = getattr(client, "model_name", model_name)
+        self.temperature = getattr(client, "temperature", temperature)
+        self.chunk_size = chunk_size
+
+    def _payload(self, messages, schema=None):
+        return {"model": self.model_name, "temperature": self.temperature,
+                "schema": schema.__name__ if schema else None, "messages": _prompt_payload(messages)}
+
+    async def _complete(self, messages):
+        async def record():
+            message = await self.client.ainvoke(messages)
+            return {"content": message.content, "usage": message.usage_metadata}
+
+        return await self._call("openai", "chat", self._payload(messages), record)
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        """Record or replay a completion."""
+        value = await self._complete(messages)
+        return AIMessage(content=value["content"], usage_metadata=_usage(value))
+
+    async def astream(self, messages, config=None, **kwargs):
+        """Record or replay a completion, yielding it in chunks."""
+        value = await self._complete(messages)
+        content = value["content"]
+        pieces = [content[i:i + self.chunk_size] for i in range(0, len(content), self.chunk_size)] or [""]
+        for index, piece in enumerate(pieces):
+            last = index == len(pieces) - 1
+            yield AIMessageChunk(content=piece, usage_metadata=_usage(value) if last else None)
+            await asyncio.sleep(0)
+
+    def with_structured_output(self, schema, include_raw=False, **kwargs):
+        """Return a runnable recording or replaying structured-output completions of `schema`."""
+        return _ReplayStructuredRunnable(self, schema, include_raw)
+
+
+class _ReplayStructuredRunnable:
+    def __init__(self, model, schema, include_raw):
+        self.model = model
+        self.schema = schema
+        self.include_raw = include_raw
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        model = self.model
+
+        async def record():
+            response = await model.client.with_structured_output(self.schema, include_raw=True).ainvoke(messages)
+            return {"parsed": response["parsed"].model_dump(), "usage": response["raw"].usage_metadata}
+
+        value = await model._call("openai", "structured", model._payload(messages, self.schema), record)
+        parsed = self.schema.model_validate(value["parsed"])
+        if not self.include_raw:
+            return parsed
+        raw = AIMessage(content="", usage_metadata=_usage(value))
+        return {"raw": raw, "parsed": parsed, "parsing_error": None}
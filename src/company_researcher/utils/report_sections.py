@@ -0,0 +1,161 @@
+"""The fixed sections of the report and the documents and include items each one is written from."""
+
+import re
+from typing import List
+
+from pydantic import BaseModel
+
+from company_researcher.utils.bm25 import BM25
+from company_researcher.utils.dedup import canonicalize_url
+
+
+class ReportSection(BaseModel):
+    """A report section, written by its own LLM call in the 'sections' write mode."""
+
+    title: str
+    description: str
+    query: str  # keywords used to select the section's documents
+    use_grounding: bool = False
+
+
+REPORT_SECTIONS = [
+    ReportSection(
+        title="Executive Summary",
+        description=(
+            "- High-level overview of the company, its services, location, employee count, and achievements.\n"
+            "- Make sure to include the general information necessary to understand the company well, including any notable achievements."
+        ),
+        query="overview company about headquarters location founded employees mission achievements services",
+        use_grounding=True,
+    ),
+    ReportSection(
+        title="Leadership and Vision",
+        description=(
+            "- Details on the CEO and key team members, their experience, and alignment with company goals.\n"
+            "- Any personnel changes and their strategic impact."
+        ),
+        query="ceo founder co-founder chief executive leadership team president board hired appointed vision",
+    ),
+    ReportSection(
+        title="Product and Service Overview",
+        description=(
+            "- Summary of current products/services, features, updates, and market fit.\n"
+            "- Include details from the company's website, tools, or new integrations."
+        ),
+        query="product products platform service features pricing customers integration api launch",
+        use_grounding=True,
+    ),
+    ReportSection(
+        title="Financial Performance",
+        description=(
+            "- For public companies: key metrics (e.g., revenue, market cap).\n"
+            "- For startups: funding rounds, investors, and milestones."
+        ),
+        query="funding raised round series seed investors valuation revenue market cap financial ipo",
+    ),
+    ReportSection(
+        title="Recent Developments",
+        description="- New product enhancements, partnerships, competitive moves, or market entries.",
+        query="announced announces partnership new launch expansion acquisition recent news latest",
+    ),
+    ReportSection(
+        title="Competitive Landscape",
+        description=(
+            "- Overview of major competitors and their positioning in the market.\n"
+            "- Compare key differentiators, market share, pricing, and product/service features.\n"
+            "- Include relevant competitor developments that impact the company's strategy."
+        ),
+        query="competitors competitor alternatives versus vs compared market share rivals industry landscape",
+    ),
+]
+
+ADDITIONAL_SECTION = ReportSection(
+    title="Additional Information",
+    description="- User-requested information that does not fit into any of the other sections.",
+    query="",
+)
+
+
+def report_queries(include=None) -> List[str]:
+    """Return the queries passages are ranked against: one per report section plus the requested include items."""
+    return [f"{section.title} {section.query}" for section in REPORT_SECTIONS] + list(include or [])
+
+
+_LINK_RE = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)")
+
+
+class SectionPlanner:
+    """Decides which documents and user-requested items go into each report section.
+
+    Documents are ranked per section with BM25 against the section's keywords, and each requested item is assigned
+    to the single section it matches best, or to 'Additional Information' when it matches none, so it is never
+    repeated across sections.
+    """
+
+    def __init__(self, documents: dict, company: str, include: List[str]):
+        """Index the documents and assign each requested item to a section."""
+        self.urls = list(documents)
+        self.documents = list(documents.values())
+        self.company = company
+        self.include = list(include or [])
+        self.bm25 = BM25([
+            " ".join(str(doc.get(key) or "") for key in ("title", "content", "raw_content"))
+            for doc in self.documents
+        ])
+        section_bm25 = BM25([f"{section.title} {section.query}" for section in REPORT_SECTIONS])
+        self.assignments = {}
+        for item in self.include:
+            index, score = section_bm25.top_n(item, 1)[0]
+            title = REPORT_SECTIONS[index].title if score > 0 else ADDITIONAL_SECTION.title
+            self.assignments.setdefault(title, []).append(item)
+
+    def sections(self) -> List[ReportSection]:
+        """Return the sections to write, in report order."""
+        if ADDITIONAL_SECTION.title in self.assignments:
+            return REPORT_SECTIONS + [ADDITIONAL_SECTION]
+        return list(REPORT_SECTIONS)
+
+    def include_for(self, section: ReportSection) -> List[str]:
+        """Return the requested items assigned to the section."""
+        return self.assignments.get(section.title, [])
+
+    def query_for(self, section: ReportSection) -> str:
+        """Return the query the section's documents are ranked against."""
+        return " ".join([self.company, section.query] + self.include_for(section))
+
+    def urls_for(self, section: ReportSection, n: int) -> List[str]:
+        """Return the URLs of the n documents most relevant to the section, best first."""
+        return [self.urls[index] for index, score in self.bm25.top_n(self.query_for(section), n)]
+
+
+def report_header(title: str, date: str) -> str:
+    """Return the report's title and date, which start the report."""
+    return f"# {title}\n\n**Date:** {date}"
+
+
+def section_heading(number: int, section: ReportSection) -> str:
+    """Return the heading of a report section, including the blank lines around it, its body follows."""
+    return f"\n\n## {number}. {section.title}\n\n"
+
+
+def report_footer(sections: list, documents: dict) -> str:
+    """Return the deduplicated Citations section of the written (section, body) pairs, which ends the report."""
+    titles = {canonicalize_url(url): doc.get("title") for url, doc in documents.items()}
+    citations = {}
+    for _, body in sections:
+        for text, url in _LINK_RE.findall(body):
+            citations.setdefault(canonicalize_url(url), (titles.get(canonicalize_url(url)) or text, url))
+    if not citations:
+        return "\n"
+    links = "\n".join(f"- [{text}]({url})" for text, url in citations.values())
+    return f"\n\n## {len(sections) + 1}. Citations\n\n{links}\n"
+
+
+def assemble_report(title: str, date: str, sections: list, documents: dict) -> str:
+    """Join the written sections under fixed headings and append a deduplicated Citations section.
+
+    The report is the concatenation of `report_header`, each section's heading and body, and `report_footer`, so it
+    can be streamed part by part.
+    """
+    body = "".join(section_heading(number, section) + text for number, (section, text) in enumerate(sections, start=1))
+    return report_header(title, date) + body + report_footer(sections, documents)
@@ -0,0 +1,41 @@
+"""TF-IDF vectors and cosine similarity for short texts."""
+
+import math
+import re
+from collections import Counter
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_POSSESSIVE_RE = re.compile(r"['’]s\b")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it", "its", "of",
+    "on", "or", "that", "the", "this", "to", "was", "were", "will", "with", "we", "our", "you", "your",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercases and splits text into alphanumeric tokens, dropping possessive 's and common stopwords."""
+    text = _POSSESSIVE_RE.sub("", (text or "").lower())
+    return [token for token in _TOKEN_RE.findall(text) if token not in STOPWORDS]
+
+
+def tfidf_vectors(texts: list[str]) -> list[dict[str, float]]:
+    """Build L2-normalized TF-IDF vectors for a small corpus of texts."""
+    counts = [Counter(tokenize(text)) for text in texts]
+    document_frequency = Counter(token for count in counts for token in count)
+    total = len(texts)
+    vectors = []
+    for count in counts:
+        vector = {
+            token: (1 + math.log(tf)) * (math.log((1 + total) / (1 + document_frequency[token])) + 1)
+            for token, tf in count.items()
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        vectors.append({token: weight / norm for token, weight in vector.items()})
+    return vectors
+
+
+def cosine(vec_a: dict[str, float], vec_b: dict[str, float]) -> float:
+    """Cosine similarity of two normalized sparse vectors."""
+    if len(vec_a) > len(vec_b):
+        vec_a, vec_b = vec_b, vec_a
+    return sum(weight * vec_b.get(token, 0.0) for token, weight in vec_a.items())
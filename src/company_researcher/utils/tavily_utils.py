@@ -1,10 +1,15 @@
 import asyncio
-from datetime import datetime
-from tavily import AsyncTavilyClient
+import math
 from typing import List, Optional
 from pydantic import BaseModel, Field
-from company_researcher.config import Config
-cfg = Config()
+from company_researcher.utils.cache import Cache
+from company_researcher.utils.clients import registry
+from company_researcher.utils.dedup import canonicalize_url
+from company_researcher.utils.doc_store import DocumentStore
+from company_researcher.utils.extract_scheduler import ExtractScheduler
+from company_researcher.utils.hedge import hedged, latencies
+from company_researcher.utils import metrics
+from company_researcher.utils.rate_limit import limiter
 
 # Define Tavily's arguments to tailor the search results
 class TavilyQuery(BaseModel):
@@ -18,77 +23,234 @@ class TavilySearchInput(BaseModel):
     sub_queries: List[TavilyQuery] = Field(description="Set of web search queries that can be answered in isolation")
 
 
+def normalize_query(query: str) -> str:
+    """Normalize a search query so trivially different spellings share a cache entry."""
+    return " ".join(query.lower().split())
+
+
 class Tavily:
-    def __init__(self):
-        self.client = AsyncTavilyClient()
+    def __init__(self, cfg, documents: DocumentStore, cache: Cache | None = None, client=None):
+        """Store extracted content in `documents`, `cache` and `client` replace the shared ones."""
+        self.cfg = cfg
+        self.documents = documents
+        self._cache = cache
+        self._client = client
+        self._schedulers = {}
+
+    @property
+    def client(self):
+        """The injected Tavily client, or the shared one."""
+        return self._client or registry.tavily
+
+    @property
+    def cache(self) -> Cache | None:
+        """The injected cache, or the shared one when CACHE_ENABLED."""
+        if self._cache is None and self.cfg.CACHE_ENABLED:
+            return registry.cache(self.cfg.CACHE_PATH, self.cfg.CACHE_MAX_SIZE)
+        return self._cache
+
+    def extract_scheduler(self, extract_depth: str) -> ExtractScheduler:
+        """Return the scheduler for an extract depth, keeping latency observations across calls."""
+        if extract_depth not in self._schedulers:
+            self._schedulers[extract_depth] = ExtractScheduler(
+                concurrency=self.cfg.EXTRACT_CONCURRENCY,
+                max_batch_size=self.cfg.EXTRACT_MAX_BATCH_SIZE,
+                target_batch_latency=self.cfg.EXTRACT_TARGET_BATCH_LATENCY,
+                max_retries=self.cfg.EXTRACT_MAX_RETRIES,
+                url_deadline=self.cfg.EXTRACT_URL_DEADLINE,
+            )
+        return self._schedulers[extract_depth]
+
+    def hedge_delay(self, operation: str) -> float:
+        """Seconds after which a still running call of `operation` (e.g. 'search:basic') gets a hedge request."""
+        observed = latencies.percentile(operation, self.cfg.HEDGE_PERCENTILE, min_samples=self.cfg.HEDGE_MIN_SAMPLES)
+        return self.cfg.HEDGE_DEFAULT_DELAY if observed is None else observed
+
+    def _store_raw_content(self, sources_dict: dict, url: str, raw_content_id: str):
+        if url in sources_dict:
+            sources_dict[url] = {**sources_dict[url], 'raw_content_id': raw_content_id}
+        else:
+            sources_dict[url] = {'raw_content_id': raw_content_id}
 
-    async def extract(self, urls: list[str], sources_dict: dict, extract_depth="basic"):
+    async def extract(self, urls: list[str], sources_dict: dict, extract_depth="basic", use_cache=True):
+        """Extract the raw content of the URLs into the document store.
+
+        Returns a new dict with the documents of `sources_dict` plus a `raw_content_id` for every extracted URL;
+        the passed-in dict is left unchanged. With `use_cache=False` fresh content is fetched for every URL.
+        """
         msg = ""
+        cached_msg = ""
+        sources_dict = dict(sources_dict)
+
+        # Serve previously extracted URLs from the cache and only fetch the rest
+        if self.cache and use_cache:
+            pending = []
+            for url in urls:
+                raw_content_id = self.cache.get("extract", Cache.make_key(url, extract_depth))
+                # The cache only holds the content ID, the document itself may have been evicted from the store
+                if raw_content_id is None or self.documents.get(raw_content_id) is None:
+                    pending.append(url)
+                else:
+                    self._store_raw_content(sources_dict, url, raw_content_id)
+                    metrics.increment_attribute("tavily_cache_hits")
+                    cached_msg += f"{url} (cached)\n"
+            urls = pending
+
+        def extract_credits(url_count):
+            # Extract is billed per 5 successful URLs, advanced extraction costs twice as much
+            return math.ceil(url_count / 5) * (2 if extract_depth == "advanced" else 1)
+
+        async def extract_batch(url_batch):
+            # Assume every URL succeeds until the response says otherwise
+            estimated = extract_credits(len(url_batch))
+
+            async def request():
+                with latencies.track(f"extract:{extract_depth}"), metrics.billed_tavily_request(estimated):
+                    return await self.client.extract(urls=url_batch, extract_depth=extract_depth)
 
-        async def process_batch(url_batch):
-            batch_msg = ""
-            try:
-                response = await self.client.extract(urls=url_batch, extract_depth=extract_depth)
-                for itm in response['results']:
-                    url = itm['url']
-                    raw_content = itm['raw_content']
-                    if len(raw_content) > cfg.MAX_DOC_LENGTH:
-                        raw_content = raw_content[:cfg.MAX_DOC_LENGTH] + " [...]"
-                        if cfg.DEBUG:
-                            print(f"Content from {url} was truncated to the maximum allowed length ({cfg.MAX_DOC_LENGTH} characters). Current length: {len(raw_content)}\nPreview:\n{raw_content}")
-                    if url in sources_dict:
-                        sources_dict[url]['raw_content'] = raw_content
-                    else:
-                        sources_dict[url] = {'raw_content': raw_content}
-                    batch_msg += f"{url}\n"
-                return batch_msg
-            except Exception as e:
-                return f"Error occurred during Tavily Extract request for batch: {e}\n"
-
-        # Split URLs into batches of 20
-        url_batches = [urls[i:i + 20] for i in range(0, len(urls), 20)]
-
-        # Process all batches in parallel
-        results = await asyncio.gather(*[process_batch(batch) for batch in url_batches])
+            async with metrics.provider_call("tavily"):
+                response = await limiter.call("tavily", request)
+            metrics.record_tavily_credits(extract_credits(len(response['results'])) - estimated)
+            return response
+
+        results, failed = await self.extract_scheduler(extract_depth).run(urls, extract_batch) if urls else ([], {})
+
+        extracted_msg = ""
+        for itm in results:
+            url = itm['url']
+            raw_content = itm['raw_content']
+            if len(raw_content) > self.cfg.MAX_DOC_LENGTH:
+                raw_content = raw_content[:self.cfg.MAX_DOC_LENGTH] + " [...]"
+                if self.cfg.DEBUG:
+                    print(f"Content from {url} was truncated to the maximum allowed length ({self.cfg.MAX_DOC_LENGTH} characters). Current length: {len(raw_content)}\nPreview:\n{raw_content}")
+            raw_content_id = self.documents.put(raw_content)
+            self._store_raw_content(sources_dict, url, raw_content_id)
+            if self.cache:
+                self.cache.set("extract", Cache.make_key(url, extract_depth), raw_content_id, ttl=self.cfg.EXTRACT_CACHE_TTL)
+            extracted_msg += f"{url}\n"
 
         # Collect messages from all batches
-        if results:
-            msg += "Extracted raw content for:\n" + "".join(results)
+        if extracted_msg or cached_msg:
+            msg += "Extracted raw content for:\n" + cached_msg + extracted_msg
+        if failed:
+            msg += "Failed to extract:\n" + "".join(f"{url} ({error})\n" for url, error in failed.items())
 
         return sources_dict, msg
 
-    async def search(self, sub_queries: List[TavilyQuery], sources_dict: dict):
+    async def search_one(self, query: TavilyQuery, use_cache=True) -> list:
+        """Run one search, returning its results, or an empty list if it failed."""
+        try:
+            print(query)
+            cache_key = Cache.make_key(normalize_query(query.query), query.search_depth, query.time_range,
+                                       sorted(query.include_domains or []))
+            if self.cache and use_cache:
+                cached_results = self.cache.get("search", cache_key)
+                if cached_results is not None:
+                    metrics.increment_attribute("tavily_cache_hits")
+                    return cached_results
+            # Add date to the query as we need the most recent results
+            # query_with_date = f"{query.query} {datetime.now().strftime('%m-%Y')}"
+            operation = f"search:{query.search_depth}"
+            credits = 2 if query.search_depth == "advanced" else 1
+
+            async def request():
+                with latencies.track(operation), metrics.billed_tavily_request(credits):
+                    return await self.client.search(query=query.query, topic="general", search_depth=query.search_depth, time_range=query.time_range, include_domains=query.include_domains, max_results=10)
+
+            async def search_once():
+                async with metrics.provider_call("tavily"):
+                    return await limiter.call("tavily", request)
+
+            if self.cfg.HEDGE_ENABLED:
+                # A duplicate request for the same query hedges against the slow tail of search latency
+                tavily_response = await hedged(search_once, search_once, self.hedge_delay(operation))
+            else:
+                tavily_response = await search_once()
+            if self.cache:
+                self.cache.set("search", cache_key, tavily_response['results'], ttl=self.cfg.SEARCH_CACHE_TTL)
+            return tavily_response['results']
+        except Exception as e:
+            # Handle any exceptions, log them, and return an empty list
+            if self.cfg.DEBUG:
+                print(f"Error occurred during search for query '{query}': {str(e)}")
+            return []
+
+    @staticmethod
+    def unique_queries(sub_queries: List[TavilyQuery]) -> List[TavilyQuery]:
+        """Drop queries that would return the same results as an earlier one."""
+        unique = {}
+        for query in sub_queries:
+            key = (normalize_query(query.query), query.search_depth, query.time_range, tuple(sorted(query.include_domains or [])))
+            unique.setdefault(key, query)
+        return list(unique.values())
+
+    @staticmethod
+    def new_results(results: list, seen: set) -> dict:
+        """Return the results whose canonical URL isn't in `seen` yet, keyed by URL, and add them to `seen`."""
+        new = {}
+        for result in results:
+            url = result.get("url")
+            if not url:
+                continue
+            canonical = canonicalize_url(url)
+            if canonical not in seen:
+                # Skip the result if a variant of the URL is already present
+                seen.add(canonical)
+                new[url] = result
+        return new
+
+    async def search(self, sub_queries: List[TavilyQuery], sources_dict: dict, use_cache=True):
         """
         Perform searches for each sub-query using the Tavily Search concurrently.
 
         :param sub_queries: List of search queries.
-        :param sources_dict: Dictionary to store unique search results, keyed by URL.
+        :param sources_dict: Dictionary of unique search results keyed by URL, a new dict with the new results added is returned.
+        :param use_cache: Whether cached search results may be returned.
         """
-
-        # Define a coroutine function to perform a single search with error handling
-        async def perform_search(query):
-            try:
-                print(query)
-                # Add date to the query as we need the most recent results
-                # query_with_date = f"{query.query} {datetime.now().strftime('%m-%Y')}"
-                tavily_response = await self.client.search(query=query.query, topic="general", search_depth=query.search_depth, time_range=query.time_range, include_domains=query.include_domains, max_results=10)
-                return tavily_response['results']
-            except Exception as e:
-                # Handle any exceptions, log them, and return an empty list
-                if cfg.DEBUG:
-                    print(f"Error occurred during search for query '{query}': {str(e)}")
-                return []
+        sources_dict = dict(sources_dict)
 
         # Run all the search tasks in parallel
-        search_tasks = [perform_search(itm) for itm in sub_queries]
-        search_responses = await asyncio.gather(*search_tasks)
+        search_responses = await asyncio.gather(*[self.search_one(query, use_cache) for query in sub_queries])
 
         # Combine the results from all the responses and update the sources_dict
+        seen = {canonicalize_url(url) for url in sources_dict}
         for response in search_responses:
-            for result in response:
-                url = result.get("url")
-                if url and url not in sources_dict:
-                    # Add the result to sources_dict if the URL is not already present
-                    sources_dict[url] = result
+            sources_dict.update(self.new_results(response, seen))
 
-        return sources_dict
\ No newline at end of file
+        return sources_dict
+
+    async def search_stream(self, sub_queries: List[TavilyQuery], use_cache=True, deadline=None, quorum=None, grace=0.5):
+        """Run the searches concurrently and yield (index, results) as each one completes.
+
+        `index` is the query's position in `sub_queries`. Results are yielded as returned by the search, merge them
+        in query order with `new_results` so the kept variant of a URL doesn't depend on which search finished first.
+        Searches still running `deadline` seconds after the start are cancelled. With a `quorum`, so are the ones
+        still running once that fraction of the searches finished and the stragglers had another `grace` times as
+        long as the quorum took.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        cutoff = started + deadline if deadline else None
+        tasks = {asyncio.create_task(self.search_one(query, use_cache)): index for index, query in enumerate(sub_queries)}
+        pending = set(tasks)
+        finished = 0
+        quorum_reached = False
+        try:
+            while pending:
+                timeout = None if cutoff is None else max(cutoff - loop.time(), 0.0)
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in sorted(done, key=tasks.get):
+                    finished += 1
+                    yield tasks[task], task.result()
+                if quorum and pending and not quorum_reached and finished >= math.ceil(quorum * len(tasks)):
+                    quorum_reached = True
+                    now = loop.time()
+                    quorum_cutoff = now + grace * (now - started)
+                    cutoff = quorum_cutoff if cutoff is None else min(cutoff, quorum_cutoff)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                metrics.increment_attribute("abandoned_searches", len(pending))
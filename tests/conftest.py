@@ -0,0 +1,14 @@
+import pytest
+
+from company_researcher.config import Config
+
+
+@pytest.fixture
+def cfg(tmp_path):
+    """A Config whose caches and document store live in a temporary directory."""
+    cfg = Config()
+    cfg.CACHE_PATH = str(tmp_path / "cache.sqlite")
+    cfg.DOC_STORE_PATH = str(tmp_path / "documents.sqlite")
+    cfg.CACHE_ENABLED = False
+    cfg.HEDGE_ENABLED = False
+    return cfg
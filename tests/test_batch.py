@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+from company_researcher.batch import run_batch
+from company_researcher.utils.doc_store import DocumentStore
+
+
+class FakeGraph:
+    def __init__(self):
+        self.companies = []
+
+    async def ainvoke(self, inputs):
+        self.companies.append(inputs["company"])
+        return {"report": f"Report on {inputs['company']}"}
+
+
+def test_invalid_input_lines_are_skipped_without_stopping_the_batch(tmp_path):
+    input_path, output_path = tmp_path / "companies.jsonl", tmp_path / "reports.jsonl"
+    input_path.write_text("\n".join([
+        json.dumps({"company": "Acme", "company_url": "https://acme.com"}),
+        '{"company": "Broken",',
+        json.dumps({"company": "No URL"}),
+        json.dumps(["not", "an", "object"]),
+        json.dumps({"company": "Bad include", "company_url": "https://bad.com", "include": "CEO"}),
+        json.dumps({"company": "Globex", "company_url": "https://globex.com", "include": ["CEO"]}),
+    ]) + "\n")
+    graph = FakeGraph()
+    documents = DocumentStore(str(tmp_path / "documents.sqlite"), max_size_bytes=1024 * 1024)
+
+    stats = asyncio.run(run_batch(str(input_path), str(output_path), graph=graph, concurrency=1,
+                                  documents=documents))
+
+    assert graph.companies == ["Acme", "Globex"]
+    assert stats["completed"] == 2
+    assert stats["invalid"] == 4
+    assert [json.loads(line)["company"] for line in output_path.read_text().splitlines()] == ["Acme", "Globex"]
+
+
+class FailingWriteGraph(FakeGraph):
+    """Returns what a compiled graph returns when the write node failed: no output at all."""
+
+    async def ainvoke(self, inputs):
+        await super().ainvoke(inputs)
+        if inputs["company"] == "Broken":
+            return None
+        return {"report": f"Report on {inputs['company']}"}
+
+
+def test_failed_write_counts_as_failed_and_is_retried_by_the_next_batch(tmp_path):
+    input_path, output_path = tmp_path / "companies.jsonl", tmp_path / "reports.jsonl"
+    input_path.write_text("\n".join(json.dumps({"company": name, "company_url": f"https://{name.lower()}.com"})
+                                    for name in ("Acme", "Broken", "Globex")) + "\n")
+    documents = DocumentStore(str(tmp_path / "documents.sqlite"), max_size_bytes=1024 * 1024)
+
+    stats = asyncio.run(asyncio.wait_for(
+        run_batch(str(input_path), str(output_path), graph=FailingWriteGraph(), concurrency=1, documents=documents),
+        timeout=10))
+
+    assert stats["completed"] == 2
+    assert stats["failed"] == 1
+    assert [json.loads(line)["company"] for line in output_path.read_text().splitlines()] == ["Acme", "Globex"]
+
+    graph = FailingWriteGraph()
+    asyncio.run(run_batch(str(input_path), str(output_path), graph=graph, concurrency=1, documents=documents))
+    assert graph.companies == ["Broken"]
@@ -0,0 +1,56 @@
+import asyncio
+
+from company_researcher.nodes.rerank import RerankAgent
+from company_researcher.state import ResearchState
+from company_researcher.utils.bm25 import BM25
+
+DOCUMENTS = [
+    "Acme raised a series B round to expand its warehouse robots",
+    "Recipes for sourdough bread and croissants",
+    "Acme CEO Jane Doe on warehouse robots and the future of logistics",
+    "Weather forecast for the weekend",
+]
+
+
+def test_bm25_ranks_documents_by_query_terms():
+    ranked = BM25(DOCUMENTS).top_n("Acme warehouse robots CEO", 3)
+    assert [index for index, _ in ranked] == [2, 0, 1]
+    assert ranked[0][1] > ranked[1][1] > 0
+    assert ranked[2][1] == 0
+
+
+def test_rare_terms_weigh_more_than_common_ones():
+    bm25 = BM25(DOCUMENTS)
+    # 'acme' appears in two documents, 'ceo' only in the third
+    assert bm25.scores("ceo")[2] > bm25.scores("acme")[2]
+
+
+def test_empty_corpus_and_query():
+    assert BM25([]).top_n("acme", 5) == []
+    assert BM25(DOCUMENTS).scores("") == [0.0] * len(DOCUMENTS)
+
+
+class FailingCohereRerankAgent(RerankAgent):
+    async def rerank_documents(self, query, documents, top_n, timeout):
+        raise RuntimeError("Unexpected error during reranking: 503")
+
+
+def test_race_mode_falls_back_to_bm25_when_cohere_fails(cfg):
+    cfg.RERANK_MODE = "race"
+    cfg.DEFAULT_CLUSTER_SIZE = 2
+    research_data = {f"https://example.com/{i}": {"url": f"https://example.com/{i}", "content": content}
+                     for i, content in enumerate(DOCUMENTS)}
+    state = ResearchState(company="Acme", company_url="https://acme.com", include=["CEO"], research_data=research_data)
+    result = asyncio.run(FailingCohereRerankAgent(cfg, utils=None).run(state))
+    assert result["clusters"][0].urls == ["https://example.com/2", "https://example.com/0"]
+    assert "falling back to BM25" in result["messages"]
+
+
+def test_bm25_mode_never_calls_cohere(cfg):
+    cfg.RERANK_MODE = "bm25"
+    cfg.DEFAULT_CLUSTER_SIZE = 1
+    research_data = {f"https://example.com/{i}": {"url": f"https://example.com/{i}", "content": content}
+                     for i, content in enumerate(DOCUMENTS)}
+    state = ResearchState(company="Acme", company_url="https://acme.com", research_data=research_data)
+    result = asyncio.run(FailingCohereRerankAgent(cfg, utils=None).run(state))
+    assert result["clusters"][0].urls == ["https://example.com/0"]
@@ -0,0 +1,70 @@
+import sqlite3
+import time
+
+from company_researcher.utils.cache import Cache
+
+
+def make_cache(tmp_path, max_size_bytes=1000):
+    return Cache(str(tmp_path / "cache.sqlite"), max_size_bytes=max_size_bytes)
+
+
+def test_entries_expire_after_their_ttl(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("search", "short", ["a"], ttl=0.01)
+    cache.set("search", "forever", ["b"])
+    assert cache.get("search", "short") == ["a"]
+    time.sleep(0.02)
+    assert cache.get("search", "short") is None
+    assert cache.get("search", "forever") == ["b"]
+
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path):
+    cache = make_cache(tmp_path, max_size_bytes=100)
+    cache.set("documents", "old", "a" * 40)
+    cache.set("documents", "recent", "b" * 40)
+    time.sleep(0.001)
+    cache.get("documents", "old")
+    cache.set("documents", "new", "c" * 40)
+    assert cache.get("documents", "recent") is None
+    assert cache.get("documents", "old") == "a" * 40
+    assert cache.get("documents", "new") == "c" * 40
+
+
+def test_size_total_follows_inserts_replacements_and_deletes(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("documents", "a", "x" * 10)
+    cache.set("documents", "b", "y" * 20)
+    cache.set("documents", "a", "x" * 30)
+    cache.set("documents", "expired", "z", ttl=0.001)
+    time.sleep(0.01)
+    cache.get("documents", "expired")
+    actual = sum(len(f'"{value}"') for value in ("x" * 30, "y" * 20))
+    assert cache.stats()["size_bytes"] == actual
+    cache.clear()
+    assert cache.stats()["size_bytes"] == 0
+
+
+def test_size_total_is_initialized_for_an_existing_cache_file(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE cache (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                 "size INTEGER NOT NULL, expires_at REAL, last_access REAL NOT NULL, PRIMARY KEY (namespace, key))")
+    conn.execute("INSERT INTO cache VALUES ('search', 'k', '\"v\"', 3, NULL, 0)")
+    conn.commit()
+    conn.close()
+    assert Cache(path).stats()["size_bytes"] == 3
+
+
+def test_pinned_entries_survive_lru_eviction_and_expiry(tmp_path):
+    cache = Cache(str(tmp_path / "cache.sqlite"), max_size_bytes=100)
+    cache.set("documents", "pinned", "x" * 60, ttl=0.01)
+    cache.pin("run:1", "documents", ["pinned"])
+    time.sleep(0.02)
+    cache.set("documents", "other", "y" * 60)
+    cache.set("documents", "newest", "z" * 60)
+    assert cache.get("documents", "pinned") == "x" * 60
+    assert cache.get("documents", "other") is None
+
+    cache.unpin("run:1")
+    cache.set("documents", "newest", "z" * 60)
+    assert cache.get("documents", "pinned") is None
@@ -0,0 +1,52 @@
+import asyncio
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from company_researcher import checkpoint
+from company_researcher.state import InputState, OutputState, ResearchState
+
+
+class FlakyNodes:
+    """A research step and a write step that fails without raising on its first run, like WriteAgent."""
+
+    def __init__(self):
+        self.research_runs = 0
+        self.write_runs = 0
+
+    async def research(self, state):
+        self.research_runs += 1
+        return {"messages": "researched"}
+
+    async def write(self, state):
+        self.write_runs += 1
+        if self.write_runs == 1:
+            return {"messages": "🚫 Error generating report"}
+        return {"report": f"{state.company} report", "messages": "written"}
+
+
+def build(nodes):
+    workflow = StateGraph(ResearchState, input_schema=InputState, output_schema=OutputState)
+    workflow.add_node("research", nodes.research)
+    workflow.add_node("write", nodes.write)
+    workflow.add_edge(START, "research")
+    workflow.add_edge("research", "write")
+    workflow.add_edge("write", END)
+    return workflow.compile(checkpointer=InMemorySaver())
+
+
+def test_resume_after_a_failed_write_only_retries_writing():
+    nodes = FlakyNodes()
+    graph = build(nodes)
+    inputs = {"company": "Acme", "company_url": "https://acme.com"}
+
+    async def main():
+        failed = await checkpoint.run_or_resume(graph, inputs)
+        resumed = await checkpoint.run_or_resume(graph, inputs)
+        finished = await checkpoint.run_or_resume(graph, inputs)
+        return failed, resumed, finished
+
+    failed, resumed, finished = asyncio.run(main())
+    assert not failed["report"]
+    assert resumed["report"] == finished["report"] == "Acme report"
+    assert nodes.research_runs == 1 and nodes.write_runs == 2
@@ -0,0 +1,24 @@
+import pytest
+
+from company_researcher.utils.clients import ClientRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = ClientRegistry()
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    return registry
+
+
+def test_chat_models_are_shared_per_name_and_settings(registry):
+    first = registry.chat_model("base_llm", model="gpt-4o-mini", temperature=0.2)
+    assert registry.chat_model("base_llm", temperature=0.2, model="gpt-4o-mini") is first
+    other = registry.chat_model("base_llm", model="gpt-4o-mini", temperature=0.0)
+    assert other is not first
+    assert other.temperature == 0.0
+
+
+def test_override_replaces_the_chat_model_regardless_of_settings(registry):
+    stand_in = object()
+    registry.override("base_llm", stand_in)
+    assert registry.chat_model("base_llm", model="gpt-4o-mini") is stand_in
@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+from company_researcher.nodes.cluster import Cluster, ClusterAgent, CompactCluster
+from company_researcher.state import ResearchSnapshot, ResearchState
+from company_researcher.utils.all import Utils
+
+URLS = ["https://www.acme.com/about", "https://news.com/acme", "https://bakery.com/acme"]
+
+
+def test_document_lines_encode_id_domain_and_truncated_snippet(cfg):
+    cfg.CLUSTER_SNIPPET_LENGTH = 20
+    documents = {URLS[0]: {"content": "Acme builds\n warehouse   robots for logistics"},
+                 URLS[1]: {"content": "Short"},
+                 URLS[2]: {"content": None}}
+    lines = ClusterAgent(cfg, utils=None).document_lines(URLS, documents)
+    assert lines == ["0 | acme.com | Acme builds...", "1 | news.com | Short", "2 | bakery.com | "]
+
+
+def test_expand_clusters_maps_ids_to_urls_and_ignores_unknown_and_repeated_ids():
+    compact = [CompactCluster(company_name="Acme", ids=[0, 1, 7, -1, 0]),
+               CompactCluster(company_name="Acme Bakery", ids=[1, 2])]
+    clusters = ClusterAgent.expand_clusters(compact, URLS)
+    assert [(c.company_name, c.urls) for c in clusters] == [("Acme", URLS[:2]), ("Acme Bakery", [URLS[2]])]
+
+
+def test_expand_clusters_ignores_ids_outside_the_shard():
+    compact = [CompactCluster(company_name="Acme", ids=[0, 1, 2])]
+    clusters = ClusterAgent.expand_clusters(compact, URLS, allowed_ids={1, 2})
+    assert clusters[0].urls == URLS[1:]
+
+
+class RecordingPrefetcher:
+    def __init__(self):
+        self.prefetched = []
+
+    def prefetch(self, urls, extract_depth="basic"):
+        self.prefetched += urls
+        return list(urls)
+
+
+class FakeUtils:
+    def __init__(self):
+        self.prefetcher = RecordingPrefetcher()
+
+
+def test_speculate_skips_refresh_runs(cfg):
+    cfg.SPECULATIVE_ENRICH = True
+    research_data = {URLS[0]: {"url": URLS[0], "content": "Acme"}}
+    state = ResearchState(company="Acme", company_url="https://acme.com", research_data=research_data)
+    utils = FakeUtils()
+    agent = ClusterAgent(cfg, utils)
+    assert agent.speculate(state, {})[0] == [URLS[0]]
+
+    utils.prefetcher.prefetched = []
+    refresh = state.model_copy(update={"previous": ResearchSnapshot(company="Acme", company_url="https://acme.com")})
+    assert agent.speculate(refresh, {}) == ([], "")
+    assert utils.prefetcher.prefetched == []
+
+
+def test_shard_lines_keeps_lines_whole_and_in_order():
+    lines = ["0 | a.com | " + "x" * 10, "1 | b.com | " + "y" * 10, "2 | c.com | " + "z" * 40, "3 | d.com | w"]
+    shards = ClusterAgent.shard_lines(lines, 50)
+    assert [line for shard in shards for line in shard] == lines
+    assert all(sum(len(line) + 1 for line in shard) <= 50 for shard in shards if len(shard) > 1)
+    assert shards[1] == [lines[2]]  # longer than a shard on its own
+    assert ClusterAgent.shard_lines(lines, 10000) == [lines]
+
+
+def test_reduce_clusters_merges_by_name_and_target_domain():
+    shard_clusters = [
+        [Cluster(company_name="Acme", urls=[URLS[0]]), Cluster(company_name="Acme Bakery", urls=[URLS[2]])],
+        [Cluster(company_name="Acme Robotics", urls=["https://acme.com/team", URLS[1]]),
+         Cluster(company_name="acme bakery", urls=[URLS[2], "https://bakery.com/menu"]),
+         Cluster(company_name="Ambiguous", urls=["https://acme.com/jobs"])],
+    ]
+    clusters = ClusterAgent.reduce_clusters("Acme", "https://acme.com", shard_clusters)
+    assert [(c.company_name, c.urls) for c in clusters] == [
+        ("Acme", [URLS[0], "https://acme.com/team", URLS[1]]),
+        ("Acme Bakery", [URLS[2], "https://bakery.com/menu"]),
+        ("Ambiguous", ["https://acme.com/jobs"]),
+    ]
+
+
+def test_documents_of_a_failed_shard_are_clustered_locally(cfg):
+    cfg.CLUSTER_SNIPPET_LENGTH = 20
+    research_data = {url: {"url": url, "content": "About Acme"} for url in URLS}
+    state = ResearchState(company="Acme", company_url="https://acme.com", research_data=research_data)
+    agent = ClusterAgent(cfg, Utils(cfg))
+    calls = []
+
+    async def cluster_shard(state, grounding, urls, lines):
+        calls.append(lines)
+        if any(line.startswith("0 |") for line in lines):
+            raise RuntimeError("invalid response")
+        return [Cluster(company_name="Acme", urls=[urls[index] for index in sorted(agent.line_ids(lines))])]
+
+    agent.cluster_shard = cluster_shard
+    room = len(agent.cluster_prompt(state, json.dumps({}), ""))
+    cfg.MAX_PROMPT_LENGTH = room + 30  # one document line per shard
+    clusters, msg = asyncio.run(agent.llm_cluster(state))
+
+    assert len(calls) == 3 + cfg.CLUSTER_SHARD_RETRIES
+    assert sorted(url for cluster in clusters for url in cluster.urls) == sorted(URLS)
+    assert clusters[0].company_name == "Acme" and URLS[0] in clusters[0].urls
+    assert "failed shard" in msg
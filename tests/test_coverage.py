@@ -0,0 +1,28 @@
+from company_researcher.state import InputState
+from company_researcher.utils.coverage import CoverageChecker, search_terms
+from company_researcher.utils.similarity import tokenize
+
+DEFAULT_INCLUDE = InputState.model_fields["include"].examples
+
+
+def test_default_include_items_are_covered_by_matching_documents():
+    documents = {
+        "https://tavily.com/": {"raw_content": "Tavily is headquartered in New York, NY. Founded in 2023 by "
+                                               "Rotem Weiss, CEO. Tavily has 25 employees."},
+        "https://www.linkedin.com/company/tavily/": {"title": "Tavily | LinkedIn", "content": "Search API for agents."},
+    }
+    covered, missing = CoverageChecker(DEFAULT_INCLUDE, "https://tavily.com/").check(documents)
+    assert missing == []
+    assert covered == DEFAULT_INCLUDE
+
+
+def test_url_items_need_the_company_url_and_a_linkedin_company_page():
+    checker = CoverageChecker(["Company's official website URL", "Company's LinkedIn profile URL"])
+    _, missing = checker.check({"https://www.linkedin.com/in/someone/": {"content": "A person's profile"}})
+    assert missing == ["Company's official website URL", "Company's LinkedIn profile URL"]
+
+
+def test_possessives_are_normalized():
+    assert tokenize("Company's founders") == ["company", "founders"]
+    assert search_terms("Company's LinkedIn profile URL") == "LinkedIn profile URL"
+    assert search_terms("Name of the CEO") == "CEO"
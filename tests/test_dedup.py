@@ -0,0 +1,49 @@
+from company_researcher.config import Config
+from company_researcher.utils.dedup import canonicalize_url, deduplicate_documents, is_primary_source
+
+ARTICLE = ("Acme Corporation announced on Tuesday that it has raised forty million dollars in a series B round led "
+           "by Example Ventures to expand its robotics platform across Europe and hire two hundred engineers")
+
+
+def test_tracking_params_www_and_trailing_slash_are_normalized():
+    variants = [
+        "https://www.acme.com/about/",
+        "http://acme.com/about?utm_source=newsletter&utm_medium=email",
+        "https://WWW.Acme.com/about#team",
+        "https://acme.com//about/index.html?gclid=123",
+    ]
+    assert {canonicalize_url(url) for url in variants} == {"https://acme.com/about"}
+
+
+def test_content_query_params_are_kept_in_a_stable_order():
+    assert canonicalize_url("https://acme.com/news?page=2&id=7&ref=x") == "https://acme.com/news?id=7&page=2"
+    assert canonicalize_url("https://acme.com/news?page=2") != canonicalize_url("https://acme.com/news?page=3")
+
+
+def test_near_duplicates_above_the_threshold_are_dropped():
+    documents = {
+        "https://news.com/acme-raises": {"content": ARTICLE, "score": 0.9},
+        "https://mirror.com/acme-raises": {"content": ARTICLE + " according to a statement", "score": 0.5},
+        "https://acme.com/careers": {"content": "Join Acme and build robots that help warehouses move parcels "
+                                                "faster, we are hiring engineers in Berlin Paris and Madrid",
+                                     "score": 0.7},
+    }
+    kept, dropped = deduplicate_documents(documents, threshold=Config().NEAR_DUPLICATE_THRESHOLD)
+    assert dropped == ["https://mirror.com/acme-raises"]
+    assert list(kept) == ["https://news.com/acme-raises", "https://acme.com/careers"]
+
+
+def test_url_variants_keep_the_higher_scored_document():
+    documents = {
+        "https://www.acme.com/about?utm_source=x": {"content": "short", "score": 0.2},
+        "https://acme.com/about": {"content": "short", "score": 0.8},
+    }
+    kept, dropped = deduplicate_documents(documents)
+    assert list(kept) == ["https://acme.com/about"]
+    assert dropped == ["https://www.acme.com/about?utm_source=x"]
+
+
+def test_primary_sources_are_the_company_domain_and_its_linkedin_page():
+    assert is_primary_source("https://blog.acme.com/post", "https://www.acme.com")
+    assert is_primary_source("https://www.linkedin.com/company/acme", "https://acme.com")
+    assert not is_primary_source("https://acme.com.evil.io/", "https://acme.com")
@@ -0,0 +1,34 @@
+import time
+
+import pytest
+
+from company_researcher.batch import pin_snapshot
+from company_researcher.utils.doc_store import DocumentStore, MissingContentError, owned_by
+
+
+def test_content_stored_by_an_owner_stays_until_released(tmp_path):
+    documents = DocumentStore(str(tmp_path / "documents.sqlite"), max_size_bytes=100)
+    with owned_by("run:1"):
+        content_id = documents.put("a" * 60)
+    documents.put("b" * 60)
+    documents.put("c" * 60)
+    assert documents.resolve({"raw_content_id": content_id})["raw_content"] == "a" * 60
+
+    documents.release("run:1")
+    documents.put("d" * 60)
+    with pytest.raises(MissingContentError):
+        documents.resolve({"raw_content_id": content_id})
+
+
+def test_snapshot_content_is_kept_until_the_snapshot_is_replaced(tmp_path):
+    documents = DocumentStore(str(tmp_path / "documents.sqlite"), max_size_bytes=1000, ttl=0.01)
+    record = {"company": "Acme", "company_url": "https://acme.com"}
+    old_id, new_id = documents.put("old"), documents.put("new")
+    pin_snapshot(documents, record, {"grounding_data": {}, "research_data": {"https://a.com": {"raw_content_id": old_id}}})
+    time.sleep(0.02)
+    documents.put("trigger eviction")
+    assert documents.resolve({"raw_content_id": old_id})["raw_content"] == "old"
+
+    pin_snapshot(documents, record, {"grounding_data": {"https://b.com": {"raw_content_id": new_id}}, "research_data": {}})
+    with pytest.raises(MissingContentError):
+        documents.resolve({"raw_content_id": old_id})
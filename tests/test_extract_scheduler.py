@@ -0,0 +1,81 @@
+import asyncio
+import time
+from collections import Counter
+
+from company_researcher.utils.extract_scheduler import ExtractScheduler
+
+
+def response(batch):
+    return {"results": [{"url": url, "raw_content": url} for url in batch], "failed_results": []}
+
+
+def scheduler(**kwargs):
+    return ExtractScheduler(**{"backoff_base": 0.0, **kwargs})
+
+
+def test_bisection_isolates_the_failing_url():
+    async def extract_batch(batch):
+        if "https://bad.com" in batch:
+            raise RuntimeError("bad page")
+        return response(batch)
+
+    urls = [f"https://{i}.com" for i in range(7)] + ["https://bad.com"]
+    results, failed = asyncio.run(scheduler(max_retries=1).run(urls, extract_batch))
+    assert sorted(result["url"] for result in results) == sorted(urls[:-1])
+    assert failed == {"https://bad.com": "bad page"}
+
+
+def test_transient_failures_are_retried():
+    calls = []
+
+    async def extract_batch(batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise RuntimeError("rate limited")
+        return response(batch)
+
+    results, failed = asyncio.run(scheduler(max_retries=2).run(["https://a.com", "https://b.com"], extract_batch))
+    assert len(calls) == 2
+    assert [result["url"] for result in results] == ["https://a.com", "https://b.com"]
+    assert failed == {}
+
+
+def test_attempts_per_url_are_capped():
+    attempts = Counter()
+
+    async def extract_batch(batch):
+        attempts.update(batch)
+        raise RuntimeError("down")
+
+    urls = [f"https://{i}.com" for i in range(8)]
+    results, failed = asyncio.run(scheduler(max_retries=2, max_attempts=3).run(urls, extract_batch))
+    assert results == []
+    assert failed == dict.fromkeys(urls, "down")
+    assert max(attempts.values()) == 3
+
+
+def test_a_url_times_out_after_its_deadline():
+    async def extract_batch(batch):
+        await asyncio.sleep(60)
+
+    start = time.monotonic()
+    results, failed = asyncio.run(scheduler(url_deadline=0.05).run(["https://slow.com"], extract_batch))
+    assert time.monotonic() - start < 1
+    assert results == [] and failed == {"https://slow.com": "timeout"}
+
+
+def test_the_deadline_starts_once_a_slot_is_free():
+    calls = Counter()
+
+    async def extract_batch(batch):
+        calls.update(batch)
+        if batch == ["https://b.com"] and calls["https://b.com"] == 1:
+            raise RuntimeError("rate limited")
+        await asyncio.sleep(0.08 if batch == ["https://a.com"] else 0.05)
+        return response(batch)
+
+    # b waits for a's slot and is retried once, which together takes longer than a single URL's deadline
+    urls = ["https://a.com", "https://b.com"]
+    results, failed = asyncio.run(scheduler(concurrency=1, max_batch_size=1, url_deadline=0.1).run(urls, extract_batch))
+    assert sorted(result["url"] for result in results) == urls
+    assert failed == {}
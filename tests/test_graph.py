@@ -0,0 +1,48 @@
+import asyncio
+
+from langgraph.graph import END, START
+
+from company_researcher.graph import build_graph
+from company_researcher.nodes.research import ResearchAgent
+from company_researcher.state import ResearchState
+from company_researcher.utils.all import Utils
+
+
+class RecordingSearchClient:
+    """Records the arguments of every search and returns one result per query."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def search(self, query, **kwargs):
+        self.calls.append((query, kwargs))
+        return {"results": [{"url": f"https://example.com/{len(self.calls)}", "content": query}]}
+
+
+def test_seed_searches_run_alongside_grounding(cfg):
+    edges = {(edge.source, edge.target) for edge in build_graph(cfg, Utils(cfg)).get_graph().edges}
+    assert {(START, "ground"), (START, "seed"), ("ground", "research"), ("seed", "research")} <= edges
+    assert ("ground", "seed") not in edges and ("seed", "ground") not in edges
+    assert ("write", END) in edges
+
+
+def test_seed_queries_do_not_depend_on_grounding_data(cfg):
+    state = ResearchState(company="Acme", company_url="https://acme.com")
+    queries = ResearchAgent(cfg, Utils(cfg)).seed_queries(state)
+    assert [query.query for query in queries] == ["Acme company", "Acme"]
+    assert queries[0].include_domains == ["linkedin.com/company"]
+    assert state.grounding_data == {}
+
+
+def test_seed_returns_the_search_results(cfg):
+    cfg.SEARCH_STREAMING = False
+    utils = Utils(cfg)
+    client = RecordingSearchClient()
+    utils.tavily._client = client
+    agent = ResearchAgent(cfg, utils)
+    result = asyncio.run(agent.seed(ResearchState(company="Acme", company_url="https://acme.com")))
+
+    assert sorted(query for query, _ in client.calls) == ["Acme", "Acme company"]
+    assert sorted(result["research_data"]) == ["https://example.com/1", "https://example.com/2"]
+    assert [query.query for query in result["search_queries"]] == ["Acme company", "Acme"]
+    assert result["speculative_urls"] == []
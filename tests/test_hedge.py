@@ -0,0 +1,101 @@
+import asyncio
+import random
+
+from company_researcher.utils import metrics
+from company_researcher.utils.hedge import LatencyTracker, hedged
+
+
+def test_cancelled_hedge_is_still_billed():
+    async def main():
+        span = metrics.Span("search")
+        metrics._current_span.set(span)
+
+        async def slow():
+            with metrics.billed_tavily_request(1):
+                await asyncio.sleep(0.05)
+                return "slow"
+
+        async def fast():
+            with metrics.billed_tavily_request(1):
+                await asyncio.sleep(0.001)
+                return "fast"
+
+        result = await hedged(slow, fast, delay=0.005)
+        await asyncio.sleep(0)
+        return result, span.tavily_credits
+
+    assert asyncio.run(main()) == ("fast", 2)
+
+
+def test_failed_request_is_not_billed():
+    async def main():
+        span = metrics.Span("search")
+        metrics._current_span.set(span)
+
+        async def failing():
+            with metrics.billed_tavily_request(2):
+                raise ConnectionError("reset")
+
+        try:
+            await failing()
+        except ConnectionError:
+            pass
+        return span.tavily_credits
+
+    assert asyncio.run(main()) == 0
+
+
+def test_cancelled_primary_is_recorded_as_lasting_at_least_the_hedge_delay():
+    tracker = LatencyTracker()
+
+    async def request(latency):
+        with tracker.track("search:basic"):
+            await asyncio.sleep(latency)
+            return latency
+
+    async def main():
+        # The hedge wins, the primary is cancelled
+        await hedged(lambda: request(1.0), lambda: request(0.001), delay=0.02)
+        # The primary wins, the hedge is cancelled
+        await hedged(lambda: request(0.03), lambda: request(1.0), delay=0.01)
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    samples = sorted(tracker.samples["search:basic"])
+    assert len(samples) == 3
+    assert samples[0] < 0.02  # the winning hedge
+    assert 0.02 <= samples[1] < 1.0  # the cancelled primary, censored when the hedge won
+    assert samples[2] >= 0.03  # the primary that beat its hedge
+
+
+def hedge_frequency(tracker, calls=300, q=80):
+    """Runs hedged calls with the delay at the q-th percentile of `tracker`, returning the share of the last 200
+    calls that were hedged."""
+    rng = random.Random(7)
+    hedges = []
+
+    async def request(latency):
+        with tracker.track("search:basic"):
+            await asyncio.sleep(latency)
+            return latency
+
+    async def main():
+        for _ in range(calls):
+            primary_latency, hedge_latency = rng.expovariate(1 / 0.004), rng.expovariate(1 / 0.004)
+            hedged_call = []
+
+            def hedge():
+                hedged_call.append(True)
+                return request(hedge_latency)
+
+            delay = tracker.percentile("search:basic", q, min_samples=20)
+            await hedged(lambda: request(primary_latency), hedge, delay=0.01 if delay is None else delay)
+            hedges.append(bool(hedged_call))
+
+    asyncio.run(main())
+    return sum(hedges[-200:]) / 200
+
+
+def test_hedge_frequency_stays_near_the_percentile():
+    # Dropping the cancelled primaries would pull the delay down and hedge ever more calls
+    assert 0.1 <= hedge_frequency(LatencyTracker(window=100)) <= 0.3
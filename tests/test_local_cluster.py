@@ -0,0 +1,62 @@
+import asyncio
+
+from company_researcher.nodes.cluster import ClusterAgent
+from company_researcher.state import ResearchState
+from company_researcher.utils.local_cluster import LocalClusterer, normalize_company_name
+
+GROUNDING = ["Acme builds warehouse robots. Acme robots move parcels and pallets for logistics companies, "
+             "and the Acme fleet software plans warehouse routes."]
+
+
+def doc(title, content):
+    return {"title": title, "content": content}
+
+
+DOCUMENTS = {
+    "https://www.acme.com/about": doc("About", "Our story"),
+    "https://www.linkedin.com/company/acme/": doc("Acme | LinkedIn", "Company page"),
+    "https://news.com/profile": doc("Profile", "The company site acme.com lists its products"),
+    "https://robots.com/acme-review": doc("Acme review", "Acme warehouse robots move parcels and pallets, the "
+                                                         "Acme fleet software plans warehouse routes"),
+    "https://bakery.com/acme-bakery": doc("Acme Bakery", "Fresh bread, croissants and cakes baked every morning"),
+    "https://cooking.com/recipes": doc("Recipes", "Sourdough bread recipes with flour water and salt"),
+}
+
+
+def test_legal_suffixes_and_punctuation_are_stripped_from_company_names():
+    assert normalize_company_name("Tavily, Inc.") == "tavily"
+    assert normalize_company_name("Acme Robotics GmbH") == "acme robotics"
+    assert normalize_company_name("Company") == "company"
+
+
+def test_obvious_documents_are_labelled_and_the_rest_left_undecided():
+    labels = LocalClusterer().classify("Acme Inc.", "https://acme.com", GROUNDING, DOCUMENTS)
+    assert labels == {
+        "https://www.acme.com/about": "target",
+        "https://www.linkedin.com/company/acme/": "target",
+        "https://news.com/profile": "target",
+        "https://robots.com/acme-review": "target",
+        # Mentions the name but is about something else, the LLM has to decide
+        "https://bakery.com/acme-bakery": "undecided",
+        "https://cooking.com/recipes": "other",
+    }
+
+
+def test_without_grounding_data_only_domain_matches_are_decided():
+    labels = LocalClusterer().classify("Acme", "https://acme.com", [], DOCUMENTS)
+    assert labels["https://www.acme.com/about"] == "target"
+    assert labels["https://robots.com/acme-review"] == "undecided"
+    assert labels["https://cooking.com/recipes"] == "undecided"
+
+
+def test_fully_decided_documents_are_clustered_without_the_llm(cfg):
+    class NoLLMClusterAgent(ClusterAgent):
+        async def llm_cluster(self, state):
+            raise AssertionError("the LLM should not be called")
+
+    state = ResearchState(company="Acme", company_url="https://acme.com", research_data=DOCUMENTS)
+    labels = {url: "other" if "cooking" in url or "bakery" in url else "target" for url in DOCUMENTS}
+    clusters, _ = asyncio.run(NoLLMClusterAgent(cfg, utils=None).cluster(state, labels))
+    assert [cluster.company_name for cluster in clusters] == ["Acme", "Ambiguous"]
+    assert clusters[0].urls == [url for url, label in labels.items() if label == "target"]
+    assert clusters[1].urls == ["https://bakery.com/acme-bakery", "https://cooking.com/recipes"]
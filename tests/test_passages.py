@@ -0,0 +1,61 @@
+from company_researcher.utils.passages import PassageIndex, estimate_tokens, is_boilerplate, split_passages, truncate_documents
+
+
+def test_truncate_documents_keeps_the_head_of_long_pages():
+    documents = {"https://a.com": {"url": "https://a.com", "raw_content": "a" * 100},
+                 "https://b.com": {"url": "https://b.com", "raw_content": "short"},
+                 "https://c.com": {"url": "https://c.com", "content": "snippet only"}}
+    truncated = truncate_documents(documents, 10)
+    assert truncated["https://a.com"]["raw_content"] == "a" * 10 + " [...]"
+    assert truncated["https://b.com"]["raw_content"] == "short"
+    assert truncated["https://c.com"] == documents["https://c.com"]
+    assert documents["https://a.com"]["raw_content"] == "a" * 100
+
+
+def test_split_passages_packs_paragraphs_up_to_the_size():
+    paragraphs = [f"Paragraph {i} " + "word " * 30 for i in range(6)]
+    passages = split_passages("\n\n".join(paragraphs), size=400)
+    assert all(len(passage) <= 400 for passage in passages)
+    assert len(passages) < len(paragraphs)
+    assert "".join(passages).replace("\n", "") == "".join(p.strip() for p in paragraphs)
+
+
+def test_split_passages_cuts_long_paragraphs_along_sentences():
+    text = " ".join(f"Sentence number {i} is about the company." for i in range(40))
+    passages = split_passages(text, size=200)
+    assert len(passages) > 1
+    assert all(len(passage) <= 200 for passage in passages)
+    assert all(passage.endswith(".") for passage in passages)
+
+
+def test_is_boilerplate():
+    assert is_boilerplate("Home\nAbout\nCareers\nContact\nBlog\nPress")
+    assert is_boilerplate("We use cookies to improve your experience. Read our privacy policy to learn more.")
+    assert is_boilerplate(" ".join(f"[Link {i}](https://acme.com/{i})" for i in range(10)))
+    assert not is_boilerplate("Acme was founded in 2015 by Jane Doe and builds industrial robots for warehouses "
+                              "in Europe and North America.")
+
+
+def test_passage_index_selects_relevant_passages_under_the_budget():
+    filler = "The weather in the city was mild and pleasant throughout the whole spring season this year. "
+    documents = {
+        "https://a.com": {"url": "https://a.com",
+                          "raw_content": "\n\n".join([filler * 3, "Acme raised a Series B funding round of 40 million "
+                                                      "dollars led by Example Ventures.", filler * 3])},
+        "https://b.com": {"url": "https://b.com",
+                          "raw_content": "\n\n".join([filler * 3, "The founders of Acme are Jane Doe and John Roe, "
+                                                      "who previously worked at Initech."])},
+    }
+    index = PassageIndex(documents, passage_size=300)
+
+    selected = index.select(["funding round", "founders"], token_budget=100)
+    assert [passage for passages in selected.values() for passage in passages] == [
+        documents["https://a.com"]["raw_content"].split("\n\n")[1],
+        documents["https://b.com"]["raw_content"].split("\n\n")[1],
+    ]
+
+    compacted = index.compact(["funding round", "founders"], token_budget=30)
+    assert sum(estimate_tokens(doc.get("raw_content", "")) for doc in compacted.values()) <= 30
+    assert "Series B" in compacted["https://a.com"]["raw_content"]
+    assert "raw_content" not in compacted["https://b.com"]
+    assert documents["https://b.com"]["raw_content"].startswith(filler)
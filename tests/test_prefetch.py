@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from company_researcher.utils.prefetch import Prefetcher
+
+
+class SlowTavily:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+
+    async def extract(self, urls, sources_dict, extract_depth="basic"):
+        await asyncio.sleep(self.delay)
+        return {url: {"url": url, "raw_content_id": f"id-{url}"} for url in urls}, []
+
+
+def test_discarding_other_urls_does_not_cancel_a_claimed_extract():
+    async def main():
+        prefetcher = Prefetcher(SlowTavily())
+        prefetcher.prefetch(["https://a.com", "https://b.com"])
+        take = asyncio.create_task(prefetcher.take(["https://a.com"]))
+        await asyncio.sleep(0)
+        # Another run drops the URL it no longer needs while this one waits on the shared extract
+        prefetcher.discard(["https://b.com"])
+        return await take, prefetcher
+
+    results, prefetcher = asyncio.run(main())
+    assert list(results) == ["https://a.com"]
+    assert prefetcher.used == 1 and prefetcher.wasted == 1
+
+
+def test_cancelling_take_propagates_and_cancels_the_orphaned_extract():
+    async def main():
+        prefetcher = Prefetcher(SlowTavily(delay=60))
+        prefetcher.prefetch(["https://a.com"])
+        extract = next(iter(prefetcher._pending.values()))[0]
+        take = asyncio.create_task(prefetcher.take(["https://a.com"]))
+        await asyncio.sleep(0)
+        take.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await take
+        await asyncio.sleep(0)
+        return extract, prefetcher
+
+    extract, prefetcher = asyncio.run(main())
+    assert extract.cancelled()
+    assert prefetcher._claims == {}
+
+
+def test_cancelling_take_keeps_an_extract_other_urls_still_wait_on():
+    async def main():
+        prefetcher = Prefetcher(SlowTavily(delay=0.05))
+        prefetcher.prefetch(["https://a.com", "https://b.com"])
+        take = asyncio.create_task(prefetcher.take(["https://a.com"]))
+        await asyncio.sleep(0)
+        take.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await take
+        return await prefetcher.take(["https://b.com"])
+
+    assert list(asyncio.run(main())) == ["https://b.com"]
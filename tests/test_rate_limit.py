@@ -0,0 +1,141 @@
+import asyncio
+import time
+
+from company_researcher.utils import rate_limit
+from company_researcher.utils.prefetch import Prefetcher
+from company_researcher.utils.rate_limit import BACKGROUND, CRITICAL, NORMAL, Priority, ProviderLimiter
+
+
+async def drain(limiter, calls):
+    """Queues the calls as (name, level) at an exhausted limiter, refills it and returns the order they are served in."""
+    served = []
+
+    async def call(name, level):
+        await limiter.acquire(level=level)
+        served.append(name)
+
+    tasks = [asyncio.create_task(call(name, level)) for name, level in calls]
+    await asyncio.sleep(0.01)
+    limiter.requests.tokens = len(calls)
+    limiter._notify()
+    await asyncio.gather(*tasks)
+    return served
+
+
+def exhausted_limiter():
+    limiter = ProviderLimiter("test", rpm=60)
+    limiter.requests.tokens = 0
+    limiter.requests.rate = 0.0001  # effectively never refills on its own
+    return limiter
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    async def main():
+        return await drain(exhausted_limiter(), [("background", BACKGROUND), ("normal-1", NORMAL),
+                                                 ("critical", CRITICAL), ("normal-2", NORMAL)])
+
+    assert asyncio.run(main()) == ["critical", "normal-1", "normal-2", "background"]
+
+
+def test_cancelled_waiter_does_not_block_the_queue():
+    async def main():
+        limiter = exhausted_limiter()
+        head = asyncio.create_task(limiter.acquire(level=CRITICAL))
+        behind = asyncio.create_task(limiter.acquire(level=NORMAL))
+        await asyncio.sleep(0.01)
+        head.cancel()
+        await asyncio.sleep(0.01)
+        assert len(limiter._waiters) == 1
+        limiter.requests.tokens = 1
+        limiter._notify()
+        await asyncio.wait_for(behind, timeout=1)
+
+    asyncio.run(main())
+
+
+def test_pause_holds_calls_back_for_the_retry_after_period():
+    async def main():
+        limiter = ProviderLimiter("test", rpm=600)
+        limiter.pause(0.1)
+        start = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) >= 0.09
+
+
+def test_promoted_waiter_moves_ahead_of_regular_calls():
+    async def main():
+        limiter = exhausted_limiter()
+        background = Priority(BACKGROUND)
+        served = []
+
+        async def call(name, level):
+            await limiter.acquire(level=level)
+            served.append(name)
+
+        async def prefetch():
+            with rate_limit.priority(background):
+                await limiter.acquire()
+            served.append("prefetch")
+
+        tasks = [asyncio.create_task(prefetch()), asyncio.create_task(call("normal", NORMAL))]
+        await asyncio.sleep(0.01)
+        background.promote(CRITICAL)
+        limiter.requests.tokens = 2
+        limiter._notify()
+        await asyncio.gather(*tasks)
+        return served
+
+    assert asyncio.run(main()) == ["prefetch", "normal"]
+
+
+class SlowTavily:
+    def __init__(self):
+        self.levels = []
+
+    async def extract(self, urls, sources_dict, extract_depth="basic"):
+        self.levels.append(rate_limit.current_level())
+        await asyncio.sleep(0.02)
+        self.levels.append(rate_limit.current_level())
+        return {url: {"raw_content_id": "id"} for url in urls}, ""
+
+
+def test_claimed_prefetch_runs_at_the_callers_priority():
+    async def main():
+        tavily = SlowTavily()
+        prefetcher = Prefetcher(tavily)
+        prefetcher.prefetch(["https://a.com"])
+        await asyncio.sleep(0)
+        with rate_limit.priority(CRITICAL):
+            documents = await prefetcher.take(["https://a.com"])
+        return tavily.levels, documents
+
+    levels, documents = asyncio.run(main())
+    assert levels == [BACKGROUND, CRITICAL]
+    assert list(documents) == ["https://a.com"]
+
+
+class RateLimited(Exception):
+    status_code = 429
+    retry_after = 0.05
+
+
+def test_rate_limited_call_pauses_the_provider_and_retries():
+    async def main():
+        limiter = rate_limit.RateLimiter({"test": {"rpm": 600}})
+        attempts = []
+
+        async def fn():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise RateLimited()
+            return "ok"
+
+        result = await limiter.call("test", fn)
+        return result, attempts[1] - attempts[0], limiter.provider("test").paused_until
+
+    result, retried_after, paused_until = asyncio.run(main())
+    assert result == "ok"
+    assert retried_after >= 0.04
+    assert paused_until > 0
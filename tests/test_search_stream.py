@@ -0,0 +1,63 @@
+import asyncio
+
+from company_researcher.nodes.research import ResearchAgent
+from company_researcher.state import ResearchState
+from company_researcher.utils.all import Utils
+from company_researcher.utils.tavily_utils import TavilyQuery
+
+
+class FakeSearchClient:
+    """Returns two variants of a shared URL per query, after a per-query delay."""
+
+    def __init__(self, delays):
+        self.delays = delays
+
+    async def search(self, query, **kwargs):
+        await asyncio.sleep(self.delays.get(query, 0.0))
+        return {"results": [{"url": f"https://example.com/{query}", "content": query},
+                            {"url": f"https://www.example.com/shared?utm_source={query}", "content": query}]}
+
+
+def research_agent(cfg, delays):
+    cfg.SPECULATIVE_ENRICH = False
+    utils = Utils(cfg)
+    utils.tavily._client = FakeSearchClient(delays)
+    return ResearchAgent(cfg, utils)
+
+
+def state():
+    return ResearchState(company="Example", company_url="https://example.com/")
+
+
+def test_stream_search_keeps_results_of_repeated_queries(cfg):
+    agent = research_agent(cfg, {})
+    query = TavilyQuery(query="a", search_depth="basic")
+    research_data, _, msg = asyncio.run(agent.stream_search(state(), [query, query]))
+    assert "https://example.com/a" in research_data
+    assert "Abandoned" not in msg
+
+
+def test_stream_search_deduplicates_in_query_order(cfg):
+    # 'b' finishes first, but 'a' comes first in the query list, so its variant of the shared URL is kept
+    agent = research_agent(cfg, {"a": 0.05, "b": 0.0})
+    queries = [TavilyQuery(query="a", search_depth="basic"), TavilyQuery(query="b", search_depth="basic")]
+    research_data, _, _ = asyncio.run(agent.stream_search(state(), queries))
+    assert list(research_data) == ["https://example.com/a", "https://www.example.com/shared?utm_source=a",
+                                   "https://example.com/b"]
+
+
+def test_stream_search_abandons_searches_after_the_deadline(cfg):
+    cfg.SEARCH_DEADLINE = 0.1
+    agent = research_agent(cfg, {"slow": 5.0})
+    queries = [TavilyQuery(query="fast", search_depth="basic"), TavilyQuery(query="slow", search_depth="advanced")]
+    research_data, _, msg = asyncio.run(agent.stream_search(state(), queries))
+    assert "https://example.com/fast" in research_data
+    assert "https://example.com/slow" not in research_data
+    assert "Abandoned 1 slow searches" in msg
+
+
+def test_unique_queries_drops_equivalent_queries(cfg):
+    queries = [TavilyQuery(query="Example CEO", search_depth="basic"),
+               TavilyQuery(query="example  ceo", search_depth="basic"),
+               TavilyQuery(query="Example CEO", search_depth="advanced")]
+    assert Utils(cfg).tavily.unique_queries(queries) == [queries[0], queries[2]]
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import time
+
+from company_researcher.service import ResearchServer, ResearchService
+
+
+def make_service(**kwargs):
+    return ResearchService(graph=object(), documents=object(), **kwargs)
+
+
+def test_result_cache_drops_expired_and_oldest_reports():
+    service = make_service(result_ttl=60, max_results=2)
+    for i in range(3):
+        service.store_report(("company", str(i)), f"report {i}")
+    assert list(service._results) == [("company", "1"), ("company", "2")]
+
+    expired = make_service(result_ttl=0.01, max_results=100)
+    for i in range(3):
+        expired.store_report(("company", str(i)), f"report {i}")
+        time.sleep(0.02)
+    assert len(expired._results) == 1
+
+
+async def post(server, headers, body=b""):
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    async with listener:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"POST /research HTTP/1.1\r\n" + b"".join(f"{k}: {v}\r\n".encode() for k, v in headers.items())
+                     + b"\r\n" + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+    status = response.split(b"\r\n", 1)[0].decode()
+    return status, json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+def test_invalid_content_length_is_a_bad_request():
+    server = ResearchServer(make_service())
+    status, body = asyncio.run(post(server, {"Content-Length": "abc"}))
+    assert status == "HTTP/1.1 400 Bad Request"
+    assert "Content-Length" in body["error"]
+
+    status, _ = asyncio.run(post(server, {"Content-Length": "-5"}))
+    assert status == "HTTP/1.1 400 Bad Request"
+
+    status, _ = asyncio.run(post(server, {"Content-Length": str(ResearchServer.MAX_BODY_BYTES + 1)}))
+    assert status == "HTTP/1.1 413 Payload Too Large"
+
+
+def test_invalid_request_bodies_are_rejected_before_streaming():
+    server = ResearchServer(make_service())
+    bodies = [
+        b"not json",
+        b"[]",
+        json.dumps({"company": "Acme"}).encode(),
+        json.dumps({"company": 1, "company_url": "https://acme.com"}).encode(),
+        json.dumps({"company": "Acme", "company_url": "https://acme.com", "include": [1]}).encode(),
+        json.dumps({"company": "Acme", "company_url": "https://acme.com", "include": "ceo"}).encode(),
+    ]
+    for body in bodies:
+        status, response = asyncio.run(post(server, {"Content-Length": len(body)}, body))
+        assert status == "HTTP/1.1 400 Bad Request", body
+        assert response["error"]
@@ -0,0 +1,57 @@
+import asyncio
+import re
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langgraph.graph import END, START, StateGraph
+
+from company_researcher.nodes.write import WriteAgent
+from company_researcher.state import ResearchState
+from company_researcher.stream import ReportStream
+from company_researcher.utils.all import Utils
+
+
+class FakeSectionModel(BaseChatModel):
+    """Streams a body naming the section it is asked for, with surrounding whitespace and a citation."""
+
+    @property
+    def _llm_type(self):
+        return "fake-section"
+
+    def body(self, messages):
+        title = re.search(r"writing the \*\*(.+?)\*\* section", messages[0].content).group(1)
+        return f"\n  {title} of Acme ([Acme](https://acme.com/about)) and more words.  \n\n"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.body(messages)))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for token in re.findall(r"\s+|\S+", self.body(messages)):
+            # Let the concurrently written sections interleave
+            await asyncio.sleep(0)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def test_section_stream_equals_the_final_report(cfg):
+    cfg.WRITE_MODE = "sections"
+    cfg.FACTUAL_LLM = FakeSectionModel()
+    workflow = StateGraph(ResearchState)
+    workflow.add_node("write", WriteAgent(cfg, Utils(cfg)).run)
+    workflow.add_edge(START, "write")
+    workflow.add_edge("write", END)
+    research_data = {"https://acme.com/about": {"url": "https://acme.com/about", "title": "About Acme",
+                                                "content": "Acme builds robots."}}
+    inputs = {"company": "Acme", "company_url": "https://acme.com", "research_data": research_data}
+
+    async def main():
+        stream = ReportStream(workflow.compile(), inputs)
+        return "".join([token async for token in stream]), stream.report
+
+    streamed, report = asyncio.run(main())
+    assert report.startswith("# Acme Company Report")
+    assert "## 1. " in report and "Citations\n\n- [About Acme](https://acme.com/about)\n" in report
+    assert streamed == report
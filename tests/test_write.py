@@ -0,0 +1,39 @@
+import asyncio
+
+from company_researcher.nodes.write import WriteAgent
+from company_researcher.state import ResearchSnapshot, ResearchState
+from company_researcher.utils import refresh
+from company_researcher.utils.prefetch import Prefetcher
+
+
+class HangingTavily:
+    async def extract(self, urls, sources_dict, extract_depth="basic"):
+        await asyncio.sleep(60)
+
+
+class FakeUtils:
+    def __init__(self):
+        self.prefetcher = Prefetcher(HangingTavily())
+
+
+def test_write_discards_prefetches_when_enrich_was_skipped(cfg):
+    async def main():
+        utils = FakeUtils()
+        urls = utils.prefetcher.prefetch(["https://acme.com/about", "https://acme.com/team"])
+        task = next(iter(utils.prefetcher._pending.values()))[0]
+        await asyncio.sleep(0)
+        research_data = {"https://news.com/acme": {"url": "https://news.com/acme", "title": "Acme", "content": "..."}}
+        state = ResearchState(company="Acme", company_url="https://acme.com", research_data=research_data,
+                              speculative_urls=urls,
+                              previous=ResearchSnapshot(company="Acme", company_url="https://acme.com",
+                                                        report="Old report",
+                                                        documents_hash=refresh.documents_hash([], {}, research_data)))
+        result = await WriteAgent(cfg, utils).run(state)
+        await asyncio.sleep(0)
+        return result, utils.prefetcher, task
+
+    result, prefetcher, task = asyncio.run(main())
+    assert result["report"] == "Old report"
+    assert prefetcher._pending == {}
+    assert prefetcher.wasted == 2
+    assert task.cancelled()